@@ -0,0 +1,125 @@
+"""Compare login latency of the sequential flow with the concurrent pipeline (travelviz_auth)
+
+Firebase is simulated with randomized network latency, so the numbers show how
+much of the round-trip time the pipeline hides; nothing touches the network.
+The profile cache is cleared before every login (worst case for both flows).
+
+Usage: python benchmarks/bench_login.py [--logins 200] [--auth-ms 180] [--rtdb-ms 90]
+"""
+import argparse
+import contextlib
+import io
+import os
+import random
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+os.environ.setdefault("DB_PATH", os.path.join(tempfile.mkdtemp(), "bench_login.db"))
+
+from travelviz_auth import login  # noqa: E402
+from travelviz_profiles import fetch_profile, profile_cache  # noqa: E402
+from travelviz_sessions import create_session  # noqa: E402
+
+
+def _latency(mean_ms, rng):
+    # Long-tailed, like real round trips to Google endpoints
+    return rng.lognormvariate(0, 0.35) * mean_ms / 1000
+
+
+class FakeResult:
+    def __init__(self, value):
+        self._value = value
+
+    def val(self):
+        return self._value
+
+
+class FakeDatabase:
+    def __init__(self, profiles, mean_ms, rng):
+        self._profiles = profiles
+        self._mean_ms = mean_ms
+        self._rng = rng
+        self._path = []
+
+    def child(self, name):
+        self._path.append(name)
+        return self
+
+    def get(self):
+        time.sleep(_latency(self._mean_ms, self._rng))
+        path, self._path = self._path, []
+        return FakeResult(self._profiles.get(path[-1]))
+
+
+class FakeAuth:
+    def __init__(self, users, mean_ms, rng):
+        self._users = users
+        self._mean_ms = mean_ms
+        self._rng = rng
+
+    def sign_in_with_email_and_password(self, email, password):
+        time.sleep(_latency(self._mean_ms, self._rng))
+        uid = self._users[email]
+        return {"localId": uid, "email": email, "idToken": "id-" + uid, "refreshToken": "refresh-" + uid}
+
+
+class FakeClients:
+    def __init__(self, users, profiles, auth_ms, rtdb_ms, seed=3):
+        rng = random.Random(seed)
+        self.auth = FakeAuth(users, auth_ms, rng)
+        self.db = FakeDatabase(profiles, rtdb_ms, rng)
+        self.app = self
+        self._profiles, self._rtdb_ms, self._rng = profiles, rtdb_ms, rng
+
+    def database(self):
+        return FakeDatabase(self._profiles, self._rtdb_ms, self._rng)
+
+
+def sequential_login(clients, email, password):
+    """The original flow: sign in, then session, then profile, one after another"""
+    user = clients.auth.sign_in_with_email_and_password(email, password)
+    create_session(user["localId"], user["refreshToken"])
+    return fetch_profile(clients.db, user["localId"])
+
+
+def _percentile(values, pct):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * pct / 100))]
+
+
+def _run(name, fn, clients, emails):
+    timings = []
+    for email in emails:
+        profile_cache.invalidate(clients.auth._users[email])
+        start = time.perf_counter()
+        with contextlib.redirect_stdout(io.StringIO()):
+            fn(clients, email, "secret")
+        timings.append((time.perf_counter() - start) * 1000)
+    print(f"{name:<24} p50 {_percentile(timings, 50):7.1f} ms   p95 {_percentile(timings, 95):7.1f} ms")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--logins", type=int, default=200)
+    parser.add_argument("--users", type=int, default=50)
+    parser.add_argument("--auth-ms", type=float, default=180)
+    parser.add_argument("--rtdb-ms", type=float, default=90)
+    args = parser.parse_args()
+
+    users = {f"user{i}@example.com": f"uid{i}" for i in range(args.users)}
+    profiles = {uid: {"full_name": uid, "email": email, "theme": "dark"} for email, uid in users.items()}
+    clients = FakeClients(users, profiles, args.auth_ms, args.rtdb_ms)
+    rng = random.Random(5)
+    emails = [rng.choice(list(users)) for _ in range(args.logins)]
+
+    _run("sequential", sequential_login, clients, emails)
+    # A user's first login on a worker can't prefetch: the uid isn't known yet
+    _run("pipeline, first login", login, clients, list(users))
+    _run("pipeline, returning", login, clients, emails)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,298 @@
+"""Headless benchmark of every TravelViz page and interaction against a local Firebase stand-in
+
+Drives travelviz_main.py through Streamlit's AppTest with the in-memory
+Firebase of fake_firebase.py (configurable injected latency), on a scratch
+copy of data.db. Scenarios: login, a rerun of each of the five pages, a chat
+turn and a profile picture upload. For each one it measures rerun time
+(median/p95 over --repeats), then, in separate tracemalloc passes so tracing
+doesn't skew the timings: peak traced memory, allocations (blocks and KiB
+allocated during the iteration and still live when its last rerun ends,
+from a snapshot diff) and retained blocks (still allocated afterwards).
+
+Results are compared with a JSON baseline; exits with status 1 on a
+regression beyond the thresholds. Write a baseline with --save-baseline.
+Note the login scenario includes the app's 1 s pause after a successful login.
+
+Usage: python benchmarks/bench_pages.py [--repeats 10] [--auth-ms 0] [--rtdb-ms 0] [--save-baseline]
+"""
+import argparse
+import gc
+import io
+import json
+import os
+import shutil
+import statistics
+import sys
+import tempfile
+import time
+import tracemalloc
+from contextlib import redirect_stdout
+from pathlib import Path
+
+BENCH_DIR = Path(__file__).resolve().parent
+APP_DIR = BENCH_DIR.parent
+MAIN_SCRIPT = APP_DIR / "travelviz_main.py"
+DEFAULT_BASELINE = BENCH_DIR / "baselines" / "pages.json"
+PAGES = ["Home", "Dashboard", "AI Insights", "Profile", "Feedback"]
+CHAT_QUESTIONS = [
+    "Which country had the highest tourist arrivals overall?",
+    "How many countries are covered in the dashboard?",
+    "What was the growth percentage across all countries?",
+    "Which year had the lowest arrivals?",
+]
+BENCH_EMAIL = "bench@example.com"
+BENCH_PASSWORD = "bench-password"
+
+
+def _scratch_env():
+    """Point every store at a scratch directory; must run before travelviz modules are imported"""
+    sys.path.insert(0, str(APP_DIR))
+    sys.path.insert(0, str(BENCH_DIR))
+    scratch = Path(tempfile.mkdtemp(prefix="travelviz-bench-"))
+    if (APP_DIR / "data.db").exists():
+        shutil.copy(APP_DIR / "data.db", scratch / "data.db")
+    os.environ.update({
+        "DB_PATH": str(scratch / "data.db"),
+        "WRITE_SPOOL_PATH": str(scratch / "write_spool.jsonl"),
+        "IMAGE_STORE_DIR": str(scratch / "avatars"),
+        "SESSION_SECRET": "bench-secret",
+    })
+    from fake_firebase import configure_env
+
+    configure_env()
+    return scratch
+
+
+def _bench_image(seed):
+    """A distinct 1600x1200 JPEG per seed (identical uploads would hit the variant memo)"""
+    from PIL import Image
+
+    image = Image.linear_gradient("L").resize((1600, 1200)).convert("RGB")
+    image.putpixel((seed % 1600, 0), (seed % 256, 0, 0))
+    out = io.BytesIO()
+    image.save(out, "JPEG", quality=90)
+    return out.getvalue()
+
+
+class Bench:
+    def __init__(self, firebase):
+        from travelviz_profiles import profile_cache
+
+        self.profile_cache = profile_cache
+        self.firebase = firebase
+        self._logins = 0
+        self.profile = profile = {"full_name": "Bench User", "username": "bench", "email": BENCH_EMAIL, "theme": "dark",
+                   "profile_picture": "", "created_at": "2024-01-01T00:00:00"}
+        uid = firebase.add_user(BENCH_EMAIL, BENCH_PASSWORD, profile)
+        self.user_data = {"uid": uid, "token": None, **profile}
+        self._image_seed = 0
+        # Taken after each rerun while tracemalloc is tracing (allocation pass)
+        self.last_snapshot = None
+
+    def _session(self, page=None):
+        from streamlit.testing.v1 import AppTest
+
+        at = AppTest.from_file(str(MAIN_SCRIPT), default_timeout=120)
+        if page:
+            at.session_state.authenticated = True
+            at.session_state.user_data = dict(self.user_data)
+            at.session_state.force_nav = page
+        return at
+
+    def _run(self, at, page=None):
+        if page:
+            at.session_state.force_nav = page
+        start = time.perf_counter()
+        at.run()
+        seconds = time.perf_counter() - start
+        if tracemalloc.is_tracing():
+            self.last_snapshot = tracemalloc.take_snapshot()
+        if at.exception:
+            raise RuntimeError(at.exception[0].value)
+        return seconds
+
+    def login(self, repeats):
+        timings = []
+        for _ in range(repeats):
+            # A different returning user each time (the app rate-limits repeated logins per account)
+            self._logins += 1
+            email = f"login{self._logins}@example.com"
+            self.firebase.add_user(email, BENCH_PASSWORD, {**self.profile, "email": email})
+            at = self._session()
+            self._run(at)
+            at.text_input(key="login_email").input(email)
+            at.text_input(key="login_password").input(BENCH_PASSWORD)
+            next(b for b in at.button if b.label == "Login").click()
+            timings.append(self._run(at))
+            if not at.session_state.authenticated:
+                raise RuntimeError("login failed")
+        return timings
+
+    def page(self, page, repeats):
+        at = self._session(page)
+        self._run(at, page)
+        return [self._run(at, page) for _ in range(repeats)]
+
+    def chat_turn(self, repeats):
+        at = self._session("AI Insights")
+        self._run(at, "AI Insights")
+        timings = []
+        for i in range(repeats):
+            at.text_input(key="chat_input").input(CHAT_QUESTIONS[i % len(CHAT_QUESTIONS)])
+            at.button(key="send_btn").click()
+            timings.append(self._run(at, "AI Insights"))
+        return timings
+
+    def profile_upload(self, repeats):
+        timings = []
+        for _ in range(repeats):
+            # A fresh session each time: after the update the app reruns, and
+            # AppTest's navigation menu then falls back to its default page
+            at = self._session("Profile")
+            self._run(at, "Profile")
+            self._image_seed += 1
+            image = _bench_image(self._image_seed)
+            start = time.perf_counter()
+            at.file_uploader(key="profile_upload").upload("avatar.jpg", image, "image/jpeg")
+            self._run(at, "Profile")
+            at.button(key="update_pic").click()
+            self._run(at, "Profile")
+            timings.append(time.perf_counter() - start)
+        return timings
+
+    def scenarios(self):
+        """name -> callable(repeats) returning per-iteration seconds"""
+        scenarios = {"login": self.login}
+        for page in PAGES:
+            scenarios[f"page:{page}"] = lambda repeats, page=page: self.page(page, repeats)
+        scenarios["chat_turn"] = self.chat_turn
+        scenarios["profile_upload"] = self.profile_upload
+        return scenarios
+
+
+def _percentile(values, pct):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * pct / 100))]
+
+
+def _memory(fn):
+    """Peak traced KiB and net retained allocation blocks of one iteration"""
+    gc.collect()
+    blocks = sys.getallocatedblocks()
+    tracemalloc.start()
+    try:
+        fn(1)
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    gc.collect()
+    return peak / 1024, sys.getallocatedblocks() - blocks
+
+
+def _allocations(bench, fn):
+    """Blocks and KiB allocated during one iteration and live when its last rerun finished"""
+    gc.collect()
+    tracemalloc.start()
+    try:
+        before = tracemalloc.take_snapshot()
+        bench.last_snapshot = None
+        fn(1)
+        after = bench.last_snapshot
+    finally:
+        tracemalloc.stop()
+        bench.last_snapshot = None
+    # Leave out the snapshots themselves
+    ignore = [tracemalloc.Filter(False, tracemalloc.__file__)]
+    stats = after.filter_traces(ignore).compare_to(before.filter_traces(ignore), "filename")
+    return sum(s.count_diff for s in stats if s.count_diff > 0), sum(s.size_diff for s in stats if s.size_diff > 0) / 1024
+
+
+def run(repeats, only=None, auth_ms=0.0, rtdb_ms=0.0):
+    """Run the scenarios and return {scenario: metrics}"""
+    _scratch_env()
+    from fake_firebase import install
+
+    firebase = install(auth_ms=auth_ms, rtdb_ms=rtdb_ms)
+    bench = Bench(firebase)
+    results = {}
+    for name, fn in bench.scenarios().items():
+        if only and name not in only:
+            continue
+        with redirect_stdout(io.StringIO()):
+            fn(1)  # warm-up: imports, caches, image worker processes
+            timings = fn(repeats)
+            peak_kib, retained_blocks = _memory(fn)
+            alloc_blocks, alloc_kib = _allocations(bench, fn)
+        results[name] = {
+            "median_ms": statistics.median(timings) * 1000,
+            "p95_ms": _percentile(timings, 95) * 1000,
+            "peak_kib": peak_kib,
+            "alloc_blocks": alloc_blocks,
+            "alloc_kib": alloc_kib,
+            "retained_blocks": retained_blocks,
+        }
+        r = results[name]
+        print(f"{name:<18} median {r['median_ms']:8.1f} ms   p95 {r['p95_ms']:8.1f} ms   "
+              f"peak {r['peak_kib']:7.0f} KiB   alloc {r['alloc_blocks']:7d} blocks / {r['alloc_kib']:6.0f} KiB   "
+              f"retained {r['retained_blocks']:6d} blocks")
+    return results
+
+
+def compare(results, baseline, time_threshold, memory_threshold, min_delta_ms):
+    """Names of scenarios slower or hungrier than the baseline allows"""
+    regressions = []
+    for name, current in results.items():
+        base = baseline.get(name)
+        if not base:
+            continue
+        slower = current["median_ms"] - base["median_ms"]
+        if slower > min_delta_ms and current["median_ms"] > base["median_ms"] * (1 + time_threshold):
+            regressions.append(f"{name}: median {base['median_ms']:.1f} -> {current['median_ms']:.1f} ms")
+        if current["peak_kib"] > base["peak_kib"] * (1 + memory_threshold) and current["peak_kib"] - base["peak_kib"] > 256:
+            regressions.append(f"{name}: peak {base['peak_kib']:.0f} -> {current['peak_kib']:.0f} KiB")
+        # Baselines saved before allocation counts were recorded have none (more_blocks is 0)
+        more_blocks = current["alloc_blocks"] - base.get("alloc_blocks", current["alloc_blocks"])
+        if more_blocks > 1000 and current["alloc_blocks"] > base["alloc_blocks"] * (1 + memory_threshold):
+            regressions.append(f"{name}: allocations {base['alloc_blocks']} -> {current['alloc_blocks']} blocks")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--repeats", type=int, default=10)
+    parser.add_argument("--only", nargs="*", help="scenario names, e.g. login 'page:AI Insights' chat_turn")
+    parser.add_argument("--auth-ms", type=float, default=0, help="mean injected Firebase Auth latency")
+    parser.add_argument("--rtdb-ms", type=float, default=0, help="mean injected RTDB latency")
+    parser.add_argument("--baseline", type=Path, default=DEFAULT_BASELINE)
+    parser.add_argument("--save-baseline", action="store_true", help="write the results as the new baseline")
+    parser.add_argument("--time-threshold", type=float, default=0.25, help="allowed median slowdown (fraction)")
+    parser.add_argument("--memory-threshold", type=float, default=0.25, help="allowed peak memory growth (fraction)")
+    parser.add_argument("--min-delta-ms", type=float, default=5, help="ignore slowdowns smaller than this")
+    args = parser.parse_args()
+
+    results = run(args.repeats, args.only, args.auth_ms, args.rtdb_ms)
+    settings = {"repeats": args.repeats, "auth_ms": args.auth_ms, "rtdb_ms": args.rtdb_ms}
+
+    if args.save_baseline:
+        args.baseline.parent.mkdir(parents=True, exist_ok=True)
+        args.baseline.write_text(json.dumps({"settings": settings, "results": results}, indent=2) + "\n")
+        print(f"Baseline written to {args.baseline}")
+        return
+    if not args.baseline.exists():
+        print(f"No baseline at {args.baseline}; run with --save-baseline to create one")
+        return
+
+    baseline = json.loads(args.baseline.read_text())
+    if baseline.get("settings", {}).get("auth_ms") != args.auth_ms or baseline.get("settings", {}).get("rtdb_ms") != args.rtdb_ms:
+        print(f"Warning: baseline was recorded with {baseline.get('settings')}")
+    regressions = compare(results, baseline["results"], args.time_threshold, args.memory_threshold, args.min_delta_ms)
+    if regressions:
+        print("Regressions against the baseline:")
+        for line in regressions:
+            print(f"  {line}")
+        sys.exit(1)
+    print("No regressions against the baseline")
+
+
+if __name__ == "__main__":
+    main()
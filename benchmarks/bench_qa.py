@@ -0,0 +1,131 @@
+"""Benchmark the indexed Q&A engine against the original difflib matcher
+
+Usage: python benchmarks/bench_qa.py [--size 5000] [--queries 300]
+"""
+import argparse
+import random
+import statistics
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from travelviz_qa import NO_ANSWER, QAEngine, legacy_find_best_answer, load_qa_pairs  # noqa: E402
+
+TEMPLATES = [
+    ("How many tourist arrivals did {c} record in {y}?", "{n}M arrivals."),
+    ("What was the growth percentage for {c} in {y}?", "{p}%."),
+    ("Which year had the highest arrivals for {c}?", "{y}, with {n}M arrivals."),
+    ("What is the forecasted number of arrivals for {c}?", "Around {n}M arrivals."),
+]
+OFF_TOPIC = ["hello", "what's the weather like", "tell me a joke", "who won the match yesterday", "ok"]
+
+
+def synthetic_dataset(size, seed=7):
+    """Return the real Q&A pairs padded with templated country/year pairs"""
+    rng = random.Random(seed)
+    dataset = load_qa_pairs()
+    seen = {q for q, _ in dataset}
+    countries = [f"Country{i:04d}" for i in range(max(1, size // 40))]
+    while len(dataset) < size:
+        question, answer = rng.choice(TEMPLATES)
+        values = {"c": rng.choice(countries), "y": rng.randint(1995, 2024), "n": rng.randint(1, 900), "p": round(rng.uniform(-20, 80), 2)}
+        question = question.format(**values)
+        if question not in seen:
+            seen.add(question)
+            dataset.append((question, answer.format(**values)))
+    return dataset
+
+
+def _typo(text, rng):
+    if len(text) < 4:
+        return text
+    i = rng.randrange(len(text) - 1)
+    return text[:i] + text[i + 1] + text[i] + text[i + 2:]
+
+
+def query_set(dataset, count, seed=11):
+    """Realistic (query, expected answer) pairs: verbatim, lowercased, typos, truncated, keyword-only and off-topic"""
+    rng = random.Random(seed)
+    queries = []
+    for _ in range(count):
+        question, answer = rng.choice(dataset)
+        words = question.rstrip("?").split()
+        kind = rng.randrange(6)
+        if kind == 0:
+            queries.append((question, answer))
+        elif kind == 1:
+            queries.append((question.lower().rstrip("?"), answer))
+        elif kind == 2:
+            queries.append((_typo(question, rng), answer))
+        elif kind == 3:
+            queries.append((" ".join(words[: max(2, len(words) - 2)]), answer))
+        elif kind == 4:
+            queries.append((" ".join(rng.sample(words, min(3, len(words)))), answer))
+        else:
+            queries.append((rng.choice(OFF_TOPIC), NO_ANSWER))
+    return queries
+
+
+def _time(fn, queries):
+    timings = []
+    answers = []
+    for q in queries:
+        start = time.perf_counter()
+        answers.append(fn(q))
+        timings.append((time.perf_counter() - start) * 1000)
+    return answers, timings
+
+
+def _summary(timings):
+    timings = sorted(timings)
+    p95 = timings[int(len(timings) * 0.95) - 1]
+    return f"mean {statistics.mean(timings):8.3f} ms   p95 {p95:8.3f} ms"
+
+
+def run(size, count):
+    dataset = synthetic_dataset(size)
+    queries = query_set(dataset, count)
+    expected = [answer for _, answer in queries]
+    queries = [query for query, _ in queries]
+
+    start = time.perf_counter()
+    engine = QAEngine(dataset)
+    build_ms = (time.perf_counter() - start) * 1000
+
+    legacy_answers, legacy_times = _time(lambda q: legacy_find_best_answer(dataset, q), queries)
+    engine_answers, engine_times = _time(engine.find_best_answer, queries)
+    agree = sum(a == b for a, b in zip(legacy_answers, engine_answers))
+    legacy_hits = sum(a == e for a, e in zip(legacy_answers, expected))
+    engine_hits = sum(a == e for a, e in zip(engine_answers, expected))
+
+    print(f"Q&A pairs: {len(dataset)}   queries: {len(queries)}   index build: {build_ms:.1f} ms")
+    print(f"  legacy difflib : {_summary(legacy_times)}")
+    print(f"  indexed engine : {_summary(engine_times)}")
+    print(f"  answer agreement: {agree}/{len(queries)} ({agree / len(queries):.1%})")
+    print(f"  expected answer : legacy {legacy_hits}/{len(queries)}   engine {engine_hits}/{len(queries)}")
+
+    # Publishing a small batch of answers should only index that batch
+    batch = synthetic_dataset(size + max(1, size // 50), seed=13)[size:]
+    start = time.perf_counter()
+    updated = engine.updated(batch)
+    update_ms = (time.perf_counter() - start) * 1000
+    start = time.perf_counter()
+    QAEngine(engine.pairs() + batch)
+    rebuild_ms = (time.perf_counter() - start) * 1000
+    print(f"  publish {len(batch)} answers: incremental {update_ms:.1f} ms   full rebuild {rebuild_ms:.1f} ms   ({len(updated)} live)")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--size", type=int, nargs="*", default=[15, 1000, 5000], help="number of Q&A pairs")
+    parser.add_argument("--queries", type=int, default=300)
+    args = parser.parse_args()
+    for size in args.size:
+        run(size, args.queries)
+        print()
+
+
+if __name__ == "__main__":
+    main()
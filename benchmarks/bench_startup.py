@@ -0,0 +1,123 @@
+"""Measure TravelViz cold start (module import) and first render against a time budget
+
+Each measurement runs in a fresh interpreter, like a newly autoscaled worker.
+Firebase is configured with placeholder values and Lottie downloads are
+disabled, so nothing touches the network. Exits with status 1 when a median
+exceeds its budget.
+
+Usage: python benchmarks/bench_startup.py [--runs 5] [--import-budget-ms 800] [--render-budget-ms 2500]
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+from pathlib import Path
+
+from fake_firebase import FAKE_ENV
+
+APP_DIR = Path(__file__).resolve().parent.parent
+MAIN_SCRIPT = APP_DIR / "travelviz_main.py"
+
+IMPORT_PROBE = """
+import sys, time
+start = time.perf_counter()
+import travelviz_main
+print(time.perf_counter() - start)
+"""
+
+RENDER_PROBE = """
+import json, sys, time
+start = time.perf_counter()
+from streamlit.testing.v1 import AppTest
+at = AppTest.from_file(sys.argv[1], default_timeout=120)
+page = sys.argv[2]
+if page != "Login":
+    at.session_state.authenticated = True
+    at.session_state.user_data = {"uid": "bench", "full_name": "Bench", "email": "bench@example.com"}
+    at.session_state.force_nav = page
+at.run()
+print(json.dumps({"seconds": time.perf_counter() - start, "errors": [str(e.value) for e in at.exception]}))
+"""
+
+
+def _env():
+    env = dict(os.environ)
+    env.update(FAKE_ENV)
+    env["PYTHONPATH"] = os.pathsep.join(filter(None, [str(APP_DIR), env.get("PYTHONPATH")]))
+    return env
+
+
+def _run(args):
+    result = subprocess.run(
+        [sys.executable, *args], cwd=APP_DIR, env=_env(), capture_output=True, text=True, timeout=300,
+    )
+    if result.returncode != 0:
+        raise RuntimeError(result.stderr.strip().splitlines()[-1] if result.stderr.strip() else "probe failed")
+    return result
+
+
+def import_time():
+    """Seconds to import travelviz_main in a fresh interpreter"""
+    return float(_run(["-c", IMPORT_PROBE]).stdout.strip().splitlines()[-1])
+
+
+def first_render(page):
+    """Seconds from a fresh interpreter to the first full render of page"""
+    report = json.loads(_run(["-c", RENDER_PROBE, str(MAIN_SCRIPT), page]).stdout.strip().splitlines()[-1])
+    if report["errors"]:
+        raise RuntimeError(f"{page} raised: {report['errors'][0]}")
+    return report["seconds"]
+
+
+def top_imports(limit):
+    """Slowest modules by cumulative import time (python -X importtime)"""
+    stderr = _run(["-X", "importtime", "-c", "import travelviz_main"]).stderr
+    rows = []
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _, cumulative, name = (part.strip() for part in line[len("import time:"):].split("|"))
+        # Only top-level packages; their cumulative time includes the submodules
+        if not name.startswith(" ") and "." not in name and name != "travelviz_main":
+            rows.append((int(cumulative), name))
+    return sorted(rows, reverse=True)[:limit]
+
+
+def _median_ms(fn, runs, *args):
+    return statistics.median(fn(*args) for _ in range(runs)) * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--pages", nargs="*", default=["Login", "Home", "Dashboard", "AI Insights"])
+    parser.add_argument("--import-budget-ms", type=float, default=float(os.getenv("STARTUP_IMPORT_BUDGET_MS", 800)))
+    parser.add_argument("--render-budget-ms", type=float, default=float(os.getenv("STARTUP_RENDER_BUDGET_MS", 2500)))
+    parser.add_argument("--top", type=int, default=10, help="slowest imports to list")
+    args = parser.parse_args()
+
+    over_budget = []
+    import_ms = _median_ms(import_time, args.runs)
+    print(f"Cold import of travelviz_main: {import_ms:8.1f} ms   (budget {args.import_budget_ms:.0f} ms)")
+    if import_ms > args.import_budget_ms:
+        over_budget.append("import")
+
+    print("Slowest top-level imports (cumulative):")
+    for micros, name in top_imports(args.top):
+        print(f"  {name:<28} {micros / 1000:8.1f} ms")
+
+    for page in args.pages:
+        render_ms = _median_ms(first_render, args.runs, page)
+        print(f"First render of {page:<12} {render_ms:8.1f} ms   (budget {args.render_budget_ms:.0f} ms)")
+        if render_ms > args.render_budget_ms:
+            over_budget.append(page)
+
+    if over_budget:
+        print(f"Over budget: {', '.join(over_budget)}")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,188 @@
+"""In-memory stand-in for pyrebase Auth and Realtime Database, with injected latency
+
+Used by the headless benchmarks. install() builds a FakeFirebase and makes it
+the process-wide client bundle of travelviz_firebase, wrapped in the same
+circuit breakers as the real clients. Every Auth/RTDB call then sleeps for a
+long-tailed random latency instead of crossing the network.
+"""
+import copy
+import os
+import random
+import secrets
+import threading
+import time
+from pathlib import Path
+
+APP_DIR = Path(__file__).resolve().parent.parent
+
+FAKE_ENV = {
+    "FIREBASE_API_KEY": "bench-key",
+    "FIREBASE_AUTH_DOMAIN": "bench.firebaseapp.com",
+    "FIREBASE_DATABASE_URL": "https://bench.firebaseio.com",
+    "FIREBASE_PROJECT_ID": "bench",
+    "TRAVELVIZ_OFFLINE_ASSETS": "1",
+}
+
+
+class FakeFirebaseError(Exception):
+    """Mimics the HTTPError text pyrebase raises (the app matches on the error codes)"""
+
+
+class _Result:
+    def __init__(self, value):
+        self._value = value
+
+    def val(self):
+        return self._value
+
+
+class FakeFirebase:
+    """Shared state (users and the RTDB tree) behind FakeAuth and FakeDatabase clients"""
+
+    def __init__(self, auth_ms=0.0, rtdb_ms=0.0, seed=7):
+        self.auth_ms = auth_ms
+        self.rtdb_ms = rtdb_ms
+        self.users = {}  # email -> (uid, password)
+        self.tree = {}
+        self.calls = 0
+        self._rng = random.Random(seed)
+        self._lock = threading.Lock()
+
+    def latency(self, mean_ms):
+        if mean_ms <= 0:
+            return
+        with self._lock:
+            self.calls += 1
+            # Long-tailed, like real round trips to Google endpoints
+            delay = self._rng.lognormvariate(0, 0.35) * mean_ms / 1000
+        time.sleep(delay)
+
+    def add_user(self, email, password, profile=None):
+        uid = "uid-" + secrets.token_hex(6)
+        self.users[email.lower()] = (uid, password)
+        if profile is not None:
+            self.set(["users", uid], copy.deepcopy(profile))
+        return uid
+
+    # pyrebase Firebase app interface
+    def auth(self):
+        return FakeAuth(self)
+
+    def database(self):
+        return FakeDatabase(self)
+
+    # RTDB tree helpers
+    def get(self, path):
+        with self._lock:
+            node = self.tree
+            for part in path:
+                if not isinstance(node, dict) or part not in node:
+                    return None
+                node = node[part]
+            return copy.deepcopy(node)
+
+    def set(self, path, value):
+        with self._lock:
+            node = self.tree
+            for part in path[:-1]:
+                node = node.setdefault(part, {})
+            if value is None:
+                node.pop(path[-1], None)
+            else:
+                node[path[-1]] = copy.deepcopy(value)
+
+
+class FakeAuth:
+    def __init__(self, firebase):
+        self._firebase = firebase
+
+    def sign_in_with_email_and_password(self, email, password):
+        self._firebase.latency(self._firebase.auth_ms)
+        entry = self._firebase.users.get(email.lower())
+        if entry is None or entry[1] != password:
+            raise FakeFirebaseError('400 Client Error: {"error": {"message": "INVALID_LOGIN_CREDENTIALS"}}')
+        uid = entry[0]
+        return {"localId": uid, "email": email, "idToken": "id-" + uid, "refreshToken": "refresh-" + uid}
+
+    def create_user_with_email_and_password(self, email, password):
+        self._firebase.latency(self._firebase.auth_ms)
+        if email.lower() in self._firebase.users:
+            raise FakeFirebaseError('400 Client Error: {"error": {"message": "EMAIL_EXISTS"}}')
+        uid = self._firebase.add_user(email, password)
+        return {"localId": uid, "email": email, "idToken": "id-" + uid, "refreshToken": "refresh-" + uid}
+
+    def refresh(self, refresh_token):
+        self._firebase.latency(self._firebase.auth_ms)
+        uid = refresh_token[len("refresh-"):]
+        return {"userId": uid, "idToken": "id-" + uid, "refreshToken": refresh_token}
+
+
+class FakeDatabase:
+    """Supports the calls the app makes: child chains, get, set, update (multi-path), push keys"""
+
+    def __init__(self, firebase):
+        self._firebase = firebase
+        self._path = []
+
+    def child(self, *args):
+        for arg in args:
+            self._path.extend(part for part in str(arg).split("/") if part)
+        return self
+
+    def _take_path(self):
+        path, self._path = self._path, []
+        return path
+
+    def get(self):
+        self._firebase.latency(self._firebase.rtdb_ms)
+        return _Result(self._firebase.get(self._take_path()))
+
+    def set(self, value):
+        self._firebase.latency(self._firebase.rtdb_ms)
+        self._firebase.set(self._take_path(), value)
+        return value
+
+    def update(self, data):
+        self._firebase.latency(self._firebase.rtdb_ms)
+        base = self._take_path()
+        for key, value in data.items():
+            self._firebase.set(base + [part for part in key.split("/") if part], value)
+        return data
+
+    def push(self, value):
+        key = self.generate_key()
+        self.child(key)
+        self.set(value)
+        return {"name": key}
+
+    def remove(self):
+        self._firebase.latency(self._firebase.rtdb_ms)
+        self._firebase.set(self._take_path(), None)
+
+    def generate_key(self):
+        return "-bench" + secrets.token_hex(8)
+
+
+def configure_env():
+    """Placeholder Firebase settings, offline assets; call before importing travelviz modules"""
+    for key, value in FAKE_ENV.items():
+        os.environ.setdefault(key, value)
+
+
+def install(auth_ms=0.0, rtdb_ms=0.0, seed=7):
+    """Make a new FakeFirebase the app's shared Firebase clients and return it"""
+    import travelviz_firebase
+    from travelviz_guard import GuardedClient, auth_breaker, rtdb_breaker
+
+    firebase = FakeFirebase(auth_ms, rtdb_ms, seed)
+    config = travelviz_firebase.check_firebase_config()
+    travelviz_firebase._clients = travelviz_firebase.FirebaseClients(
+        firebase,
+        GuardedClient(firebase.auth(), auth_breaker),
+        GuardedClient(firebase.database(), rtdb_breaker),
+        config,
+        travelviz_firebase._fingerprint(config),
+        0.0,
+        (travelviz_firebase._clients.generation + 1) if travelviz_firebase._clients else 1,
+    )
+    return firebase
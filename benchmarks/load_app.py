@@ -0,0 +1,42 @@
+"""Streamlit entry point for load tests: travelviz_main.py backed by the in-memory Firebase stand-in
+
+Started by load_sessions.py with `streamlit run benchmarks/load_app.py`. The
+stand-in is installed once per server process, with LOAD_USERS accounts
+load<i>@example.com / LOAD_PASSWORD and LOAD_AUTH_MS / LOAD_RTDB_MS latency.
+Per-user and per-IP rate limits are lifted because every virtual user
+connects from the same address.
+"""
+import os
+import runpy
+import sys
+from pathlib import Path
+
+BENCH_DIR = Path(__file__).resolve().parent
+APP_DIR = BENCH_DIR.parent
+for path in (str(APP_DIR), str(BENCH_DIR)):
+    if path not in sys.path:
+        sys.path.insert(0, path)
+
+import fake_firebase  # noqa: E402
+
+fake_firebase.configure_env()
+
+import travelviz_firebase  # noqa: E402
+
+if not isinstance(getattr(travelviz_firebase._clients, "app", None), fake_firebase.FakeFirebase):
+    firebase = fake_firebase.install(float(os.getenv("LOAD_AUTH_MS", 0)), float(os.getenv("LOAD_RTDB_MS", 0)))
+    for i in range(int(os.getenv("LOAD_USERS", 100))):
+        email = f"load{i}@example.com"
+        firebase.add_user(email, os.getenv("LOAD_PASSWORD", "load-password"), {
+            "full_name": f"Load User {i}", "username": f"load{i}", "email": email, "theme": "dark",
+            "profile_picture": "", "created_at": "2024-01-01T00:00:00",
+        })
+
+    # Every virtual user connects from 127.0.0.1: lift the per-user/per-IP
+    # limits (meant for distinct people) so only the process-wide buckets apply
+    from travelviz_guard import login_limiter, write_limiter
+
+    for limiter in (login_limiter, write_limiter):
+        limiter.rate = limiter.capacity = 1000.0
+
+runpy.run_path(str(APP_DIR / "travelviz_main.py"), run_name="__main__")
@@ -0,0 +1,330 @@
+"""Concurrent-session load generator for one Streamlit worker running TravelViz
+
+Starts `streamlit run benchmarks/load_app.py`, which is travelviz_main.py
+backed by the in-memory Firebase stand-in. It then opens N concurrent
+websocket sessions speaking Streamlit's own protocol (BackMsg/ForwardMsg
+protobufs), like N browser tabs. Each virtual user logs in, then loops
+Dashboard -> several chat questions on AI Insights -> a feedback submission,
+with think time between actions, until the level's duration is over.
+Chat and feedback widgets live in fragments and are sent as fragment reruns,
+as the browser would.
+
+For every concurrency level it reports throughput, p50/p95/p99 interaction
+latency (send -> script finished), errors, and the server's resident memory
+per session.
+
+Usage: python benchmarks/load_sessions.py [--levels 1 4 16 32] [--duration 30] [--think-ms 500]
+                                          [--auth-ms 80] [--rtdb-ms 40] [--json results.json]
+Needs the `websockets` package (installed with Streamlit's server).
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import socket
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+import websockets
+from streamlit.proto.BackMsg_pb2 import BackMsg
+from streamlit.proto.ForwardMsg_pb2 import ForwardMsg
+from streamlit.proto.WidgetStates_pb2 import WidgetState
+
+BENCH_DIR = Path(__file__).resolve().parent
+APP_DIR = BENCH_DIR.parent
+LOAD_APP = BENCH_DIR / "load_app.py"
+PASSWORD = "load-password"
+CHAT_QUESTIONS = [
+    "Which country had the highest tourist arrivals overall?",
+    "How many countries are covered in the dashboard?",
+    "What was the growth percentage across all countries?",
+    "Which year had the lowest arrivals?",
+    "What is the forecast for next year?",
+]
+DONE_STATUSES = (
+    ForwardMsg.FINISHED_SUCCESSFULLY,
+    ForwardMsg.FINISHED_FRAGMENT_RUN_SUCCESSFULLY,
+    ForwardMsg.FINISHED_WITH_COMPILE_ERROR,
+)
+
+
+class SessionError(RuntimeError):
+    pass
+
+
+class VirtualUser:
+    """One browser tab: keeps the widget ids of the last run and sends widget states like the frontend"""
+
+    def __init__(self, url, index, think, rng):
+        self.url = url
+        self.email = f"load{index}@example.com"
+        self.think = think
+        self.rng = rng
+        self.ws = None
+        self.widgets = {}  # widget id -> (element type, label, fragment id)
+        self.states = {}  # persistent (non-trigger) widget values
+        self.samples = []  # (kind, seconds)
+        self.errors = 0
+        self.login_retries = 0
+
+    async def connect(self):
+        self.ws = await websockets.connect(f"{self.url}/_stcore/stream", subprotocols=["streamlit"], max_size=None)
+
+    async def close(self):
+        if self.ws is not None:
+            await self.ws.close()
+
+    def _find(self, suffix=None, label=None):
+        for widget_id, (_, widget_label, fragment_id) in self.widgets.items():
+            if (suffix and widget_id.endswith(suffix)) or (label and widget_label == label):
+                return widget_id, fragment_id
+        raise SessionError(f"widget not found: {suffix or label}")
+
+    async def _rerun(self, kind, triggers=(), fragment_id=""):
+        """Send one rerun request and wait for the (possibly chained) runs to finish"""
+        msg = BackMsg()
+        msg.rerun_script.query_string = ""
+        msg.rerun_script.page_script_hash = ""
+        if fragment_id:
+            msg.rerun_script.fragment_id = fragment_id
+        for state in list(self.states.values()) + list(triggers):
+            msg.rerun_script.widget_states.widgets.append(state)
+
+        start = time.perf_counter()
+        await self.ws.send(msg.SerializeToString())
+        if not fragment_id:
+            self.widgets = {}
+        failed = False
+        while True:
+            forward = ForwardMsg()
+            forward.ParseFromString(await self.ws.recv())
+            kind_of = forward.WhichOneof("type")
+            if kind_of == "delta" and forward.delta.WhichOneof("type") == "new_element":
+                element = forward.delta.new_element
+                element_type = element.WhichOneof("type")
+                inner = getattr(element, element_type)
+                if element_type == "exception":
+                    failed = True
+                widget_id = getattr(inner, "id", "")
+                if widget_id:
+                    self.widgets[widget_id] = (element_type, getattr(inner, "label", ""), forward.delta.fragment_id)
+            elif kind_of == "script_finished" and forward.script_finished in DONE_STATUSES:
+                break
+        self.samples.append((kind, time.perf_counter() - start))
+        if failed:
+            self.errors += 1
+
+    def _set(self, widget_id, **value):
+        self.states[widget_id] = WidgetState(id=widget_id, **value)
+
+    async def _pause(self):
+        await asyncio.sleep(self.think * self.rng.uniform(0.5, 1.5))
+
+    async def login(self):
+        await self._rerun("open")
+        for _ in range(60):
+            email_id, _ = self._find(suffix="-login_email")
+            password_id, _ = self._find(suffix="-login_password")
+            submit_id, _ = self._find(suffix="FormSubmitter:login_form-Login")
+            await self._rerun("login", [
+                WidgetState(id=email_id, string_value=self.email),
+                WidgetState(id=password_id, string_value=PASSWORD),
+                WidgetState(id=submit_id, trigger_value=True),
+            ])
+            if any(widget_id.endswith("-logout_btn") for widget_id in self.widgets):
+                return
+            # Turned away by the login rate limiter: wait like a person would
+            self.login_retries += 1
+            await asyncio.sleep(1 + self.rng.random())
+        raise SessionError("login kept failing")
+
+    async def navigate(self, page):
+        menu_id = next(
+            (wid for wid, (etype, _, _) in self.widgets.items() if etype == "component_instance"), None
+        )
+        if menu_id is None:
+            raise SessionError("navigation menu not found")
+        self._set(menu_id, json_value=json.dumps(page))
+        await self._rerun(f"page:{page}")
+
+    async def ask(self, question):
+        input_id, _ = self._find(suffix="-chat_input")
+        send_id, fragment_id = self._find(suffix="-send_btn")
+        self._set(input_id, string_value=question)
+        await self._rerun("chat_turn", [WidgetState(id=send_id, trigger_value=True)], fragment_id)
+
+    async def send_feedback(self):
+        message_id, _ = self._find(label="Your Message *")
+        submit_id, fragment_id = self._find(suffix="FormSubmitter:feedback_form-📤 Send Feedback")
+        await self._rerun("feedback", [
+            WidgetState(id=message_id, string_value="Load test feedback: the dashboard looks great."),
+            WidgetState(id=submit_id, trigger_value=True),
+        ], fragment_id)
+
+    async def run(self, deadline, questions):
+        """Log in, then loop the realistic script until the deadline"""
+        try:
+            await self.connect()
+            await self.login()
+            while time.monotonic() < deadline:
+                await self._pause()
+                await self.navigate("Dashboard")
+                await self._pause()
+                await self.navigate("AI Insights")
+                for _ in range(questions):
+                    await self._pause()
+                    await self.ask(self.rng.choice(CHAT_QUESTIONS))
+                await self._pause()
+                await self.navigate("Feedback")
+                await self._pause()
+                await self.send_feedback()
+        except (SessionError, OSError, websockets.WebSocketException) as e:
+            self.errors += 1
+            print(f"  {self.email}: {e}")
+
+
+def _free_port():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def _rss_kib(pid):
+    """Resident memory of the server process (Linux /proc), or None"""
+    try:
+        with open(f"/proc/{pid}/status") as f:
+            for line in f:
+                if line.startswith("VmRSS:"):
+                    return int(line.split()[1])
+    except OSError:
+        return None
+    return None
+
+
+def start_server(port, users, auth_ms, rtdb_ms):
+    scratch = Path(tempfile.mkdtemp(prefix="travelviz-load-"))
+    env = dict(os.environ)
+    env.update({
+        "DB_PATH": str(scratch / "data.db"),
+        "WRITE_SPOOL_PATH": str(scratch / "write_spool.jsonl"),
+        "IMAGE_STORE_DIR": str(scratch / "avatars"),
+        "SESSION_SECRET": "load-secret",
+        "LOAD_USERS": str(users),
+        "LOAD_PASSWORD": PASSWORD,
+        "LOAD_AUTH_MS": str(auth_ms),
+        "LOAD_RTDB_MS": str(rtdb_ms),
+    })
+    if (APP_DIR / "data.db").exists():
+        import shutil
+
+        shutil.copy(APP_DIR / "data.db", scratch / "data.db")
+    server = subprocess.Popen(
+        [sys.executable, "-m", "streamlit", "run", str(LOAD_APP), "--server.port", str(port),
+         "--server.headless", "true", "--server.fileWatcherType", "none", "--browser.gatherUsageStats", "false"],
+        cwd=APP_DIR, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+    )
+    deadline = time.monotonic() + 60
+    while time.monotonic() < deadline:
+        try:
+            with socket.create_connection(("127.0.0.1", port), timeout=1):
+                return server
+        except OSError:
+            time.sleep(0.2)
+    server.terminate()
+    raise RuntimeError("Streamlit server did not start")
+
+
+def _percentile(values, pct):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * pct / 100))] if values else 0.0
+
+
+async def run_level(url, pid, sessions, first_user, args):
+    rng = random.Random(sessions)
+    users = [VirtualUser(url, first_user + i, args.think_ms / 1000, random.Random(rng.random()))
+             for i in range(sessions)]
+    rss_before = _rss_kib(pid)
+    start = time.monotonic()
+    deadline = start + args.duration
+
+    async def ramp(i, user):
+        # Spread session starts over the ramp-up period
+        await asyncio.sleep(args.ramp * i / sessions)
+        await user.run(deadline, args.questions)
+
+    tasks = [asyncio.ensure_future(ramp(i, user)) for i, user in enumerate(users)]
+    rss_peak = rss_before or 0
+    while not all(task.done() for task in tasks):
+        await asyncio.sleep(0.5)
+        rss_peak = max(rss_peak, _rss_kib(pid) or 0)
+    elapsed = time.monotonic() - start
+    for user in users:
+        await user.close()
+
+    samples = [s for user in users for s in user.samples]
+    latencies = [seconds * 1000 for kind, seconds in samples if kind not in ("open", "login")]
+    logins = [seconds * 1000 for kind, seconds in samples if kind == "login"]
+    return {
+        "sessions": sessions,
+        "interactions": len(latencies),
+        "throughput_per_s": len(latencies) / elapsed,
+        "p50_ms": _percentile(latencies, 50),
+        "p95_ms": _percentile(latencies, 95),
+        "p99_ms": _percentile(latencies, 99),
+        "login_p50_ms": statistics.median(logins) if logins else 0.0,
+        "login_retries": sum(user.login_retries for user in users),
+        "errors": sum(user.errors for user in users),
+        "rss_mib": rss_peak / 1024 if rss_before is not None else None,
+        "kib_per_session": (rss_peak - rss_before) / sessions if rss_before is not None else None,
+    }
+
+
+async def main_async(args):
+    port = _free_port()
+    server = start_server(port, sum(args.levels) + 1, args.auth_ms, args.rtdb_ms)
+    url = f"ws://127.0.0.1:{port}"
+    results = []
+    try:
+        # One throwaway session pays for imports and cache warm-up
+        await run_level(url, server.pid, 1, sum(args.levels), argparse.Namespace(**{**vars(args), "duration": 0}))
+        print(f"{'sessions':>8} {'interactions':>12} {'req/s':>7} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} "
+              f"{'login ms':>9} {'errors':>6} {'RSS MiB':>8} {'KiB/session':>11}")
+        first_user = 0
+        for sessions in args.levels:
+            r = await run_level(url, server.pid, sessions, first_user, args)
+            first_user += sessions
+            results.append(r)
+            rss = f"{r['rss_mib']:8.1f}" if r["rss_mib"] is not None else "     n/a"
+            per_session = f"{r['kib_per_session']:11.0f}" if r["kib_per_session"] is not None else "        n/a"
+            print(f"{sessions:>8} {r['interactions']:>12} {r['throughput_per_s']:7.1f} {r['p50_ms']:8.1f} "
+                  f"{r['p95_ms']:8.1f} {r['p99_ms']:8.1f} {r['login_p50_ms']:9.0f} {r['errors']:>6} {rss} {per_session}")
+    finally:
+        server.terminate()
+        server.wait(timeout=30)
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--levels", type=int, nargs="+", default=[1, 4, 16, 32], help="concurrent sessions per step")
+    parser.add_argument("--duration", type=float, default=30, help="seconds per level")
+    parser.add_argument("--ramp", type=float, default=5, help="seconds over which a level's sessions start")
+    parser.add_argument("--think-ms", type=float, default=500, help="mean pause between user actions")
+    parser.add_argument("--questions", type=int, default=3, help="chat questions per loop")
+    parser.add_argument("--auth-ms", type=float, default=80, help="mean injected Firebase Auth latency")
+    parser.add_argument("--rtdb-ms", type=float, default=40, help="mean injected RTDB latency")
+    parser.add_argument("--json", type=Path, help="also write the results to this file")
+    args = parser.parse_args()
+
+    results = asyncio.run(main_async(args))
+    if args.json:
+        args.json.write_text(json.dumps({"settings": vars(args) | {"json": str(args.json)}, "levels": results}, indent=2) + "\n")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,45 @@
+"""Lottie cache backoff when downloads fail"""
+import time
+
+import travelviz_assets
+
+URL = "https://assets.example.com/packages/lf20_test.json"
+
+
+class DownSession:
+    def __init__(self):
+        self.calls = 0
+
+    def get(self, url, headers=None, timeout=None):
+        self.calls += 1
+        raise ConnectionError("network is down")
+
+
+def test_stale_entry_is_not_refreshed_again_after_a_failure(tmp_path, monkeypatch):
+    session = DownSession()
+    monkeypatch.setattr(travelviz_assets, "get_session", lambda: session)
+    monkeypatch.setattr(travelviz_assets, "CACHE_DIR", tmp_path)
+    monkeypatch.setattr(travelviz_assets, "OFFLINE", False)
+    monkeypatch.setattr(travelviz_assets, "_memory", {URL: {"url": URL, "etag": None, "fetched_at": 0, "data": {"v": 1}}})
+    monkeypatch.setattr(travelviz_assets, "_failures", {})
+
+    for _ in range(5):
+        assert travelviz_assets.load_lottie(URL) == {"v": 1}
+        deadline = time.time() + 5
+        while travelviz_assets._refreshing and time.time() < deadline:
+            time.sleep(0.01)
+    assert session.calls == 1
+
+
+def test_cold_miss_is_not_retried_within_the_retry_window(tmp_path, monkeypatch):
+    session = DownSession()
+    monkeypatch.setattr(travelviz_assets, "get_session", lambda: session)
+    monkeypatch.setattr(travelviz_assets, "CACHE_DIR", tmp_path)
+    monkeypatch.setattr(travelviz_assets, "BUNDLED_DIR", tmp_path / "bundled")
+    monkeypatch.setattr(travelviz_assets, "OFFLINE", False)
+    monkeypatch.setattr(travelviz_assets, "_memory", {})
+    monkeypatch.setattr(travelviz_assets, "_failures", {})
+
+    for _ in range(5):
+        assert travelviz_assets.load_lottie(URL) is None
+    assert session.calls == 1 and not travelviz_assets._refreshing
@@ -0,0 +1,41 @@
+"""Chat history restored from the shared session store, then paged back through data.db"""
+from travelviz_chat import ChatHistory
+
+
+def ids(messages):
+    return [m["id"] for m in messages]
+
+
+def test_restored_buffer_loads_earlier_pages_without_duplicates(tmp_path):
+    db = tmp_path / "chat.db"
+    history = ChatHistory("u1", db, buffer_size=10)
+    for i in range(25):
+        history.append("user", f"question {i}")
+    stored = ids(history._query(None, 100))
+
+    # Resumed on another worker from the shared session store
+    restored = ChatHistory.from_state(history.to_state(), db, buffer_size=10)
+
+    page, has_earlier = restored.recent(20)
+    assert ids(page) == stored[5:] and has_earlier
+    # Messages appended after the restore, then further back than data.db goes
+    restored.append("user", "question 25")
+    stored = ids(history._query(None, 100))
+    page, has_earlier = restored.recent(40)
+    assert ids(page) == stored and not has_earlier
+    assert len(set(ids(page))) == len(page)
+    assert restored._truncated  # data.db still holds messages the buffer doesn't
+
+
+def test_truncated_is_cleared_only_when_data_db_has_nothing_older(tmp_path):
+    db = tmp_path / "chat.db"
+    history = ChatHistory("u1", db, buffer_size=5)
+    for i in range(5):
+        history.append("user", f"question {i}")
+    state = dict(history.to_state(), truncated=True)  # e.g. saved before a Clear Chat in another tab
+    ChatHistory("u1", db).clear()
+    restored = ChatHistory.from_state(state, db, buffer_size=5)
+
+    page, has_earlier = restored.recent(10)
+    assert len(page) == 5 and not has_earlier
+    assert not restored._truncated
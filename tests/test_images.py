@@ -0,0 +1,42 @@
+"""Image worker pool recovery after a worker process dies"""
+import io
+import os
+from concurrent.futures import Future
+from concurrent.futures.process import BrokenProcessPool
+
+import pytest
+
+import travelviz_images
+from travelviz_images import VARIANTS, image_digest, is_broken, process_image_async
+
+Image = pytest.importorskip("PIL.Image")
+
+
+def jpeg(color):
+    out = io.BytesIO()
+    Image.new("RGB", (400, 300), color).save(out, "JPEG")
+    return out.getvalue()
+
+
+def test_uploads_work_after_a_worker_died():
+    pool = travelviz_images._get_pool()
+    crashed = pool.submit(os._exit, 1)  # like a worker killed by the OOM killer
+    with pytest.raises(BrokenProcessPool):
+        crashed.result(timeout=60)
+
+    variants = process_image_async(jpeg("red")).result(timeout=60)
+    assert set(variants) == set(VARIANTS)
+    assert travelviz_images._get_pool() is not pool
+
+
+def test_upload_interrupted_by_a_dead_worker_is_resubmitted():
+    image = jpeg("blue")
+    digest = image_digest(image)
+    broken = Future()
+    broken.set_exception(BrokenProcessPool("worker died"))
+    travelviz_images._processed[digest] = broken
+    assert is_broken(broken)
+
+    future = process_image_async(image, digest)
+    assert future is not broken
+    assert set(future.result(timeout=60)) == set(VARIANTS)
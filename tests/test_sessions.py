@@ -0,0 +1,24 @@
+"""Refresh tokens are never stored in data.db in the clear"""
+import sqlite3
+
+import pytest
+
+import travelviz_sessions
+from travelviz_sessions import _decrypt_token, create_session, resume_session
+
+
+def test_refresh_token_is_stored_encrypted(tmp_path, monkeypatch):
+    monkeypatch.setenv("SESSION_SECRET", "test-secret")
+    monkeypatch.setattr(travelviz_sessions, "_secret", None)
+    db = tmp_path / "sessions.db"
+    token = create_session("uid-1", "refresh-secret-value", db_path=db)
+
+    stored = sqlite3.connect(db).execute("SELECT refresh_token FROM sessions").fetchone()[0]
+    assert "refresh-secret-value" not in stored
+    assert _decrypt_token(stored) == "refresh-secret-value"
+    assert resume_session(token, db_path=db) == "uid-1"
+
+    # A row written under another secret can't be read back
+    monkeypatch.setattr(travelviz_sessions, "_secret", b"other-secret")
+    with pytest.raises(ValueError):
+        _decrypt_token(stored)
@@ -0,0 +1,122 @@
+"""Write queue spools shared by several queues (worker processes), and failure isolation within a batch"""
+import json
+import threading
+
+import pytest
+
+import travelviz_writes
+from travelviz_writes import WriteHandle, WriteQueue
+
+needs_flock = pytest.mark.skipif(travelviz_writes.fcntl is None, reason="spool adoption needs flock")
+
+
+class FakeDB:
+    def __init__(self, fail=False):
+        self.fail = fail
+        self.updates = []
+        self.lock = threading.Lock()
+
+    def update(self, data):
+        if self.fail:
+            raise ConnectionError("offline")
+        with self.lock:
+            self.updates.append(data)
+
+    def written(self):
+        with self.lock:
+            return {path: value for update in self.updates for path, value in update.items()}
+
+
+def spool_lines(path):
+    return [json.loads(line) for line in path.read_text().splitlines()]
+
+
+@needs_flock
+def test_live_queues_keep_their_own_spools(tmp_path):
+    base = tmp_path / "write_spool.jsonl"
+    offline = FakeDB(fail=True)
+    first = WriteQueue(lambda: offline, base)
+    first.set("feedback/a", {"message": "hello"})
+
+    db = FakeDB()
+    second = WriteQueue(lambda: db, base)
+    second.set("users/u1/theme", "light")
+    assert second.flush(timeout=5)
+
+    # The second queue neither replayed nor wiped the first one's pending write
+    assert db.written() == {"users/u1/theme": "light"}
+    assert first._spool_path != second._spool_path
+    assert [r["path"] for r in spool_lines(first._spool_path) if r["op"] == "set"] == ["feedback/a"]
+    assert first.pending_count() == 1
+
+
+@needs_flock
+def test_spools_of_dead_processes_are_adopted_once(tmp_path):
+    base = tmp_path / "write_spool.jsonl"
+    # Left behind by a crashed worker (nothing holds its lock) and by an older single-spool version
+    (tmp_path / "write_spool.999-dead.jsonl").write_text(
+        json.dumps({"op": "set", "id": "w1", "path": "feedback/x", "value": 1}) + "\n"
+        + json.dumps({"op": "set", "id": "w2", "path": "feedback/y", "value": 2}) + "\n"
+        + json.dumps({"op": "done", "ids": ["w2"]}) + "\n"
+    )
+    base.write_text(json.dumps({"op": "set", "id": "w3", "path": "users/u1/theme", "value": "dark"}) + "\n")
+
+    db = FakeDB()
+    queue = WriteQueue(lambda: db, base)
+    assert queue.flush(timeout=5)
+    assert db.written() == {"feedback/x": 1, "users/u1/theme": "dark"}
+    assert sorted(tmp_path.iterdir()) == [queue._spool_path]
+
+    other_db = FakeDB()
+    other = WriteQueue(lambda: other_db, base)
+    assert other.flush(timeout=5)
+    assert other_db.written() == {}
+
+
+class RulesDB(FakeDB):
+    """Rejects any update touching a denied path, like RTDB security rules"""
+
+    def __init__(self, denied):
+        super().__init__()
+        self.denied = denied
+
+    def update(self, data):
+        if self.denied in data:
+            raise ValueError('401 Client Error: Unauthorized [{"error": "Permission denied"}]')
+        super().update(data)
+
+
+def test_a_rejected_path_fails_alone(tmp_path):
+    db = RulesDB("admin/secret")
+    queue = WriteQueue(lambda: db, tmp_path / "write_spool.jsonl")
+    # Hold the worker back so every write lands in one batch
+    with queue._cond:
+        handles = [queue.set(f"feedback/f{i}", i) for i in range(6)]
+        bad = queue.set("admin/secret", "x")
+        handles += [queue.set(f"users/u{i}/theme", "dark") for i in range(6)]
+    assert queue.flush(timeout=5)
+
+    assert bad.status == WriteHandle.FAILED and "Permission denied" in bad.error
+    assert all(handle.status == WriteHandle.WRITTEN for handle in handles)
+    assert db.written() == {**{f"feedback/f{i}": i for i in range(6)}, **{f"users/u{i}/theme": "dark" for i in range(6)}}
+    assert queue.stats["retries"] == 0
+
+
+def test_outages_are_retried_not_split(tmp_path, monkeypatch):
+    monkeypatch.setattr(travelviz_writes, "BACKOFF_BASE", 0.01)
+    db = FakeDB()
+    failures = iter([ConnectionError("Max retries exceeded"), ValueError("503 Server Error")])
+
+    def flaky_update(data, update=db.update):
+        error = next(failures, None)
+        if error is not None:
+            raise error
+        update(data)
+
+    db.update = flaky_update
+    queue = WriteQueue(lambda: db, tmp_path / "write_spool.jsonl")
+    with queue._cond:
+        handles = [queue.set("feedback/a", 1), queue.set("feedback/b", 2)]
+    assert queue.flush(timeout=5)
+    assert [handle.status for handle in handles] == [WriteHandle.WRITTEN] * 2
+    assert queue.stats["retries"] == 2 and len(db.updates) == 1
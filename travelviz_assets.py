@@ -0,0 +1,204 @@
+"""Two-tier (memory + disk) cache for Lottie animations with background revalidation"""
+import hashlib
+import json
+import os
+import sys
+import threading
+import time
+from pathlib import Path
+from urllib.parse import urlparse
+
+from travelviz_http import get_session
+
+APP_DIR = Path(__file__).parent
+
+# Animation files shipped with the app, named after the last URL segment
+# (e.g. assets/lottie/lf20_puciaact.json). Not committed: populate with
+# `python travelviz_assets.py --bundle` before starting without network access
+BUNDLED_DIR = APP_DIR / "assets" / "lottie"
+CACHE_DIR = Path(os.getenv("LOTTIE_CACHE_DIR", APP_DIR / ".cache" / "lottie"))
+
+# Fresh entries are served without any network traffic
+LOTTIE_TTL_SECONDS = float(os.getenv("LOTTIE_TTL_SECONDS", 24 * 60 * 60))
+# After a failed download we neither block a render on that URL nor retry it for a while
+LOTTIE_RETRY_SECONDS = 5 * 60
+LOTTIE_TIMEOUT = 8
+
+# Never touch the network; serve bundled and disk-cached animations only
+OFFLINE = os.getenv("TRAVELVIZ_OFFLINE_ASSETS", "").lower() in ("1", "true", "yes")
+
+_lock = threading.Lock()
+_memory = {}
+_failures = {}
+_refreshing = set()
+_stats = {
+    "memory_hits": 0,
+    "disk_hits": 0,
+    "bundled_hits": 0,
+    "misses": 0,
+    "refreshes": 0,
+    "not_modified": 0,
+    "errors": 0,
+}
+
+
+def _count(name):
+    with _lock:
+        _stats[name] += 1
+
+
+def lottie_cache_stats():
+    """Return a snapshot of the cache hit/miss counters"""
+    with _lock:
+        return dict(_stats, entries=len(_memory))
+
+
+def _cache_file(url):
+    return CACHE_DIR / f"{hashlib.sha1(url.encode()).hexdigest()}.json"
+
+
+def _bundled_file(url):
+    name = Path(urlparse(url).path).name
+    return BUNDLED_DIR / name if name else None
+
+
+def _read_disk(url):
+    """Load an entry from the disk cache, falling back to the bundled copy"""
+    try:
+        entry = json.loads(_cache_file(url).read_text())
+        if entry.get("url") == url and entry.get("data") is not None:
+            _count("disk_hits")
+            return entry
+    except (OSError, ValueError):
+        pass
+
+    bundled = _bundled_file(url)
+    if bundled is not None and bundled.exists():
+        try:
+            data = json.loads(bundled.read_text())
+        except ValueError:
+            return None
+        _count("bundled_hits")
+        # Bundled assets have no freshness info; treat them as stale so a
+        # background refresh replaces them when the network is available
+        return {"url": url, "etag": None, "fetched_at": 0, "data": data}
+    return None
+
+
+def _write_disk(entry):
+    try:
+        CACHE_DIR.mkdir(parents=True, exist_ok=True)
+        path = _cache_file(entry["url"])
+        tmp = path.with_suffix(".tmp")
+        tmp.write_text(json.dumps(entry))
+        tmp.replace(path)
+    except OSError as e:
+        print(f"Lottie cache write error: {e}")
+
+
+def _fetch(url, etag=None):
+    """Download (or revalidate) one animation: new entry, None when unchanged (304), False on failure"""
+    headers = {"If-None-Match": etag} if etag else {}
+    try:
+        r = get_session().get(url, headers=headers, timeout=LOTTIE_TIMEOUT)
+        if r.status_code == 304:
+            _count("not_modified")
+            return None
+        if r.status_code != 200:
+            raise ValueError(f"HTTP {r.status_code}")
+        data = r.json()
+    except Exception as e:
+        _count("errors")
+        with _lock:
+            _failures[url] = time.time()
+        print(f"Lottie download error for {url}: {e}")
+        return False
+
+    entry = {"url": url, "etag": r.headers.get("ETag"), "fetched_at": time.time(), "data": data}
+    _write_disk(entry)
+    with _lock:
+        _failures.pop(url, None)
+    return entry
+
+
+def _refresh(url, etag):
+    try:
+        entry = _fetch(url, etag)
+        if entry is None and url in _memory:
+            # 304: keep the data, restart the TTL
+            entry = dict(_memory[url], fetched_at=time.time())
+            _write_disk(entry)
+        if entry:
+            with _lock:
+                _memory[url] = entry
+    finally:
+        with _lock:
+            _refreshing.discard(url)
+
+
+def _recently_failed(url):
+    failed_at = _failures.get(url)
+    return failed_at is not None and time.time() - failed_at < LOTTIE_RETRY_SECONDS
+
+
+def _schedule_refresh(url, etag):
+    """Revalidate an entry on a background thread (at most one per URL)"""
+    if OFFLINE:
+        return
+    with _lock:
+        if url in _refreshing:
+            return
+        _refreshing.add(url)
+        _stats["refreshes"] += 1
+    threading.Thread(target=_refresh, args=(url, etag), daemon=True).start()
+
+
+def load_lottie(url: str):
+    """Return Lottie JSON for url, serving cached copies and refreshing them in the background"""
+    entry = _memory.get(url)
+    if entry is not None:
+        _count("memory_hits")
+    else:
+        entry = _read_disk(url)
+        if entry is not None:
+            with _lock:
+                _memory[url] = entry
+
+    if entry is not None:
+        # A stale entry whose last refresh failed keeps being served until the retry window passes
+        if time.time() - entry["fetched_at"] > LOTTIE_TTL_SECONDS and not _recently_failed(url):
+            _schedule_refresh(url, entry.get("etag"))
+        return entry["data"]
+
+    _count("misses")
+    if OFFLINE:
+        return None
+
+    # Cold miss: only block the render (once) if this URL hasn't failed recently
+    if _recently_failed(url):
+        return None
+
+    entry = _fetch(url)
+    if not entry:
+        return None
+    with _lock:
+        _memory[url] = entry
+    return entry["data"]
+
+
+def bundle_assets(urls):
+    """Download animations into BUNDLED_DIR so the app can start without network access"""
+    BUNDLED_DIR.mkdir(parents=True, exist_ok=True)
+    for url in urls:
+        r = get_session().get(url, timeout=LOTTIE_TIMEOUT)
+        r.raise_for_status()
+        path = _bundled_file(url)
+        path.write_text(json.dumps(r.json()))
+        print(f"Bundled {url} -> {path.relative_to(APP_DIR)}")
+
+
+if __name__ == "__main__":
+    if len(sys.argv) > 2 and sys.argv[1] == "--bundle":
+        bundle_assets(sys.argv[2:])
+    else:
+        print("usage: python travelviz_assets.py --bundle URL [URL ...]")
@@ -0,0 +1,150 @@
+"""Concurrent login and signup pipeline on top of the blocking pyrebase clients
+
+pyrebase calls run in a shared thread pool and are orchestrated with asyncio
+so independent round trips overlap:
+
+- the profile of a returning user is prefetched while the password is being
+  verified (speculatively, by the uid last seen for that email; it is only
+  used if sign-in succeeds for that same uid);
+- the session row is written while the profile is fetched;
+- profile writes (signup data, fallback profiles) go to the background write
+  queue instead of blocking the response.
+
+Every call records per-step timings in milliseconds.
+"""
+import asyncio
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+from travelviz_guard import CircuitOpenError
+from travelviz_metrics import observe
+from travelviz_profiles import fetch_profile, queue_profile
+from travelviz_sessions import create_session
+
+AUTH_WORKERS = 16
+# email -> uid of recent sign-ins, used to start the profile fetch early
+KNOWN_UIDS_SIZE = 10000
+
+_executor = ThreadPoolExecutor(max_workers=AUTH_WORKERS, thread_name_prefix="firebase-auth")
+_known_uids = OrderedDict()
+_known_lock = threading.Lock()
+
+
+class AuthFailed(Exception):
+    """Firebase rejected the credentials; str() keeps Firebase's error payload"""
+
+
+class LoginResult:
+    """Outcome of a successful sign-in"""
+
+    def __init__(self, user, profile, profile_error, session_token, timings):
+        self.user = user
+        self.profile = profile
+        self.profile_error = profile_error
+        self.session_token = session_token
+        self.timings = timings
+
+
+def _remember_uid(email, uid):
+    with _known_lock:
+        _known_uids[email.lower()] = uid
+        _known_uids.move_to_end(email.lower())
+        while len(_known_uids) > KNOWN_UIDS_SIZE:
+            _known_uids.popitem(last=False)
+
+
+def _known_uid(email):
+    with _known_lock:
+        return _known_uids.get(email.lower())
+
+
+async def _step(timings, name, fn, *args):
+    """Run a blocking call in the pool and record how long it took"""
+    loop = asyncio.get_running_loop()
+    start = time.perf_counter()
+    try:
+        return await loop.run_in_executor(_executor, fn, *args)
+    finally:
+        timings[name] = (time.perf_counter() - start) * 1000
+
+
+def _fetch_profile(clients, uid):
+    # pyrebase Database objects keep per-call path state, so concurrent
+    # fetches each get their own (cheap) instance
+    return fetch_profile(clients.database(), uid)
+
+
+async def _login(clients, email, password):
+    timings = {}
+    start = time.perf_counter()
+
+    guessed_uid = _known_uid(email)
+    prefetch = None
+    if guessed_uid:
+        prefetch = asyncio.ensure_future(_step(timings, "profile_prefetch", _fetch_profile, clients, guessed_uid))
+
+    try:
+        user = await _step(timings, "sign_in", clients.auth.sign_in_with_email_and_password, email, password)
+    except Exception as e:
+        if prefetch is not None:
+            # Never hand out a profile without a successful sign-in
+            prefetch.cancel()
+        if isinstance(e, CircuitOpenError):
+            raise
+        raise AuthFailed(str(e)) from e
+
+    uid = user['localId']
+    if prefetch is not None and uid != guessed_uid:
+        prefetch.cancel()
+        prefetch = None
+    profile_task = prefetch or asyncio.ensure_future(_step(timings, "profile", _fetch_profile, clients, uid))
+    session_task = asyncio.ensure_future(_step(timings, "session", create_session, uid, user['refreshToken']))
+    profile, session_token = await asyncio.gather(profile_task, session_task, return_exceptions=True)
+
+    profile_error = None
+    if isinstance(profile, BaseException):
+        profile_error, profile = profile, None
+    if isinstance(session_token, BaseException):
+        print(f"Session store error: {session_token}")
+        session_token = None
+
+    _remember_uid(email, uid)
+    timings["total"] = (time.perf_counter() - start) * 1000
+    return LoginResult(user, profile, profile_error, session_token, timings)
+
+
+def login(clients, email, password):
+    """Sign in and load the profile with overlapping round trips
+
+    Raises AuthFailed when Firebase rejects the sign-in, or CircuitOpenError
+    while Firebase Auth is failing fast.
+    """
+    result = asyncio.run(_login(clients, email, password))
+    print("Login timings: " + ", ".join(f"{k}={v:.0f} ms" for k, v in result.timings.items()))
+    for step, ms in result.timings.items():
+        observe("login_step", ms / 1000, step=step)
+    return result
+
+
+async def _sign_up(clients, email, password, profile):
+    timings = {}
+    start = time.perf_counter()
+    user = await _step(timings, "create_user", clients.auth.create_user_with_email_and_password, email, password)
+    uid = user['localId']
+    # The profile only has to be in RTDB by the time the user logs in; the
+    # cache is primed right away and the write is flushed in the background
+    queue_profile(uid, profile)
+    _remember_uid(email, uid)
+    timings["total"] = (time.perf_counter() - start) * 1000
+    return user, timings
+
+
+def sign_up(clients, email, password, profile):
+    """Create the account and queue its profile write; returns (user, timings)"""
+    user, timings = asyncio.run(_sign_up(clients, email, password, profile))
+    print("Signup timings: " + ", ".join(f"{k}={v:.0f} ms" for k, v in timings.items()))
+    for step, ms in timings.items():
+        observe("signup_step", ms / 1000, step=step)
+    return user, timings
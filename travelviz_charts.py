@@ -0,0 +1,99 @@
+"""Server-side downsampling of arrivals time series for native Streamlit charts"""
+import math
+from functools import lru_cache
+
+import numpy as np
+
+from travelviz_rollups import get_cube
+from travelviz_store import DB_PATH
+
+# Roughly one plotted point every couple of pixels is all a line chart can show
+PX_PER_POINT = 2
+DEFAULT_CHART_WIDTH = 800
+CACHE_SIZE = 512
+
+
+def points_for_width(width_px=DEFAULT_CHART_WIDTH):
+    """Number of points worth sending for a chart width_px pixels wide"""
+    return max(3, int(width_px) // PX_PER_POINT)
+
+
+def lttb(x, y, n_out):
+    """Largest-Triangle-Three-Buckets downsampling; keeps the visual shape of the series"""
+    n = len(x)
+    if n_out >= n or n_out < 3:
+        return x, y
+
+    every = (n - 2) / (n_out - 2)
+    idx = np.empty(n_out, dtype=np.int64)
+    idx[0], idx[-1] = 0, n - 1
+    a = 0
+    for i in range(n_out - 2):
+        start = int(math.floor(i * every)) + 1
+        end = int(math.floor((i + 1) * every)) + 1
+        next_end = min(int(math.floor((i + 2) * every)) + 1, n)
+        avg_x = x[end:next_end].mean()
+        avg_y = y[end:next_end].mean()
+
+        # Twice the triangle area between the last kept point, each candidate
+        # in this bucket and the average of the next bucket
+        area = np.abs((x[a] - avg_x) * (y[start:end] - y[a]) - (x[a] - x[start:end]) * (avg_y - y[a]))
+        a = start + int(np.argmax(area))
+        idx[i + 1] = a
+    return x[idx], y[idx]
+
+
+def minmax(x, y, n_out):
+    """Min/max bucketing: keep each bucket's extremes so spikes are never dropped"""
+    n = len(x)
+    buckets = n_out // 2
+    if n_out >= n or buckets < 1:
+        return x, y
+
+    # Equal-width buckets as rows of a matrix; the tail is padded with the last value
+    size = math.ceil(n / buckets)
+    padded = np.pad(y, (0, buckets * size - n), mode="edge").reshape(buckets, size)
+    offsets = np.arange(buckets) * size
+    idx = np.concatenate([offsets + padded.argmin(axis=1), offsets + padded.argmax(axis=1), [0, n - 1]])
+    idx = np.unique(np.minimum(idx, n - 1))
+    return x[idx], y[idx]
+
+
+DOWNSAMPLERS = {"lttb": lttb, "minmax": minmax}
+
+
+def downsample(x, y, n_out, method="lttb"):
+    """Reduce (x, y) to at most about n_out points with the chosen method"""
+    return DOWNSAMPLERS[method](np.asarray(x), np.asarray(y, dtype=np.float64), n_out)
+
+
+@lru_cache(maxsize=CACHE_SIZE)
+def _cached_series(path, version, series, year_from, year_to, points, method):
+    cube = get_cube(path)
+    start, stop = cube.year_slice(year_from, year_to)
+    x = cube.years[start:stop]
+    if series == "global":
+        y = cube.year_totals[start:stop]
+    else:
+        row = cube.index[series]
+        keep = cube.present[row, start:stop]
+        x, y = x[keep], cube.values[row, start:stop][keep]
+    return downsample(x, y, points, method)
+
+
+def chart_series(series, year_from=None, year_to=None, width_px=DEFAULT_CHART_WIDTH, method="lttb", db_path=None):
+    """Return a downsampled (x, y) series: "global" or a country code
+
+    Results are cached by (data version, series, range, width), so reruns and
+    other sessions asking for the same chart reuse the downsampled arrays.
+    """
+    path = str(db_path or DB_PATH)
+    cube = get_cube(path)
+    if not cube or (series != "global" and series not in cube.index):
+        return np.array([]), np.array([])
+    return _cached_series(path, cube.version, series, year_from, year_to, points_for_width(width_px), method)
+
+
+def chart_cache_info():
+    """Hit/miss counters of the downsampled series cache"""
+    return _cached_series.cache_info()
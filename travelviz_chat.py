@@ -0,0 +1,149 @@
+"""Bounded AI Insights chat history with its full log persisted in data.db
+
+Each session keeps only the most recent messages in a fixed-size ring
+buffer; every message is also appended to the chat_messages table as it is
+added. The page renders one page of messages and fetches earlier pages from
+data.db on demand, so render cost and session memory stay flat however long
+the conversation gets.
+"""
+import itertools
+import os
+import sqlite3
+import time
+from collections import deque
+
+from travelviz_store import DB_PATH, connection
+
+# Messages kept in memory per session, and rendered per "load earlier" page
+CHAT_BUFFER_SIZE = int(os.getenv("CHAT_BUFFER_SIZE", 50))
+CHAT_PAGE_SIZE = int(os.getenv("CHAT_PAGE_SIZE", 20))
+# Messages kept in data.db per user; older ones are pruned when a session starts
+CHAT_RETENTION = int(os.getenv("CHAT_RETENTION", 1000))
+
+# Ids for messages that could not be persisted (negative, so never confused with row ids)
+_local_ids = itertools.count(-1, -1)
+
+
+class ChatHistory:
+    """Ring buffer of the latest messages of one user, backed by data.db"""
+
+    def __init__(self, uid, db_path=None, buffer_size=CHAT_BUFFER_SIZE):
+        self.uid = uid
+        self.db_path = str(db_path or DB_PATH)
+        self._buffer = deque(maxlen=buffer_size)
+        # True once data.db holds messages that no longer fit in the buffer
+        self._truncated = False
+        if uid:
+            self._prune()
+            self._buffer.extend(self._query(None, buffer_size) or [])
+            self._truncated = len(self._buffer) == buffer_size
+
+    @classmethod
+    def from_state(cls, state, db_path=None, buffer_size=CHAT_BUFFER_SIZE):
+        """Rebuild a history saved by to_state() without querying data.db"""
+        history = cls(None, db_path, buffer_size)
+        history.uid = state["uid"]
+        history._buffer.extend({"id": m[0], "role": m[1], "content": m[2]} for m in state["messages"])
+        history._truncated = state["truncated"] or len(state["messages"]) > buffer_size
+        return history
+
+    def to_state(self):
+        """The buffer as plain JSON-serializable data, for the shared session store"""
+        return {
+            "uid": self.uid,
+            "messages": [[m["id"], m["role"], m["content"]] for m in self._buffer],
+            "truncated": self._truncated,
+        }
+
+    def __len__(self):
+        return len(self._buffer)
+
+    def _query(self, before_id, limit):
+        """Up to `limit` persisted messages older than before_id (all if None), oldest first; None on error"""
+        sql = "SELECT id, role, content FROM chat_messages WHERE uid = ?"
+        params = [self.uid]
+        if before_id is not None:
+            sql += " AND id < ?"
+            params.append(before_id)
+        sql += " ORDER BY id DESC LIMIT ?"
+        params.append(limit)
+        try:
+            with connection(self.db_path) as conn:
+                rows = conn.execute(sql, params).fetchall()
+        except sqlite3.Error as e:
+            print(f"Chat history error: {e}")
+            return None
+        return [{"id": row[0], "role": row[1], "content": row[2]} for row in reversed(rows)]
+
+    def _prune(self):
+        try:
+            with connection(self.db_path) as conn:
+                with conn:
+                    conn.execute(
+                        "DELETE FROM chat_messages WHERE uid = ? AND id < "
+                        "(SELECT id FROM chat_messages WHERE uid = ? ORDER BY id DESC LIMIT 1 OFFSET ?)",
+                        (self.uid, self.uid, CHAT_RETENTION - 1),
+                    )
+        except sqlite3.Error as e:
+            print(f"Chat history error: {e}")
+
+    def append(self, role, content):
+        """Add a message to the buffer and append it to data.db"""
+        msg_id = None
+        if self.uid:
+            try:
+                with connection(self.db_path) as conn:
+                    with conn:
+                        msg_id = conn.execute(
+                            "INSERT INTO chat_messages (uid, role, content, created_at) VALUES (?, ?, ?, ?)",
+                            (self.uid, role, content, time.time()),
+                        ).lastrowid
+            except sqlite3.Error as e:
+                print(f"Chat history error: {e}")
+        if len(self._buffer) == self._buffer.maxlen and self.uid:
+            self._truncated = True
+        self._buffer.append({"id": msg_id if msg_id is not None else next(_local_ids), "role": role, "content": content})
+
+    def recent(self, count):
+        """The latest `count` messages, oldest first, and whether older ones exist
+
+        Messages still in the buffer cost nothing; older pages come from data.db.
+        """
+        buffered = list(self._buffer)
+        if count <= len(buffered):
+            return buffered[len(buffered) - count:], count < len(buffered) or self._truncated
+        if not self._truncated:
+            return buffered, False
+        # A restored buffer may hold rows data.db also returns: skip them by id
+        seen = {m["id"] for m in buffered}
+        persisted = [i for i in seen if i > 0]
+        before_id = min(persisted) if persisted else None
+        missing = count - len(buffered)
+        earlier = []
+        while len(earlier) <= missing:
+            wanted = missing + 1 - len(earlier)
+            rows = self._query(before_id, wanted)
+            if rows is None:
+                break
+            earlier = [m for m in rows if m["id"] not in seen] + earlier
+            if len(rows) < wanted:
+                # data.db is exhausted; if it had nothing older at all, the buffer holds everything
+                if not earlier:
+                    self._truncated = False
+                break
+            before_id = rows[0]["id"]
+        if len(earlier) > missing:
+            return earlier[len(earlier) - missing:] + buffered, True
+        return earlier + buffered, False
+
+    def clear(self):
+        """Forget the conversation, in memory and in data.db"""
+        self._buffer.clear()
+        self._truncated = False
+        if self.uid:
+            try:
+                with connection(self.db_path) as conn:
+                    with conn:
+                        conn.execute("DELETE FROM chat_messages WHERE uid = ?", (self.uid,))
+            except sqlite3.Error as e:
+                print(f"Chat history error: {e}")
@@ -0,0 +1,131 @@
+"""Process-wide Firebase client registry shared by every Streamlit session and rerun"""
+import os
+import threading
+import time
+from pathlib import Path
+
+from dotenv import load_dotenv
+
+APP_DIR = Path(__file__).parent
+ENV_FILE = APP_DIR / ".env"
+
+# Keys that must be present before we try to talk to Firebase
+REQUIRED_CONFIG_KEYS = ("apiKey", "databaseURL", "authDomain")
+
+
+class FirebaseConfigError(ValueError):
+    """Raised when required Firebase settings are missing"""
+
+
+class FirebaseClients:
+    """Bundle of the pyrebase app and the service clients built from it
+
+    auth and db go through the process-wide circuit breakers (travelviz_guard);
+    use database() for a separate guarded RTDB handle in another thread.
+    """
+
+    def __init__(self, app, auth, db, config, fingerprint, init_seconds, generation):
+        self.app = app
+        self.auth = auth
+        self.db = db
+        self.config = config
+        self.fingerprint = fingerprint
+        self.init_seconds = init_seconds
+        self.generation = generation
+
+    def database(self):
+        """A new guarded RTDB client (pyrebase Database objects carry per-call path state)"""
+        from travelviz_guard import GuardedClient, rtdb_breaker
+
+        return GuardedClient(self.app.database(), rtdb_breaker)
+
+
+_lock = threading.Lock()
+_clients = None
+_env_mtime = None
+_env_loaded = False
+
+
+def _refresh_env():
+    """Load .env once, and again only when the file changes on disk"""
+    global _env_mtime, _env_loaded
+    try:
+        mtime = ENV_FILE.stat().st_mtime
+    except OSError:
+        mtime = None
+
+    if _env_loaded and mtime == _env_mtime:
+        return
+
+    # The first load keeps real environment variables authoritative; later
+    # loads pick up edits to .env without restarting the server
+    load_dotenv(ENV_FILE, override=_env_loaded)
+    _env_mtime = mtime
+    _env_loaded = True
+
+
+def load_firebase_config():
+    """Read Firebase configuration from the environment"""
+    _refresh_env()
+    return {
+        "apiKey": os.getenv("FIREBASE_API_KEY"),
+        "authDomain": os.getenv("FIREBASE_AUTH_DOMAIN"),
+        "projectId": os.getenv("FIREBASE_PROJECT_ID"),
+        "storageBucket": os.getenv("FIREBASE_STORAGE_BUCKET"),
+        "messagingSenderId": os.getenv("FIREBASE_MESSAGING_SENDER_ID"),
+        "appId": os.getenv("FIREBASE_APP_ID"),
+        "databaseURL": os.getenv("FIREBASE_DATABASE_URL")
+    }
+
+
+def _fingerprint(config):
+    return tuple(sorted(config.items()))
+
+
+def check_firebase_config():
+    """Validate the Firebase settings without building clients (raises FirebaseConfigError)"""
+    config = load_firebase_config()
+    missing = [key for key in REQUIRED_CONFIG_KEYS if not config[key]]
+    if missing:
+        raise FirebaseConfigError(f"Missing Firebase configuration: {', '.join(missing)}")
+    return config
+
+
+def get_firebase():
+    """Return the shared Firebase clients, building them on first use or after a config change"""
+    global _clients
+    config = check_firebase_config()
+    fingerprint = _fingerprint(config)
+
+    clients = _clients
+    if clients is not None and clients.fingerprint == fingerprint:
+        return clients
+
+    with _lock:
+        # Another session may have rebuilt the clients while we waited
+        if _clients is not None and _clients.fingerprint == fingerprint:
+            return _clients
+
+        start = time.perf_counter()
+        # pyrebase (and its google-auth/httplib2 stack) is only imported once a
+        # session actually talks to Firebase, keeping it off the cold-start path
+        import pyrebase
+
+        from travelviz_http import get_session, route_module_requests
+
+        # Auth calls requests.post directly and RTDB uses app.requests: route
+        # both through the shared keep-alive pool
+        route_module_requests("pyrebase.pyrebase")
+        app = pyrebase.initialize_app(config)
+        app.requests = get_session()
+
+        from travelviz_guard import GuardedClient, auth_breaker, rtdb_breaker
+
+        auth = GuardedClient(app.auth(), auth_breaker)
+        db = GuardedClient(app.database(), rtdb_breaker)
+        init_seconds = time.perf_counter() - start
+
+        generation = _clients.generation + 1 if _clients is not None else 1
+        _clients = FirebaseClients(app, auth, db, config, fingerprint, init_seconds, generation)
+        print(f"Firebase clients initialized in {init_seconds * 1000:.1f} ms (generation {generation})")
+        return _clients
@@ -0,0 +1,186 @@
+"""Vectorized next-year arrivals forecasts for every country at once
+
+Two simple models are fitted for all countries in the same NumPy operations
+(no per-country Python loop): a least-squares linear trend and Holt's linear
+exponential smoothing over a small (alpha, beta) grid. Each country keeps the
+model with the lower in-sample error.
+
+Usage: python travelviz_forecast.py [--db data.db] [--top 10]
+"""
+import argparse
+import threading
+import time
+
+import numpy as np
+
+from travelviz_rollups import get_cube
+from travelviz_store import DB_PATH, format_arrivals
+
+HOLT_ALPHAS = (0.2, 0.5, 0.8)
+HOLT_BETAS = (0.1, 0.3, 0.6)
+
+
+def fit_trend(years, values, present):
+    """Least-squares line per country; returns (next-year forecast, RMSE)"""
+    w = present.astype(np.float64)
+    x = (years - years[0]).astype(np.float64)
+    n = w.sum(axis=1)
+    sx = w @ x
+    sy = (w * values).sum(axis=1)
+    sxx = w @ (x * x)
+    sxy = (w * values) @ x
+
+    denom = n * sxx - sx * sx
+    with np.errstate(divide="ignore", invalid="ignore"):
+        slope = np.where(denom > 0, (n * sxy - sx * sy) / denom, 0.0)
+        intercept = np.where(n > 0, (sy - slope * sx) / n, 0.0)
+        residuals = np.where(present, values - (intercept[:, None] + slope[:, None] * x), 0.0)
+        rmse = np.sqrt((residuals ** 2).sum(axis=1) / np.maximum(n, 1))
+    return intercept + slope * (x[-1] + 1), rmse
+
+
+def fit_holt(values, present, alphas=HOLT_ALPHAS, betas=HOLT_BETAS):
+    """Holt's linear smoothing for every (alpha, beta, country) at once; returns (forecast, RMSE)"""
+    grid_a, grid_b = np.meshgrid(alphas, betas, indexing="ij")
+    a = grid_a.reshape(-1, 1)
+    b = grid_b.reshape(-1, 1)
+    shape = (len(a), values.shape[0])
+
+    level = np.zeros(shape)
+    trend = np.zeros(shape)
+    started = np.zeros(values.shape[0], dtype=bool)
+    sse = np.zeros(shape)
+    steps = np.zeros(values.shape[0])
+
+    for t in range(values.shape[1]):
+        obs = values[:, t]
+        seen = present[:, t]
+        update = started & seen
+        pred = level + trend
+
+        # One-step-ahead error, then the standard Holt update where observed;
+        # missing years just carry the projection forward
+        sse += np.where(update, (obs - pred) ** 2, 0.0)
+        steps += update
+        new_level = a * obs + (1 - a) * pred
+        new_trend = b * (new_level - level) + (1 - b) * trend
+        level = np.where(update, new_level, np.where(started, pred, level))
+        trend = np.where(update, new_trend, trend)
+
+        first = seen & ~started
+        level = np.where(first, obs, level)
+        started |= first
+
+    best = sse.argmin(axis=0)
+    cols = np.arange(values.shape[0])
+    forecast = (level + trend)[best, cols]
+    rmse = np.sqrt(sse[best, cols] / np.maximum(steps, 1))
+    return forecast, rmse
+
+
+class Forecasts:
+    """Next-year forecast per cube country plus the model that produced it"""
+
+    def __init__(self, cube, trend, trend_rmse, holt, holt_rmse, fit_seconds):
+        self.codes = cube.codes
+        self.names = cube.names
+        self.target_year = int(cube.years[-1]) + 1 if len(cube.years) else None
+        points = cube.present.sum(axis=1)
+
+        use_trend = trend_rmse < holt_rmse
+        forecast = np.where(use_trend, trend, holt)
+        # Too little history for either model: repeat the last observation
+        last_idx = cube.present.shape[1] - 1 - np.argmax(cube.present[:, ::-1], axis=1)
+        last = cube.values[np.arange(len(cube)), last_idx]
+        forecast = np.where(points < 3, last, forecast)
+
+        self.values = np.maximum(forecast, 0.0)
+        self.model = np.where(points < 3, "naive", np.where(use_trend, "trend", "holt"))
+        self.fit_seconds = fit_seconds
+        self.index = cube.index
+
+    @property
+    def total(self):
+        return float(self.values.sum())
+
+    def total_for(self, mask):
+        """Sum of forecasts for a boolean country mask (see ArrivalsCube.country_mask)"""
+        return float(self.values[mask].sum())
+
+
+def fit_forecasts(cube):
+    """Fit both models for every country in the cube"""
+    start = time.perf_counter()
+    trend, trend_rmse = fit_trend(cube.years, cube.values, cube.present)
+    holt, holt_rmse = fit_holt(cube.values, cube.present)
+    return Forecasts(cube, trend, trend_rmse, holt, holt_rmse, time.perf_counter() - start)
+
+
+_forecasts = {}
+_forecast_lock = threading.Lock()
+
+
+def get_forecasts(db_path=None):
+    """Return forecasts for the current data version (refitted once after each ingest)"""
+    path = str(db_path or DB_PATH)
+    cube = get_cube(path)
+    if not cube:
+        return None
+    cached = _forecasts.get(path)
+    if cached is not None and cached[0] == cube.version:
+        return cached[1]
+    with _forecast_lock:
+        cached = _forecasts.get(path)
+        if cached is None or cached[0] != cube.version:
+            forecasts = fit_forecasts(cube)
+            print(f"Forecasts refit for {len(cube)} countries in {forecasts.fit_seconds * 1000:.1f} ms")
+            cached = (cube.version, forecasts)
+            _forecasts[path] = cached
+    return cached[1]
+
+
+_facts_cache = {}
+
+
+def get_forecast_facts(db_path=None):
+    """Return forecast (question, answer) pairs for the Q&A assistant"""
+    path = str(db_path or DB_PATH)
+    forecasts = get_forecasts(path)
+    if forecasts is None:
+        return []
+    cached = _facts_cache.get(path)
+    if cached is not None and cached[0] is forecasts:
+        return cached[1]
+
+    facts = [(
+        "What is the forecasted number of arrivals for the next year?",
+        f"Around {format_arrivals(forecasts.total)} arrivals in {forecasts.target_year} (trend/Holt forecast).",
+    )]
+    facts.extend(
+        (f"What is the forecasted number of arrivals for {name}?",
+         f"Around {format_arrivals(value)} arrivals in {forecasts.target_year}.")
+        for name, value in zip(forecasts.names, forecasts.values)
+    )
+    _facts_cache[path] = (forecasts, facts)
+    return facts
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Fit next-year arrivals forecasts for every country")
+    parser.add_argument("--db", default=str(DB_PATH))
+    parser.add_argument("--top", type=int, default=10)
+    args = parser.parse_args()
+
+    forecasts = get_forecasts(args.db)
+    if forecasts is None:
+        print("No arrivals data loaded.")
+        return
+    models, counts = np.unique(forecasts.model, return_counts=True)
+    print(f"Target year {forecasts.target_year}: {format_arrivals(forecasts.total)} total arrivals")
+    print("Models: " + ", ".join(f"{m}={c}" for m, c in zip(models, counts)))
+    for i in np.argsort(-forecasts.values)[:args.top]:
+        print(f"  {forecasts.names[i]:<40} {format_arrivals(forecasts.values[i]):>10}  ({forecasts.model[i]})")
+
+
+if __name__ == "__main__":
+    main()
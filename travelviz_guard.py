@@ -0,0 +1,234 @@
+"""Client-side rate limiting and circuit breaking in front of Firebase
+
+Token buckets (per user, per IP and per process) turn away bursts before
+Firebase answers TOO_MANY_ATTEMPTS_TRY_LATER. Circuit breakers wrap the
+Auth and RTDB clients: after repeated outage-type failures (connection
+errors, timeouts, 5xx, throttling) calls fail fast for a cool-down period,
+then a limited number of half-open probes decide whether to close again, so
+worker threads stop queueing behind doomed requests.
+"""
+import os
+import re
+import sys
+import threading
+import time
+from collections import OrderedDict
+
+from travelviz_metrics import timer
+
+BREAKER_FAILURES = int(os.getenv("FIREBASE_BREAKER_FAILURES", 5))
+BREAKER_RESET_SECONDS = float(os.getenv("FIREBASE_BREAKER_RESET_SECONDS", 30))
+BREAKER_HALF_OPEN_CALLS = 1
+
+_OUTAGE_PATTERN = re.compile(r"\b(429|5\d\d) (Client|Server) Error|TOO_MANY_ATTEMPTS_TRY_LATER")
+_REJECTION_PATTERN = re.compile(r"\b4(?!29)\d\d Client Error|Permission denied", re.IGNORECASE)
+
+
+class CircuitOpenError(RuntimeError):
+    """Raised instead of calling Firebase while its circuit is open"""
+
+    def __init__(self, name, retry_after):
+        super().__init__(f"{name} is temporarily unavailable (retry in {retry_after:.0f}s)")
+        self.name = name
+        self.retry_after = retry_after
+
+
+def is_outage(exc):
+    """True for failures that say Firebase is unhealthy (not for bad credentials or rules)"""
+    # requests is imported lazily by the Firebase clients; if it isn't loaded, exc can't be one of its errors
+    requests = sys.modules.get("requests")
+    if requests is not None and isinstance(exc, (requests.ConnectionError, requests.Timeout)):
+        return True
+    return bool(_OUTAGE_PATTERN.search(str(exc)))
+
+
+def is_rejection(exc):
+    """True for requests Firebase refuses outright (4xx: rules, bad values); retrying can't help"""
+    return not is_outage(exc) and bool(_REJECTION_PATTERN.search(str(exc)))
+
+
+# ---------- Rate limiting ----------
+class TokenBucket:
+    """Classic token bucket: `rate` tokens per second, bursts up to `capacity`"""
+
+    def __init__(self, rate, capacity):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated = time.monotonic()
+
+    def refill(self, now):
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+
+class RateLimiter:
+    """Keyed token buckets (e.g. "user:<email>", "ip:<addr>") plus one process-wide bucket"""
+
+    def __init__(self, name, rate, capacity, global_rate, global_capacity, max_keys=10000):
+        self.name = name
+        self.rate = rate
+        self.capacity = capacity
+        self.max_keys = max_keys
+        self._global = TokenBucket(global_rate, global_capacity)
+        self._buckets = OrderedDict()
+        self._lock = threading.Lock()
+        self.allowed = 0
+        self.limited = 0
+
+    def check(self, *keys):
+        """Consume one token from every bucket involved; returns 0 if allowed, else seconds to wait"""
+        now = time.monotonic()
+        with self._lock:
+            buckets = [self._global]
+            for key in keys:
+                if not key:
+                    continue
+                bucket = self._buckets.get(key)
+                if bucket is None:
+                    bucket = self._buckets[key] = TokenBucket(self.rate, self.capacity)
+                    while len(self._buckets) > self.max_keys:
+                        self._buckets.popitem(last=False)
+                else:
+                    self._buckets.move_to_end(key)
+                buckets.append(bucket)
+
+            # All or nothing: a request refused by one bucket doesn't drain the others
+            for bucket in buckets:
+                bucket.refill(now)
+            empty = [b for b in buckets if b.tokens < 1]
+            if empty:
+                self.limited += 1
+                return max((1 - b.tokens) / b.rate for b in empty)
+            for bucket in buckets:
+                bucket.tokens -= 1
+            self.allowed += 1
+            return 0.0
+
+    def stats(self):
+        with self._lock:
+            return {"allowed": self.allowed, "limited": self.limited, "tracked_keys": len(self._buckets)}
+
+
+# ---------- Circuit breaking ----------
+class CircuitBreaker:
+    """closed -> open after `failure_threshold` consecutive outages -> half-open probes after `reset_seconds`"""
+
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half_open"
+
+    def __init__(self, name, failure_threshold=BREAKER_FAILURES, reset_seconds=BREAKER_RESET_SECONDS,
+                 half_open_calls=BREAKER_HALF_OPEN_CALLS, is_failure=is_outage):
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.reset_seconds = reset_seconds
+        self.half_open_calls = half_open_calls
+        self.is_failure = is_failure
+        self.state = self.CLOSED
+        self._failures = 0
+        self._opened_at = 0.0
+        self._probes = 0
+        self._lock = threading.Lock()
+        self.counters = {"calls": 0, "successes": 0, "failures": 0, "rejected": 0, "opened": 0}
+
+    def _before_call(self):
+        with self._lock:
+            if self.state == self.OPEN:
+                retry_after = self._opened_at + self.reset_seconds - time.monotonic()
+                if retry_after > 0:
+                    self.counters["rejected"] += 1
+                    raise CircuitOpenError(self.name, retry_after)
+                self.state = self.HALF_OPEN
+                self._probes = 0
+            if self.state == self.HALF_OPEN:
+                if self._probes >= self.half_open_calls:
+                    self.counters["rejected"] += 1
+                    raise CircuitOpenError(self.name, self.reset_seconds)
+                self._probes += 1
+            self.counters["calls"] += 1
+
+    def _open(self):
+        self.state = self.OPEN
+        self._opened_at = time.monotonic()
+        self.counters["opened"] += 1
+        print(f"Circuit '{self.name}' opened after {self._failures} failures")
+
+    def call(self, fn, *args, **kwargs):
+        self._before_call()
+        try:
+            result = fn(*args, **kwargs)
+        except Exception as e:
+            with self._lock:
+                if self.state == self.HALF_OPEN:
+                    self._probes -= 1
+                if self.is_failure(e):
+                    self.counters["failures"] += 1
+                    self._failures += 1
+                    if self.state == self.HALF_OPEN or self._failures >= self.failure_threshold:
+                        self._open()
+                elif self.state == self.HALF_OPEN:
+                    # Firebase answered (e.g. wrong password): it is reachable again
+                    self.state = self.CLOSED
+                    self._failures = 0
+            raise
+        with self._lock:
+            self.counters["successes"] += 1
+            self._failures = 0
+            if self.state == self.HALF_OPEN:
+                print(f"Circuit '{self.name}' closed")
+                self.state = self.CLOSED
+        return result
+
+    def stats(self):
+        with self._lock:
+            return {"state": self.state, "consecutive_failures": self._failures, **self.counters}
+
+
+class GuardedClient:
+    """Proxy for a pyrebase Auth/Database object that sends every request through a breaker
+
+    Query-building methods (child, order_by_*, ...) just return the proxy so
+    call chains keep working; every other method is a request.
+    """
+
+    CHAIN_METHODS = frozenset({
+        "child", "order_by_child", "order_by_key", "order_by_value", "start_at", "end_at",
+        "equal_to", "limit_to_first", "limit_to_last", "shallow", "generate_key", "sort",
+    })
+
+    def __init__(self, target, breaker):
+        self._target = target
+        self._breaker = breaker
+
+    def __getattr__(self, name):
+        attr = getattr(self._target, name)
+        if not callable(attr):
+            return attr
+        if name in self.CHAIN_METHODS:
+            def chain(*args, **kwargs):
+                result = attr(*args, **kwargs)
+                return self if result is self._target else result
+            return chain
+
+        def guarded(*args, **kwargs):
+            with timer("firebase_request", service=self._breaker.name, method=name):
+                return self._breaker.call(attr, *args, **kwargs)
+        return guarded
+
+
+# Process-wide guards shared by every session
+auth_breaker = CircuitBreaker("firebase-auth")
+rtdb_breaker = CircuitBreaker("firebase-rtdb")
+# Per user/IP: 5 attempts, then one every 12 s; per process: bursts of 50, 20/s
+login_limiter = RateLimiter("login", rate=1 / 12, capacity=5, global_rate=20, global_capacity=50)
+# Feedback and other user-triggered writes
+write_limiter = RateLimiter("writes", rate=1 / 6, capacity=10, global_rate=50, global_capacity=200)
+
+
+def guard_stats():
+    """Breaker and limiter metrics"""
+    return {
+        "breakers": {b.name: b.stats() for b in (auth_breaker, rtdb_breaker)},
+        "limiters": {lim.name: lim.stats() for lim in (login_limiter, write_limiter)},
+    }
@@ -0,0 +1,184 @@
+"""Shared keep-alive HTTP transport for Firebase and asset traffic
+
+One tuned requests.Session per process: per-host connection pools sized for
+many concurrent Streamlit sessions, TCP keep-alive, default connect/read
+timeouts and retries on connection errors. Counting connection classes
+record how often a pooled connection is reused and how long each new
+connection (TCP + TLS handshake) took.
+"""
+import importlib
+import os
+import socket
+import threading
+import time
+from urllib.parse import urlsplit
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.connection import HTTPConnection, HTTPSConnection
+from urllib3.connectionpool import HTTPConnectionPool, HTTPSConnectionPool
+from urllib3.util.retry import Retry
+
+CONNECT_TIMEOUT = float(os.getenv("HTTP_CONNECT_TIMEOUT", 3.05))
+READ_TIMEOUT = float(os.getenv("HTTP_READ_TIMEOUT", 15))
+# Distinct hosts kept pooled, and idle connections kept per host
+POOL_HOSTS = int(os.getenv("HTTP_POOL_HOSTS", 16))
+POOL_MAXSIZE = int(os.getenv("HTTP_POOL_MAXSIZE", 32))
+
+KEEPALIVE_SOCKET_OPTIONS = HTTPConnection.default_socket_options + [(socket.SOL_SOCKET, socket.SO_KEEPALIVE, 1)]
+
+
+class TransportStats:
+    """Per-host request, connection and handshake-time counters"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._hosts = {}
+
+    def _host(self, host):
+        entry = self._hosts.get(host)
+        if entry is None:
+            entry = self._hosts[host] = {"requests": 0, "connections": 0, "handshake_seconds": 0.0}
+        return entry
+
+    def record_request(self, host):
+        with self._lock:
+            self._host(host)["requests"] += 1
+
+    def record_connection(self, host, seconds):
+        with self._lock:
+            entry = self._host(host)
+            entry["connections"] += 1
+            entry["handshake_seconds"] += seconds
+
+    def snapshot(self):
+        """Counters per host plus a "total" row; reused = requests served on an existing connection"""
+        with self._lock:
+            hosts = {host: dict(entry) for host, entry in self._hosts.items()}
+        total = {"requests": 0, "connections": 0, "handshake_seconds": 0.0}
+        for entry in hosts.values():
+            for key in total:
+                total[key] += entry[key]
+        hosts["total"] = total
+        for entry in hosts.values():
+            entry["reused"] = max(0, entry["requests"] - entry["connections"])
+            entry["reuse_rate"] = entry["reused"] / entry["requests"] if entry["requests"] else 0.0
+            entry["avg_handshake_ms"] = (
+                entry["handshake_seconds"] * 1000 / entry["connections"] if entry["connections"] else 0.0
+            )
+        return hosts
+
+    def reset(self):
+        with self._lock:
+            self._hosts.clear()
+
+
+stats = TransportStats()
+
+
+class _CountingHTTPConnection(HTTPConnection):
+    def connect(self):
+        start = time.perf_counter()
+        super().connect()
+        stats.record_connection(self.host, time.perf_counter() - start)
+
+
+class _CountingHTTPSConnection(HTTPSConnection):
+    def connect(self):
+        # Includes the TLS handshake
+        start = time.perf_counter()
+        super().connect()
+        stats.record_connection(self.host, time.perf_counter() - start)
+
+
+class _CountingHTTPConnectionPool(HTTPConnectionPool):
+    ConnectionCls = _CountingHTTPConnection
+
+
+class _CountingHTTPSConnectionPool(HTTPSConnectionPool):
+    ConnectionCls = _CountingHTTPSConnection
+
+
+class PooledAdapter(HTTPAdapter):
+    """HTTPAdapter whose pools use keep-alive sockets and counting connections"""
+
+    def init_poolmanager(self, connections, maxsize, block=False, **pool_kwargs):
+        pool_kwargs.setdefault("socket_options", KEEPALIVE_SOCKET_OPTIONS)
+        super().init_poolmanager(connections, maxsize, block=block, **pool_kwargs)
+        self.poolmanager.pool_classes_by_scheme = {
+            "http": _CountingHTTPConnectionPool,
+            "https": _CountingHTTPSConnectionPool,
+        }
+
+
+class TransportSession(requests.Session):
+    """requests.Session with default timeouts and per-host request counting"""
+
+    def request(self, method, url, **kwargs):
+        kwargs.setdefault("timeout", (CONNECT_TIMEOUT, READ_TIMEOUT))
+        stats.record_request(urlsplit(url).hostname)
+        return super().request(method, url, **kwargs)
+
+
+def _build_session():
+    session = TransportSession()
+    # Connection errors happen before anything was sent, so they are safe to
+    # retry for every method; reads are only retried for idempotent methods
+    retries = Retry(total=3, connect=2, read=1, status=0, redirect=0, backoff_factor=0.1)
+    adapter = PooledAdapter(pool_connections=POOL_HOSTS, pool_maxsize=POOL_MAXSIZE, max_retries=retries)
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
+    return session
+
+
+_session = None
+_session_lock = threading.Lock()
+
+
+def get_session():
+    """Return the process-wide HTTP session"""
+    global _session
+    if _session is None:
+        with _session_lock:
+            if _session is None:
+                _session = _build_session()
+    return _session
+
+
+class _SessionModule:
+    """Stand-in for the requests module that sends its module-level calls through the shared session"""
+
+    def __init__(self, session):
+        self._session = session
+
+    def __getattr__(self, name):
+        return getattr(requests, name)
+
+    def request(self, method, url, **kwargs):
+        return self._session.request(method, url, **kwargs)
+
+    def get(self, url, **kwargs):
+        return self._session.get(url, **kwargs)
+
+    def post(self, url, **kwargs):
+        return self._session.post(url, **kwargs)
+
+    def put(self, url, **kwargs):
+        return self._session.put(url, **kwargs)
+
+    def patch(self, url, **kwargs):
+        return self._session.patch(url, **kwargs)
+
+    def delete(self, url, **kwargs):
+        return self._session.delete(url, **kwargs)
+
+
+def route_module_requests(module_name):
+    """Make a library that calls requests.get/post directly use the shared session"""
+    module = importlib.import_module(module_name)
+    if not isinstance(module.requests, _SessionModule):
+        module.requests = _SessionModule(get_session())
+
+
+def transport_stats():
+    return stats.snapshot()
@@ -0,0 +1,275 @@
+"""Content-addressed profile image store with precomputed size variants
+
+Uploads are stored once per content hash as small JPEG variants; RTDB only
+keeps a "sha256:<hex>" reference. The default backend writes into
+static/avatars/, which Streamlit serves (server.enableStaticServing) under
+immutable, browser-cacheable URLs. Other blob stores plug in via
+set_image_backend().
+
+Decoding and resizing run in a small process pool, memoized by the hash of
+the uploaded bytes, so an upload is processed once no matter how many reruns
+happen while it sits in the file uploader. A pool whose worker died (e.g.
+killed for memory) is replaced on the next upload.
+"""
+import base64
+import hashlib
+import io
+import os
+import threading
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from functools import lru_cache
+from pathlib import Path
+
+APP_DIR = Path(__file__).parent
+STATIC_DIR = APP_DIR / "static" / "avatars"
+STATIC_URL = "app/static/avatars"
+IMAGE_STORE_DIR = Path(os.getenv("IMAGE_STORE_DIR", STATIC_DIR))
+
+REF_PREFIX = "sha256:"
+# Variant name -> square edge in pixels; "lg" matches the old 300x300 upload
+VARIANTS = {"lg": 300, "md": 160, "sm": 64}
+JPEG_QUALITY = 85
+
+MAX_UPLOAD_BYTES = int(os.getenv("IMAGE_MAX_UPLOAD_BYTES", 15 * 1024 * 1024))
+MAX_PIXELS = int(os.getenv("IMAGE_MAX_PIXELS", 50_000_000))
+IMAGE_WORKERS = int(os.getenv("IMAGE_WORKERS", 2))
+# Processed uploads kept in memory, keyed by content hash
+PROCESSED_CACHE_SIZE = 32
+
+
+class ImageRejectedError(ValueError):
+    """Upload is not an acceptable image (too large, too many pixels, unreadable)"""
+
+
+class ImageBackend(ABC):
+    """Blob storage for image variants; subclass for S3, GCS, etc."""
+
+    @abstractmethod
+    def exists(self, name):
+        """True if name is stored"""
+
+    @abstractmethod
+    def put(self, name, data):
+        """Store data under name, replacing any previous value"""
+
+    @abstractmethod
+    def get(self, name):
+        """Return the stored bytes, or None when missing"""
+
+    def url(self, name):
+        """Public URL for name, or None when the backend can't serve it directly"""
+        return None
+
+
+class LocalImageBackend(ImageBackend):
+    """Files on local disk, optionally served by Streamlit's static file handler"""
+
+    def __init__(self, root=IMAGE_STORE_DIR, base_url=None):
+        self.root = Path(root)
+        self.base_url = base_url
+
+    def exists(self, name):
+        return (self.root / name).exists()
+
+    def put(self, name, data):
+        self.root.mkdir(parents=True, exist_ok=True)
+        path = self.root / name
+        tmp = path.with_suffix(f".{os.getpid()}.{threading.get_ident()}.tmp")
+        tmp.write_bytes(data)
+        os.replace(tmp, path)
+
+    def get(self, name):
+        try:
+            return (self.root / name).read_bytes()
+        except OSError:
+            return None
+
+    def url(self, name):
+        return f"{self.base_url.rstrip('/')}/{name}" if self.base_url else None
+
+
+_backend = LocalImageBackend()
+
+
+def set_image_backend(backend):
+    """Replace the image backend (e.g. an object store) for the whole process"""
+    global _backend
+    _backend = backend
+    _data_uri.cache_clear()
+
+
+def get_image_backend():
+    return _backend
+
+
+def use_static_serving():
+    """Serve the default local store through Streamlit's static file handler"""
+    if isinstance(_backend, LocalImageBackend) and _backend.root.resolve() == STATIC_DIR.resolve():
+        _backend.base_url = STATIC_URL
+
+
+def is_image_ref(value):
+    return isinstance(value, str) and value.startswith(REF_PREFIX)
+
+
+def _variant_name(digest, variant):
+    return f"{digest}_{variant}.jpg"
+
+
+def make_variants(image_bytes):
+    """Decode an upload and return {variant: JPEG bytes} for every size in VARIANTS"""
+    from PIL import Image, UnidentifiedImageError
+
+    if len(image_bytes) > MAX_UPLOAD_BYTES:
+        raise ImageRejectedError(f"Image is larger than {MAX_UPLOAD_BYTES // (1024 * 1024)} MB")
+    try:
+        image = Image.open(io.BytesIO(image_bytes))
+    except UnidentifiedImageError:
+        raise ImageRejectedError("Unsupported or corrupt image file")
+    # Image.open only reads the header, so this rejects decompression bombs cheaply
+    width, height = image.size
+    if width * height > MAX_PIXELS:
+        raise ImageRejectedError(f"Image has more than {MAX_PIXELS // 1_000_000} megapixels")
+
+    # JPEGs are decoded at the smallest DCT scale that still covers the largest variant
+    largest = max(VARIANTS.values())
+    image.draft("RGB", (largest, largest))
+    if image.mode != "RGB":
+        image = image.convert("RGB")
+
+    variants = {}
+    for variant, size in sorted(VARIANTS.items(), key=lambda item: -item[1]):
+        # Each variant is resized from the previous (larger) one, not the original
+        image = image.resize((size, size), Image.Resampling.LANCZOS, reducing_gap=3.0)
+        buffered = io.BytesIO()
+        image.save(buffered, format="JPEG", quality=JPEG_QUALITY)
+        variants[variant] = buffered.getvalue()
+    return variants
+
+
+# ---------- Off-thread processing ----------
+_pool = None
+_pool_lock = threading.Lock()
+_processed = OrderedDict()
+_processed_lock = threading.Lock()
+
+
+def _get_pool():
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            import multiprocessing
+
+            # spawn, not fork: the Streamlit server process is multi-threaded
+            _pool = ProcessPoolExecutor(max_workers=IMAGE_WORKERS, mp_context=multiprocessing.get_context("spawn"))
+        return _pool
+
+
+def _discard_pool(pool):
+    """Forget a pool whose worker died, so the next submit starts a fresh one"""
+    global _pool
+    with _pool_lock:
+        if _pool is pool:
+            _pool = None
+    pool.shutdown(wait=False)
+
+
+def is_broken(future):
+    """True if the future failed because its worker process died"""
+    return future.done() and not future.cancelled() and isinstance(future.exception(), BrokenProcessPool)
+
+
+def image_digest(image_bytes):
+    return hashlib.sha256(image_bytes).hexdigest()
+
+
+def process_image_async(image_bytes, digest=None):
+    """Return a Future of make_variants(image_bytes), shared by every caller with the same bytes"""
+    if len(image_bytes) > MAX_UPLOAD_BYTES:
+        raise ImageRejectedError(f"Image is larger than {MAX_UPLOAD_BYTES // (1024 * 1024)} MB")
+    digest = digest or image_digest(image_bytes)
+    with _processed_lock:
+        future = _processed.get(digest)
+        if future is None or is_broken(future):
+            pool = _get_pool()
+            try:
+                future = pool.submit(make_variants, image_bytes)
+            except BrokenProcessPool:
+                _discard_pool(pool)
+                future = _get_pool().submit(make_variants, image_bytes)
+            _processed[digest] = future
+            while len(_processed) > PROCESSED_CACHE_SIZE:
+                _processed.popitem(last=False)
+        else:
+            _processed.move_to_end(digest)
+    return future
+
+
+def store_profile_image(image_bytes, digest=None):
+    """Store an uploaded image (deduplicated by content hash) and return its reference"""
+    digest = digest or image_digest(image_bytes)
+    backend = _backend
+    if not all(backend.exists(_variant_name(digest, v)) for v in VARIANTS):
+        for variant, data in process_image_async(image_bytes, digest).result().items():
+            backend.put(_variant_name(digest, variant), data)
+    return REF_PREFIX + digest
+
+
+@lru_cache(maxsize=256)
+def _data_uri(digest, variant):
+    data = _backend.get(_variant_name(digest, variant))
+    if data is None:
+        return None
+    return "data:image/jpeg;base64," + base64.b64encode(data).decode()
+
+
+def profile_image_src(value, variant="lg"):
+    """Return an <img src> for a stored profile picture (None when there is none)
+
+    Prefers the backend URL so browsers cache the image; otherwise falls back
+    to a data URI of the (small) variant, memoized per content hash. Legacy
+    base64 strings are still rendered as they were.
+    """
+    if not value:
+        return None
+    if not is_image_ref(value):
+        return f"data:image/jpeg;base64,{value}"
+    digest = value[len(REF_PREFIX):]
+    return _backend.url(_variant_name(digest, variant)) or _data_uri(digest, variant)
+
+
+def migrate_legacy_picture(value):
+    """Move a legacy base64 profile picture into the store; returns the new reference"""
+    return store_profile_image(base64.b64decode(value))
+
+
+_migrating = set()
+_migrating_lock = threading.Lock()
+
+
+def migrate_legacy_picture_async(value, on_stored):
+    """Migrate a legacy picture on a background thread, then call on_stored(reference)
+
+    Keeps decoding, resizing and the first start of the worker pool off the
+    request that found the picture. Repeated calls for a picture already
+    being migrated are ignored.
+    """
+    key = hashlib.sha256(value.encode()).hexdigest()
+    with _migrating_lock:
+        if key in _migrating:
+            return
+        _migrating.add(key)
+
+    def run():
+        try:
+            on_stored(migrate_legacy_picture(value))
+        except Exception as e:
+            print(f"Profile picture migration error: {e}")
+        finally:
+            with _migrating_lock:
+                _migrating.discard(key)
+
+    threading.Thread(target=run, name="picture-migration", daemon=True).start()
@@ -0,0 +1,272 @@
+"""Stream large arrivals datasets (World Bank CSV/JSON exports) into data.db in batches
+
+Usage:
+    python travelviz_ingest.py API_ST.INT.ARVL_DS2_en_csv_v2.csv [more files ...]
+        [--metadata Metadata_Country_API_ST.INT.ARVL_DS2_en_csv_v2.csv]
+        [--indicator ST.INT.ARVL] [--batch-size 5000] [--db data.db]
+
+Supported inputs (optionally .gz compressed):
+  * World Bank wide CSV: preamble lines, then "Country Name","Country Code",
+    "Indicator Name","Indicator Code","1960",...
+  * Long CSV: country_code, country_name, region, year, arrivals
+  * World Bank API JSON ([metadata, [records]]), plain JSON arrays or JSON Lines
+"""
+import argparse
+import csv
+import gzip
+import io
+import json
+import os
+import sys
+import time
+from pathlib import Path
+
+from travelviz_store import DB_PATH, bump_data_version, connect, upsert_arrivals, upsert_countries
+
+# International tourism, number of arrivals
+DEFAULT_INDICATOR = "ST.INT.ARVL"
+BATCH_SIZE = 5000
+PROGRESS_SECONDS = 2.0
+READ_CHUNK = 1 << 20
+
+
+class _CountingReader(io.RawIOBase):
+    """Raw file wrapper that counts compressed/on-disk bytes for progress reports"""
+
+    def __init__(self, raw):
+        self.raw = raw
+        self.bytes_read = 0
+
+    def readable(self):
+        return True
+
+    def readinto(self, buffer):
+        n = self.raw.readinto(buffer)
+        self.bytes_read += n or 0
+        return n
+
+    def close(self):
+        self.raw.close()
+        super().close()
+
+
+def _open_text(path):
+    counter = _CountingReader(open(path, "rb", buffering=0))
+    stream = io.BufferedReader(counter, buffer_size=READ_CHUNK)
+    if str(path).endswith(".gz"):
+        stream = gzip.GzipFile(fileobj=stream)
+    return io.TextIOWrapper(stream, encoding="utf-8-sig", newline=""), counter
+
+
+# ---------- Record readers (each yields code, name, region, year, arrivals) ----------
+def _iter_wide_csv(reader, header, indicator):
+    columns = {name: i for i, name in enumerate(header)}
+    years = [(i, int(name)) for i, name in enumerate(header) if name.strip().isdigit()]
+    code_col = columns["Country Code"]
+    name_col = columns.get("Country Name")
+    indicator_col = columns.get("Indicator Code")
+    for row in reader:
+        if len(row) <= code_col:
+            continue
+        if indicator and indicator_col is not None and row[indicator_col] != indicator:
+            continue
+        name = row[name_col] if name_col is not None else None
+        for i, year in years:
+            if i < len(row) and row[i] != "":
+                yield row[code_col], name, None, year, row[i]
+
+
+def _iter_long_csv(reader, header):
+    columns = {name: i for i, name in enumerate(header)}
+    code_col = columns["country_code"]
+    name_col = columns.get("country_name")
+    region_col = columns.get("region")
+    year_col = columns["year"]
+    value_col = columns["arrivals"]
+    for row in reader:
+        if len(row) <= value_col or row[value_col] == "":
+            continue
+        yield (
+            row[code_col],
+            row[name_col] if name_col is not None else None,
+            row[region_col] if region_col is not None else None,
+            row[year_col],
+            row[value_col],
+        )
+
+
+def _iter_csv(f, indicator):
+    reader = csv.reader(f)
+    for header in reader:
+        # World Bank exports start with a few metadata lines before the header
+        if header and header[0] == "Country Name":
+            return _iter_wide_csv(reader, header, indicator)
+        if "country_code" in header and "arrivals" in header:
+            return _iter_long_csv(reader, header)
+    return iter(())
+
+
+def _iter_json_objects(f):
+    """Yield every JSON object found inside arrays (or on separate lines) without loading the file"""
+    decoder = json.JSONDecoder()
+    buffer = ""
+    pos = 0
+    eof = False
+    while True:
+        while pos < len(buffer) and buffer[pos] in " \t\r\n,[]":
+            pos += 1
+        if pos >= len(buffer) or buffer[pos] != "{":
+            if pos < len(buffer):
+                # Scalars between objects (there are none in World Bank exports)
+                pos += 1
+                continue
+            if eof:
+                return
+            chunk = f.read(READ_CHUNK)
+            eof = not chunk
+            buffer, pos = buffer[pos:] + chunk, 0
+            continue
+        try:
+            obj, end = decoder.raw_decode(buffer, pos)
+        except json.JSONDecodeError:
+            if eof:
+                raise
+            chunk = f.read(READ_CHUNK)
+            eof = not chunk
+            buffer, pos = buffer[pos:] + chunk, 0
+            continue
+        yield obj
+        pos = end
+
+
+def _iter_json(f, indicator):
+    for obj in _iter_json_objects(f):
+        if "date" in obj and "value" in obj:
+            # World Bank API record
+            if indicator and (obj.get("indicator") or {}).get("id") != indicator:
+                continue
+            if obj["value"] is None:
+                continue
+            country = obj.get("country") or {}
+            code = obj.get("countryiso3code") or country.get("id")
+            yield code, country.get("value"), None, obj["date"], obj["value"]
+        elif "country_code" in obj and obj.get("arrivals") is not None:
+            yield obj["country_code"], obj.get("country_name"), obj.get("region"), obj["year"], obj["arrivals"]
+
+
+def iter_records(f, path, indicator=DEFAULT_INDICATOR):
+    """Yield arrivals records from an open text file, choosing the parser from the file name"""
+    name = str(path).lower().removesuffix(".gz")
+    if name.endswith((".json", ".jsonl", ".ndjson")):
+        return _iter_json(f, indicator)
+    return _iter_csv(f, indicator)
+
+
+def load_regions(path):
+    """Read a World Bank country metadata CSV into {country code: region}; aggregates map to ''"""
+    with open(path, newline="", encoding="utf-8-sig") as f:
+        return {row["Country Code"]: row.get("Region") or "" for row in csv.DictReader(f)}
+
+
+# ---------- Pipeline ----------
+class IngestReport:
+    """Running totals for one ingestion run"""
+
+    def __init__(self):
+        self.rows = 0
+        self.skipped = 0
+        self.batches = 0
+        self.bytes_read = 0
+        self.started = time.perf_counter()
+
+    @property
+    def elapsed(self):
+        return time.perf_counter() - self.started
+
+    def line(self, total_bytes=None):
+        rate = self.rows / self.elapsed if self.elapsed else 0.0
+        mb = self.bytes_read / 1e6
+        progress = f"{mb:,.1f}/{total_bytes / 1e6:,.1f} MB" if total_bytes else f"{mb:,.1f} MB"
+        return f"{self.rows:,} rows ({self.skipped:,} skipped) in {self.elapsed:.1f}s, {rate:,.0f} rows/s, {progress}"
+
+
+def ingest_files(paths, db_path=None, indicator=DEFAULT_INDICATOR, regions=None,
+                 batch_size=BATCH_SIZE, progress=print):
+    """Stream files into the arrivals store, one transaction per batch, and bump the data version once at the end"""
+    report = IngestReport()
+    conn = connect(db_path)
+    conn.execute("PRAGMA temp_store=MEMORY")
+    known_countries = set()
+
+    def flush(countries, rows):
+        with conn:
+            if countries:
+                upsert_countries(conn, countries.values())
+            upsert_arrivals(conn, rows)
+        known_countries.update(countries)
+        report.rows += len(rows)
+        report.batches += 1
+
+    try:
+        for path in paths:
+            total_bytes = os.path.getsize(path)
+            done_bytes = report.bytes_read
+            f, counter = _open_text(path)
+            last_report = time.perf_counter()
+            countries = {}
+            rows = []
+            with f:
+                for code, name, region, year, value in iter_records(f, path, indicator):
+                    if regions is not None and code in regions:
+                        region = regions[code]
+                        if not region:
+                            # Regional/income aggregates have no region of their own
+                            report.skipped += 1
+                            continue
+                    try:
+                        rows.append((code, int(year), int(float(value))))
+                    except (TypeError, ValueError):
+                        report.skipped += 1
+                        continue
+                    if code not in known_countries and code not in countries:
+                        countries[code] = (code, name or code, region or None)
+
+                    if len(rows) >= batch_size:
+                        flush(countries, rows)
+                        countries, rows = {}, []
+                        report.bytes_read = done_bytes + counter.bytes_read
+                        now = time.perf_counter()
+                        if progress and now - last_report >= PROGRESS_SECONDS:
+                            progress(f"{Path(path).name}: {report.line(done_bytes + total_bytes)}")
+                            last_report = now
+                if rows:
+                    flush(countries, rows)
+                report.bytes_read = done_bytes + counter.bytes_read
+
+        with conn:
+            bump_data_version(conn)
+    finally:
+        conn.close()
+
+    if progress:
+        progress(f"Done: {report.line()} in {report.batches:,} batches")
+    return report
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Stream arrivals datasets into data.db")
+    parser.add_argument("files", nargs="+", type=Path)
+    parser.add_argument("--db", type=Path, default=DB_PATH)
+    parser.add_argument("--indicator", default=DEFAULT_INDICATOR,
+                        help="World Bank indicator code to keep ('' keeps every row)")
+    parser.add_argument("--metadata", type=Path,
+                        help="World Bank country metadata CSV; sets regions and skips aggregates")
+    parser.add_argument("--batch-size", type=int, default=BATCH_SIZE)
+    args = parser.parse_args(argv)
+
+    regions = load_regions(args.metadata) if args.metadata else None
+    ingest_files(args.files, args.db, args.indicator or None, regions, args.batch_size)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,51 +1,44 @@
 import streamlit as st
-import pandas as pd
-import hashlib
-import json
 from datetime import datetime
-import requests
-from streamlit_option_menu import option_menu
-from streamlit_lottie import st_lottie
-from streamlit_chat import message
+from concurrent.futures.process import BrokenProcessPool
+from functools import wraps
 import time
 from pathlib import Path
 
-import pyrebase as pyrebase
-
-
-import os
-from dotenv import load_dotenv
-
-# Load environment variables
-load_dotenv()
-
-# Firebase configuration
-firebase_config = {
-    "apiKey": os.getenv("FIREBASE_API_KEY"),
-    "authDomain": os.getenv("FIREBASE_AUTH_DOMAIN"),
-    "projectId": os.getenv("FIREBASE_PROJECT_ID"),
-    "storageBucket": os.getenv("FIREBASE_STORAGE_BUCKET"),
-    "messagingSenderId": os.getenv("FIREBASE_MESSAGING_SENDER_ID"),
-    "appId": os.getenv("FIREBASE_APP_ID"),
-    "databaseURL": os.getenv("FIREBASE_DATABASE_URL")
-}
+# Heavy or page-specific dependencies (pandas, numpy-backed analytics, pyrebase,
+# streamlit components) are imported inside the functions that use them, so a
+# cold worker only pays for what its first page needs.
+from travelviz_auth import AuthFailed, login as firebase_login, sign_up as firebase_signup
+from travelviz_chat import CHAT_PAGE_SIZE, ChatHistory
+from travelviz_firebase import FirebaseConfigError, check_firebase_config, get_firebase
+from travelviz_guard import CircuitOpenError, login_limiter, write_limiter
+from travelviz_images import (
+    ImageRejectedError, image_digest, is_broken, is_image_ref, migrate_legacy_picture_async,
+    process_image_async, profile_image_src, store_profile_image, use_static_serving,
+)
+from travelviz_metrics import inc, start_exporters, timed, timer
+from travelviz_profiling import profile_rerun, set_page
+from travelviz_profiles import fetch_profile, queue_profile, update_profile_field
+from travelviz_sessions import SESSION_COOKIE, cookie_script, resume_session, revoke_session
+from travelviz_state import open_session as open_shared_session
+from travelviz_store import format_arrivals, get_qa_facts, stat_cards
+from travelviz_writes import get_write_queue
 
-# Initialize Firebase
+# Validate the Firebase settings up front; the clients themselves are built
+# (once per server process) when a session first talks to Firebase
 try:
-    firebase = pyrebase.initialize_app(firebase_config)
-    auth = firebase.auth()
-    db = firebase.database()
-    
-    # Test Firebase connection
-    if not all([firebase_config["apiKey"], firebase_config["databaseURL"], firebase_config["authDomain"]]):
-        st.error("Missing required Firebase configuration. Please check your .env file.")
-        st.stop()
-        
-except Exception as e:
-    st.error(f"Firebase initialization error: {e}")
-    st.error("Please check your Firebase configuration and make sure all environment variables are set correctly.")
+    check_firebase_config()
+except FirebaseConfigError:
+    st.error("Missing required Firebase configuration. Please check your .env file.")
     st.stop()
 
+# Profile image variants are served as cacheable static files when enabled
+if st.get_option("server.enableStaticServing"):
+    use_static_serving()
+
+# Metrics endpoint / file dump (METRICS_PORT, METRICS_FILE), once per process
+start_exporters()
+
 # ---------- Page config ----------
 st.set_page_config(
     page_title="TravelViz - Professional Travel Analytics",
@@ -100,6 +93,7 @@ APP_DIR = Path(__file__).parent
 CSS_FILE = APP_DIR / "travelviz_css.css"
 AVATAR_FILE = APP_DIR / "istockphoto-2212764771-612x612.jpg"
 
+@timed("inject_css")
 def inject_css():
     """Inject custom CSS if file exists"""
     if CSS_FILE.exists():
@@ -177,17 +171,49 @@ def inject_css():
         </style>
         """, unsafe_allow_html=True)
 
+@timed("lottie_load")
 def load_lottieurl(url: str):
-    """Load Lottie animation from URL"""
+    """Load Lottie animation from URL (memory/disk cached, refreshed in the background)"""
+    from travelviz_assets import load_lottie
+
+    return load_lottie(url)
+
+# st.fragment (Streamlit 1.37+) reruns only the decorated function when one of
+# its widgets is used; older versions fall back to full-script reruns
+fragment = getattr(st, "fragment", None) or getattr(st, "experimental_fragment", None) or (lambda fn: fn)
+
+def page_fragment(page):
+    """st.fragment whose own reruns are timed and profiled as part of `page`"""
+    def decorator(fn):
+        @wraps(fn)
+        def run(*args, **kwargs):
+            with timer("fragment_render", page=page), profile_rerun(page):
+                try:
+                    return fn(*args, **kwargs)
+                finally:
+                    # Fragment reruns don't reach the end of the script
+                    flush_shared_session()
+        return fragment(run)
+    return decorator
+
+def rerun_fragment():
+    """Rerun just the current fragment (the whole script on Streamlit versions without fragments)"""
+    from streamlit.errors import StreamlitAPIException
+
     try:
-        r = requests.get(url, timeout=8)
-        if r.status_code != 200:
-            return None
-        return r.json()
-    except Exception:
-        return None
+        st.rerun(scope="fragment")
+    except (TypeError, StreamlitAPIException):
+        # No scope argument (Streamlit < 1.37), or the fragment is running as
+        # part of a full-script run, where only a full rerun is allowed
+        st.rerun()
 
 # ---------- Firebase Functions ----------
+def client_ip_key():
+    """Rate-limit key for the client address (st.context.ip_address, Streamlit 1.45+), or None"""
+    ip = getattr(getattr(st, "context", None), "ip_address", None)
+    return f"ip:{ip}" if ip else None
+
+@timed("firebase_call", op="signup")
 def create_user_firebase(email, password, full_name, username):
     """Create user in Firebase Authentication and save additional data"""
     try:
@@ -195,10 +221,11 @@ def create_user_firebase(email, password, full_name, username):
         if not email or not password or len(password) < 6:
             return False, "Password must be at least 6 characters long"
         
-        # Create user in Firebase Authentication
-        user = auth.create_user_with_email_and_password(email, password)
-        
-        # Save additional user data in Realtime Database
+        wait = login_limiter.check(client_ip_key())
+        if wait:
+            return False, f"Too many attempts. Please try again in {wait:.0f} seconds."
+
+        # Additional user data for Realtime Database
         user_data = {
             "full_name": full_name,
             "username": username,
@@ -208,14 +235,18 @@ def create_user_firebase(email, password, full_name, username):
             "created_at": datetime.now().isoformat()
         }
         
-        # Use user's UID as the key
-        db.child("users").child(user['localId']).set(user_data)
+        # Create user in Firebase Authentication; the profile (keyed by the
+        # user's UID) is cached now and written to RTDB in the background
+        firebase_signup(get_firebase(), email, password, user_data)
         
         return True, "Account created successfully!"
         
+    except CircuitOpenError:
+        return False, "Sign-up is temporarily unavailable. Please try again in a moment."
     except Exception as e:
         error_message = str(e)
         print(f"Firebase signup error: {error_message}")  # Debug logging
+        inc("firebase_errors", op="signup")
         
         if "EMAIL_EXISTS" in error_message:
             return False, "Email already exists!"
@@ -228,19 +259,28 @@ def create_user_firebase(email, password, full_name, username):
         else:
             return False, f"Error creating account. Please try again."
 
+@timed("firebase_call", op="login")
 def login_user_firebase(email, password):
-    """Login user with Firebase Authentication"""
+    """Login user with Firebase Authentication (profile fetch and session setup overlap the sign-in)"""
     try:
         # Validate input
         if not email or not password:
             return False, "Email and password are required"
         
+        # Throttle repeated attempts per account, per client and per server
+        wait = login_limiter.check(f"user:{email.lower()}", client_ip_key())
+        if wait:
+            return False, f"Too many login attempts. Please try again in {wait:.0f} seconds."
+
         # Sign in user with more specific error handling
         try:
-            user = auth.sign_in_with_email_and_password(email, password)
-        except Exception as auth_error:
+            login = firebase_login(get_firebase(), email, password)
+        except CircuitOpenError:
+            return False, "Login is temporarily unavailable. Please try again in a moment."
+        except AuthFailed as auth_error:
             auth_error_str = str(auth_error)
             print(f"Firebase auth error: {auth_error_str}")  # Debug logging
+            inc("firebase_errors", op="login")
             
             if "INVALID_LOGIN_CREDENTIALS" in auth_error_str:
                 return False, "Invalid email or password. Please check your credentials."
@@ -255,56 +295,62 @@ def login_user_firebase(email, password):
             else:
                 return False, "Login failed. Please check your credentials and try again."
         
-        # Get user data from Realtime Database
-        try:
-            user_data = db.child("users").child(user['localId']).get()
-            
-            if user_data.val():
-                return True, {
-                    "uid": user['localId'],
-                    "email": user['email'],
-                    "token": user['idToken'],
-                    **user_data.val()
-                }
-            else:
-                # If user data doesn't exist in database, create basic profile
-                basic_user_data = {
-                    "full_name": email.split('@')[0],  # Use email username as fallback
-                    "username": email.split('@')[0],
-                    "email": user['email'],
-                    "theme": "dark",
-                    "profile_picture": "",
-                    "created_at": datetime.now().isoformat()
-                }
-                db.child("users").child(user['localId']).set(basic_user_data)
-                
-                return True, {
-                    "uid": user['localId'],
-                    "email": user['email'],
-                    "token": user['idToken'],
-                    **basic_user_data
-                }
-                
-        except Exception as db_error:
-            print(f"Database error: {str(db_error)}")
+        user = login.user
+        # session_token lets reloads and new tabs resume without signing in again
+        session = {
+            "uid": user['localId'],
+            "email": user['email'],
+            "token": user['idToken'],
+            "session_token": login.session_token,
+        }
+
+        if login.profile_error is not None:
+            print(f"Database error: {str(login.profile_error)}")
+            inc("firebase_errors", op="profile_fetch")
             # Return basic user info even if database fails
             return True, {
-                "uid": user['localId'],
-                "email": user['email'],
-                "token": user['idToken'],
+                **session,
                 "full_name": email.split('@')[0],
                 "username": email.split('@')[0],
                 "theme": "dark",
                 "profile_picture": ""
             }
+
+        user_data = login.profile
+        if user_data:
+            # Legacy profiles keep the whole JPEG as base64; it still renders, and is
+            # moved into the image store in the background instead of delaying the login
+            picture = user_data.get("profile_picture")
+            if picture and not is_image_ref(picture):
+                uid = user['localId']
+                migrate_legacy_picture_async(picture, lambda ref: update_profile_field(uid, "profile_picture", ref))
+            return True, {**session, **user_data}
+
+        # If user data doesn't exist in database, create basic profile (written in the background)
+        basic_user_data = {
+            "full_name": email.split('@')[0],  # Use email username as fallback
+            "username": email.split('@')[0],
+            "email": user['email'],
+            "theme": "dark",
+            "profile_picture": "",
+            "created_at": datetime.now().isoformat()
+        }
+        queue_profile(user['localId'], basic_user_data)
+        return True, {**session, **basic_user_data}
             
     except Exception as e:
         error_message = str(e)
         print(f"General login error: {error_message}")  # Debug logging
+        inc("firebase_errors", op="login")
         return False, "Login failed. Please try again."
 
+@timed("firebase_call", op="feedback")
 def save_feedback_firebase(name, email, subject, message, rating):
-    """Save feedback message to Firebase"""
+    """Queue a feedback message for Firebase; returns (WriteHandle, None) or (None, error message)"""
+    uid = (st.session_state.user_data or {}).get('uid')
+    wait = write_limiter.check(f"user:{uid}" if uid else None, client_ip_key())
+    if wait:
+        return None, f"You're sending feedback too quickly. Please try again in {max(wait, 1):.0f} seconds."
     try:
         feedback_data = {
             "name": name,
@@ -315,25 +361,27 @@ def save_feedback_firebase(name, email, subject, message, rating):
             "created_at": datetime.now().isoformat(),
             "status": "new"
         }
-        db.child("feedback").push(feedback_data)
-        return True
+        return get_write_queue().push("feedback", feedback_data), None
     except Exception as e:
-        st.error(f"Error saving feedback: {e}")
-        return False
+        print(f"Feedback error: {e}")
+        inc("firebase_errors", op="feedback")
+        return None, "❌ Failed to submit feedback. Please try again."
 
+@timed("firebase_call", op="update_theme")
 def update_user_theme_firebase(uid, theme):
     """Update user theme in Firebase"""
     try:
-        db.child("users").child(uid).child("theme").set(theme)
+        update_profile_field(uid, "theme", theme)
         return True
     except Exception as e:
         st.error(f"Error updating theme: {e}")
         return False
 
+@timed("firebase_call", op="update_picture")
 def update_user_profile_picture_firebase(uid, profile_picture_url):
     """Update user profile picture in Firebase"""
     try:
-        db.child("users").child(uid).child("profile_picture").set(profile_picture_url)
+        update_profile_field(uid, "profile_picture", profile_picture_url)
         return True
     except Exception as e:
         st.error(f"Error updating profile picture: {e}")
@@ -348,14 +396,65 @@ def init_session_state():
         st.session_state.user_data = None
     if "theme" not in st.session_state:
         st.session_state.theme = "dark"
-    if "chat_history" not in st.session_state:
-        st.session_state.chat_history = []
     if "force_nav" not in st.session_state:
         st.session_state.force_nav = None
+    if "resume_checked" not in st.session_state:
+        st.session_state.resume_checked = True
+        if not st.session_state.authenticated:
+            resume_session_from_cookie()
+
+def resume_session_from_cookie():
+    """Sign in from a valid session cookie (reload or new tab) without calling Firebase Auth"""
+    # st.context.cookies needs Streamlit 1.37+; older versions simply don't resume
+    cookies = getattr(getattr(st, "context", None), "cookies", None) or {}
+    token = cookies.get(SESSION_COOKIE)
+    if not token:
+        return
+    uid = resume_session(token)
+    if uid is None:
+        st.session_state.session_cookie_update = ""  # expired or revoked: drop the cookie
+        return
+    # State saved by whichever worker served this login before; else rebuilt from the profile
+    shared = open_shared_session(token)
+    user_data = shared.get("user_data") if shared else None
+    if not user_data or user_data.get("uid") != uid:
+        try:
+            with timer("firebase_call", op="resume"):
+                profile = fetch_profile(get_firebase().database(), uid)
+        except Exception as e:
+            print(f"Session resume error: {e}")
+            return
+        if not profile:
+            return
+        user_data = {"uid": uid, "email": profile.get("email"), "token": None, **profile}
+        if shared:
+            shared.set("user_data", user_data)
+            shared.set("theme", profile.get("theme", "dark"))
+    st.session_state.shared_session = shared
+    st.session_state.session_token = token
+    st.session_state.authenticated = True
+    st.session_state.user_data = user_data
+    st.session_state.theme = shared.get("theme", "dark") if shared else user_data.get("theme", "dark")
+
+def save_shared(field, value):
+    """Change a field of the shared session state (written back when the rerun ends)"""
+    shared = st.session_state.get("shared_session")
+    if shared is not None:
+        if field == "user_data":
+            value = {**value, "token": None}  # the Firebase ID token stays in this process
+        shared.set(field, value)
+
+def flush_shared_session():
+    """Write back the shared session fields changed during this rerun"""
+    shared = st.session_state.get("shared_session")
+    if shared is not None:
+        shared.flush()
 
 # ---------- Auth screens ----------
 def login_signup_page():
     """Display login and signup page"""
+    from streamlit_lottie import st_lottie
+
     st.markdown('<h1 class="big-title">Welcome to TravelViz</h1>', unsafe_allow_html=True)
 
     lottie_travel = load_lottieurl("https://assets5.lottiefiles.com/packages/lf20_puciaact.json")
@@ -386,9 +485,14 @@ def login_signup_page():
                                 success, result = login_user_firebase(email.strip(), password)
                                 
                             if success:
+                                st.session_state.session_token = result.pop("session_token", None)
+                                st.session_state.session_cookie_update = st.session_state.session_token
                                 st.session_state.authenticated = True
                                 st.session_state.user_data = result
                                 st.session_state.theme = result.get("theme", "dark")
+                                st.session_state.shared_session = open_shared_session(st.session_state.session_token)
+                                save_shared("user_data", result)
+                                save_shared("theme", st.session_state.theme)
                                 st.success("Login successful!")
                                 time.sleep(1)
                                 st.rerun()
@@ -441,6 +545,8 @@ def login_signup_page():
 # ---------- Pages ----------
 def home_page():
     """Home page content"""
+    from streamlit_lottie import st_lottie
+
     st.markdown('<h1 class="big-title">TravelViz Analytics Platform</h1>', unsafe_allow_html=True)
     
     lottie_analytics = load_lottieurl("https://assets2.lottiefiles.com/packages/lf20_qp1q7mct.json")
@@ -479,6 +585,12 @@ def home_page():
 
 def dashboard_page():
     """Dashboard page with Power BI embed"""
+    import pandas as pd
+
+    from travelviz_charts import chart_series
+    from travelviz_forecast import get_forecasts
+    from travelviz_rollups import get_cube
+
     st.markdown('<h2 class="section-header">Travel Analytics Dashboard</h2>', unsafe_allow_html=True)
 
     left, right = st.columns([3, 1])
@@ -510,16 +622,11 @@ def dashboard_page():
         unsafe_allow_html=True,
     )
 
-    # Statistics cards
+    # Statistics cards (computed from data.db, cached per data version)
     a, b, c, d = st.columns(4)
-    stats = [
-        ("Total countries", "153", "#FF6B6B"),
-        ("Total years", "10", "#00D1FF"),
-        ("Min Arrivals", "3400", "#FF6B6B"),
-        ("Growth %", "48.5%", "#00D1FF"),
-    ]
+    colors = ["#FF6B6B", "#00D1FF", "#FF6B6B", "#00D1FF"]
     
-    for col, (title, val, color) in zip([a, b, c, d], stats):
+    for col, (title, val), color in zip([a, b, c, d], stat_cards(), colors):
         with col:
             st.markdown(
                 f"""
@@ -531,72 +638,126 @@ def dashboard_page():
                 unsafe_allow_html=True,
             )
 
-def insights_page():
-    """AI insights page with Q&A dataset chatbot functionality"""
-    st.markdown('<h2 class="section-header">AI Travel Insights</h2>', unsafe_allow_html=True)
-    st.info("🤖 Ask me anything about your TravelViz dashboard data - I can answer questions based on the Power BI analytics!")
+    # Native filters (answered from the precomputed country x year cube)
+    st.markdown('<h3 class="card-title">Explore Arrivals</h3>', unsafe_allow_html=True)
+    cube = get_cube()
+    if not cube:
+        st.info("📥 Load arrivals data into data.db to enable interactive filters (see README).")
+        return
 
-    # Q&A Dataset
-    qa_dataset = [
-        ("Which country had the highest tourist arrivals overall?", "The United States, with 546M arrivals."),
-        ("Which country had the second highest arrivals?", "Spain, with 552M arrivals."),
-        ("What is the growth percentage for Vanuatu?", "0.12%."),
-        ("How many total tourist arrivals were recorded from 2003 to 2012?", "8263M total tourist arrivals."),
-        ("What was the growth percentage across all countries?", "48.54%."),
-        ("How many countries are covered in the dashboard?", "153 countries."),
-        ("How many years are covered in the data?", "10 years, from 2003 to 2012."),
-        ("Which year had the highest arrivals?", "2012, with 82M arrivals."),
-        ("Which year had the lowest arrivals?", "2003, with 49M arrivals."),
-        ("What is the forecasted number of arrivals for the next year?", "Around 1 billion arrivals (based on the forecast chart)."),
-        ("Which countries are in the top 10 for total arrivals?", "United States, Vietnam, Zimbabwe, Uruguay, Yemen Rep., Zambia, Venezuela RB, Virgin Islands (U.S.), West Bank & Gaza, Vanuatu."),
-        ("What is the average number of arrivals per country?", "5.40M average arrivals."),
-        ("What is the maximum number of arrivals for a country?", "83M."),
-        ("What is the minimum number of arrivals for a country?", "3400."),
-        ("Which country had the largest % change in tourism arrivals?", "Vanuatu with 669% change.")
-    ]
+    years = cube.years
+    f1, f2, f3, f4 = st.columns([2, 2, 2, 1])
+    with f1:
+        if len(years) > 1:
+            year_from, year_to = st.slider("Year range", int(years[0]), int(years[-1]),
+                                           (int(years[0]), int(years[-1])), key="filter_years")
+        else:
+            year_from = year_to = int(years[0])
+            st.write(f"**Year:** {year_from}")
+    with f2:
+        regions = st.multiselect("Region", cube.region_names, key="filter_regions")
+    with f3:
+        countries = st.multiselect("Countries", cube.codes, key="filter_countries",
+                                   format_func=lambda code: cube.names[cube.index[code]])
+    with f4:
+        top_n = st.number_input("Top N", min_value=1, max_value=50, value=10, key="filter_top_n")
 
-    def find_best_answer(user_input):
-        """Find the best matching answer from Q&A dataset using fuzzy matching"""
-        import difflib
-        
-        user_input_lower = user_input.lower()
-        best_match = None
-        best_score = 0
-        
-        for question, answer in qa_dataset:
-            # Check for direct keyword matches first
-            question_lower = question.lower()
-            
-            # Calculate similarity using difflib
-            similarity = difflib.SequenceMatcher(None, user_input_lower, question_lower).ratio()
-            
-            # Boost score for keyword matches
-            keywords_in_question = question_lower.split()
-            keywords_in_user = user_input_lower.split()
-            keyword_matches = sum(1 for word in keywords_in_user if any(word in q_word for q_word in keywords_in_question))
-            
-            # Combined score
-            final_score = similarity + (keyword_matches * 0.1)
-            
-            if final_score > best_score and final_score > 0.3:  # Minimum threshold
-                best_score = final_score
-                best_match = (question, answer)
-        
-        if best_match:
-            return best_match[1]
+    start = time.perf_counter()
+    result = cube.query(year_from, year_to, countries, regions, top_n)
+    elapsed_ms = (time.perf_counter() - start) * 1000
+
+    forecasts = get_forecasts()
+
+    m1, m2, m3, m4 = st.columns(4)
+    m1.metric("Arrivals", format_arrivals(result["total"]))
+    m2.metric("Countries", result["countries"])
+    m3.metric("Growth %", f"{result['growth_pct']:.1f}%")
+    if forecasts is not None:
+        forecast_total = forecasts.total_for(cube.country_mask(countries, regions))
+        m4.metric(f"Forecast {forecasts.target_year}", format_arrivals(forecast_total))
+
+    if result["top"]:
+        top = pd.DataFrame(
+            {"Arrivals": [total for _, _, total, _ in result["top"]]},
+            index=[name for _, name, _, _ in result["top"]],
+        )
+        st.bar_chart(top)
+    st.caption(f"Filtered {len(cube)} countries × {len(years)} years in {elapsed_ms:.1f} ms")
+
+    # Trend charts (downsampled on the server to the chart width, cached per range)
+    st.markdown('<h3 class="card-title">Arrival Trends</h3>', unsafe_allow_html=True)
+    x, y = chart_series("global", year_from, year_to)
+    st.line_chart(pd.DataFrame({"Year": x, "Arrivals": y}), x="Year", y="Arrivals")
+
+    trend_codes = countries[:10] or [code for code, _, _, _ in result["top"][:5]]
+    frames = []
+    for code in trend_codes:
+        x, y = chart_series(code, year_from, year_to)
+        frames.append(pd.DataFrame({"Year": x, "Arrivals": y, "Country": cube.names[cube.index[code]]}))
+    if frames:
+        st.line_chart(pd.concat(frames), x="Year", y="Arrivals", color="Country")
+
+def qa_answer(question):
+    """Answer a question from the Q&A engine (facts from data.db override the published answers)"""
+    from travelviz_forecast import get_forecast_facts
+    from travelviz_qa import get_qa_engine
+
+    # Q&A engine (index built once per process, shared by all sessions)
+    facts_version, facts = get_qa_facts()
+    facts = facts + get_forecast_facts()
+    return get_qa_engine(facts, facts_version).find_best_answer(question)
+
+def get_chat_history():
+    """This session's ChatHistory, (re)loaded from data.db for the signed-in user"""
+    uid = (st.session_state.user_data or {}).get('uid')
+    history = st.session_state.get("chat_history")
+    if history is None or history.uid != uid:
+        shared = st.session_state.get("shared_session")
+        state = shared.get("chat_history") if shared else None
+        if state and state.get("uid") == uid:
+            history = ChatHistory.from_state(state)
         else:
-            return "I can only answer questions based on the dashboard data. Please ask about tourist arrivals, countries, years (2003-2012), growth percentages, or forecasts."
+            history = ChatHistory(uid)
+            save_shared("chat_history", history.to_state())
+        st.session_state.chat_history = history
+        st.session_state.chat_shown = CHAT_PAGE_SIZE
+    return history
 
-    st.markdown('<div class="chat-container">', unsafe_allow_html=True)
-    st.markdown('<h3 class="card-title">Dashboard Q&A Assistant</h3>', unsafe_allow_html=True)
-    st.markdown('<p class="card-subtitle">Ask questions about tourist arrivals, countries, growth rates, and forecasts from the Power BI dashboard (2003-2012 data)</p>', unsafe_allow_html=True)
+def ask_question(question):
+    """Widget callback: append a question and its answer to the chat history"""
+    if question:
+        history = get_chat_history()
+        history.append('user', question)
+        history.append('assistant', qa_answer(question))
+        save_shared("chat_history", history.to_state())
+
+def ask_typed_question():
+    ask_question(st.session_state.get("chat_input", "").strip())
+
+def clear_chat():
+    history = get_chat_history()
+    history.clear()
+    save_shared("chat_history", history.to_state())
+    st.session_state.chat_shown = CHAT_PAGE_SIZE
+
+def load_earlier_chat():
+    st.session_state.chat_shown += CHAT_PAGE_SIZE
+
+@page_fragment("AI Insights")
+def chat_fragment():
+    """Chat area; its buttons rerun only this fragment, not the whole page"""
+    from streamlit_chat import message
 
-    # Display chat history
-    for i, msg in enumerate(st.session_state.chat_history):
+    # Display the latest page(s) of the chat history (callbacks below have already updated it);
+    # keys follow message ids so paging doesn't remount the rendered messages
+    messages, has_earlier = get_chat_history().recent(st.session_state.chat_shown)
+    if has_earlier:
+        st.button("⬆️ Load earlier messages", key="chat_earlier", on_click=load_earlier_chat)
+    for msg in messages:
         if msg['role'] == 'user':
-            message(msg['content'], is_user=True, key=f"user_{i}")
+            message(msg['content'], is_user=True, key=f"user_{msg['id']}")
         else:
-            message(msg['content'], key=f"bot_{i}")
+            message(msg['content'], key=f"bot_{msg['id']}")
 
     # Quick question buttons based on Q&A dataset
     st.markdown("**🎯 Quick Questions:**")
@@ -609,37 +770,113 @@ def insights_page():
     ]
     
     for col, (button_text, question) in zip([col1, col2, col3], quick_questions):
-        if col.button(button_text):
-            answer = find_best_answer(question)
-            st.session_state.chat_history.extend([
-                {'role': 'user', 'content': question},
-                {'role': 'assistant', 'content': answer}
-            ])
-            st.rerun()
-
-
-
-    
+        col.button(button_text, on_click=ask_question, args=(question,))
 
     # Chat input
-    user_input = st.text_input("Ask about dashboard data (countries, arrivals, years 2003-2012, growth rates, forecasts)...", key="chat_input")
+    st.text_input("Ask about dashboard data (countries, arrivals, years 2003-2012, growth rates, forecasts)...", key="chat_input")
     
     col_send, col_clear = st.columns([1, 1])
     with col_send:
-        if st.button("📊 Ask", key="send_btn") and user_input:
-            st.session_state.chat_history.append({'role': 'user', 'content': user_input})
-            with st.spinner("Searching dashboard data..."):
-                time.sleep(0.8)  # Brief delay for UX
-                response = find_best_answer(user_input)
-                st.session_state.chat_history.append({'role': 'assistant', 'content': response})
-            st.rerun()
+        st.button("📊 Ask", key="send_btn", on_click=ask_typed_question)
     
     with col_clear:
-        if st.button("🗑️ Clear Chat"):
-            st.session_state.chat_history = []
-            st.rerun()
+        st.button("🗑️ Clear Chat", on_click=clear_chat)
+
+def insights_page():
+    """AI insights page with Q&A dataset chatbot functionality"""
+    st.markdown('<h2 class="section-header">AI Travel Insights</h2>', unsafe_allow_html=True)
+    st.info("🤖 Ask me anything about your TravelViz dashboard data - I can answer questions based on the Power BI analytics!")
+
+    st.markdown('<div class="chat-container">', unsafe_allow_html=True)
+    st.markdown('<h3 class="card-title">Dashboard Q&A Assistant</h3>', unsafe_allow_html=True)
+    st.markdown('<p class="card-subtitle">Ask questions about tourist arrivals, countries, growth rates, and forecasts from the Power BI dashboard (2003-2012 data)</p>', unsafe_allow_html=True)
+
+    chat_fragment()
+
+@page_fragment("Profile")
+def profile_picture_fragment():
+    """Profile picture display and upload; uploads and updates rerun only this fragment"""
+    user = st.session_state.user_data
 
+    # Shown after the fragment reran to display the new picture
+    flash = st.session_state.pop("profile_flash", None)
+    if flash:
+        st.success(flash)
+
+    st.markdown('<div class="profile-image-container">', unsafe_allow_html=True)
+    
+    # Display current profile picture
+    profile_picture = profile_image_src(user.get('profile_picture', ''))
+    if profile_picture:
+        st.markdown(f'<img src="{profile_picture}" class="profile-image">', unsafe_allow_html=True)
+    elif AVATAR_FILE.exists():
+        st.image(str(AVATAR_FILE), width=160, caption="Default Avatar")
+    else:
+        st.markdown('<div style="width: 160px; height: 160px; border-radius: 50%; background: linear-gradient(135deg, #FF6B6B, #00D1FF); display: flex; align-items: center; justify-content: center; margin: 0 auto;"><span style="font-size: 4rem; color: white;">👤</span></div>', unsafe_allow_html=True)
+    
+    st.markdown('</div>', unsafe_allow_html=True)
+    
+    # Profile picture upload
+    st.markdown('<h4 class="card-title" style="text-align: center; margin-top: 1rem;">Profile Picture</h4>', unsafe_allow_html=True)
     
+    uploaded_file = st.file_uploader("Choose a profile picture", type=['png', 'jpg', 'jpeg'], key="profile_upload")
+    
+    if uploaded_file is not None:
+        # Hash each upload once; reruns while it stays attached reuse the digest
+        upload_state = st.session_state.get("profile_upload_digest")
+        if not upload_state or upload_state[0] != uploaded_file.file_id:
+            upload_state = (uploaded_file.file_id, image_digest(uploaded_file.getvalue()))
+            st.session_state.profile_upload_digest = upload_state
+        upload_digest = upload_state[1]
+
+        # Variants are generated in a worker process, once per distinct image
+        try:
+            processing = process_image_async(uploaded_file.getvalue(), upload_digest)
+        except ImageRejectedError as e:
+            processing = None
+            st.error(f"Error processing image: {e}")
+        except BrokenProcessPool:
+            processing = None
+            st.error("Image processing is temporarily unavailable. Please try again.")
+
+        if processing is not None and is_broken(processing):
+            # The next rerun resubmits it to a fresh worker pool
+            st.error("Image processing was interrupted. Please try uploading again.")
+        elif processing is not None and processing.done() and processing.exception():
+            st.error(f"Error processing image: {processing.exception()}")
+        elif processing is not None:
+            if processing.done():
+                st.image(processing.result()["md"], width=160, caption="Preview")
+            else:
+                st.caption("Processing image…")
+
+            # Update in Firebase (only a content-hash reference; the variants live in the image store)
+            if st.button("📸 Update Profile Picture", key="update_pic"):
+                with st.spinner("Updating profile picture..."):
+                    try:
+                        picture_ref = store_profile_image(uploaded_file.getvalue(), upload_digest)
+                    except BrokenProcessPool:
+                        picture_ref = None
+                        st.error("Image processing was interrupted. Please try again.")
+                    except Exception as e:
+                        picture_ref = None
+                        st.error(f"Error processing image: {e}")
+                    if picture_ref and update_user_profile_picture_firebase(user['uid'], picture_ref):
+                        st.session_state.user_data['profile_picture'] = picture_ref
+                        save_shared("user_data", st.session_state.user_data)
+                        st.session_state.profile_flash = "Profile picture updated successfully!"
+                        rerun_fragment()
+                    elif picture_ref:
+                        st.error("Failed to update profile picture.")
+    
+    # Remove profile picture button
+    if user.get('profile_picture'):
+        if st.button("🗑️ Remove Picture", key="remove_pic"):
+            if update_user_profile_picture_firebase(user['uid'], ""):
+                st.session_state.user_data['profile_picture'] = ""
+                save_shared("user_data", st.session_state.user_data)
+                st.session_state.profile_flash = "Profile picture removed!"
+                rerun_fragment()
 
 def profile_page():
     """Enhanced profile page with profile picture upload functionality"""
@@ -650,68 +887,7 @@ def profile_page():
     col1, col2 = st.columns([1, 2])
     
     with col1:
-        st.markdown('<div class="profile-image-container">', unsafe_allow_html=True)
-        
-        # Display current profile picture
-        profile_picture = user.get('profile_picture', '')
-        if profile_picture:
-            st.markdown(f'<img src="data:image/jpeg;base64,{profile_picture}" class="profile-image">', unsafe_allow_html=True)
-        elif AVATAR_FILE.exists():
-            st.image(str(AVATAR_FILE), width=160, caption="Default Avatar")
-        else:
-            st.markdown('<div style="width: 160px; height: 160px; border-radius: 50%; background: linear-gradient(135deg, #FF6B6B, #00D1FF); display: flex; align-items: center; justify-content: center; margin: 0 auto;"><span style="font-size: 4rem; color: white;">👤</span></div>', unsafe_allow_html=True)
-        
-        st.markdown('</div>', unsafe_allow_html=True)
-        
-        # Profile picture upload
-        st.markdown('<h4 class="card-title" style="text-align: center; margin-top: 1rem;">Profile Picture</h4>', unsafe_allow_html=True)
-        
-        uploaded_file = st.file_uploader("Choose a profile picture", type=['png', 'jpg', 'jpeg'], key="profile_upload")
-        
-        if uploaded_file is not None:
-            import base64
-            from PIL import Image
-            import io
-            
-            # Process the uploaded image
-            try:
-                # Open and resize image
-                image = Image.open(uploaded_file)
-                
-                # Convert to RGB if necessary
-                if image.mode != 'RGB':
-                    image = image.convert('RGB')
-                
-                # Resize image to 300x300 for storage efficiency
-                image = image.resize((300, 300), Image.Resampling.LANCZOS)
-                
-                # Convert to base64
-                buffered = io.BytesIO()
-                image.save(buffered, format="JPEG", quality=85)
-                img_str = base64.b64encode(buffered.getvalue()).decode()
-                
-                # Update in Firebase
-                if st.button("📸 Update Profile Picture", key="update_pic"):
-                    with st.spinner("Updating profile picture..."):
-                        if update_user_profile_picture_firebase(user['uid'], img_str):
-                            st.session_state.user_data['profile_picture'] = img_str
-                            st.success("Profile picture updated successfully!")
-                            time.sleep(1)
-                            st.rerun()
-                        else:
-                            st.error("Failed to update profile picture.")
-                
-            except Exception as e:
-                st.error(f"Error processing image: {e}")
-        
-        # Remove profile picture button
-        if user.get('profile_picture'):
-            if st.button("🗑️ Remove Picture", key="remove_pic"):
-                if update_user_profile_picture_firebase(user['uid'], ""):
-                    st.session_state.user_data['profile_picture'] = ""
-                    st.success("Profile picture removed!")
-                    time.sleep(1)
-                    st.rerun()
+        profile_picture_fragment()
 
     with col2:
         st.markdown('<h3 class="card-title">Account Details</h3>', unsafe_allow_html=True)
@@ -726,6 +902,66 @@ def profile_page():
         
         
 
+@page_fragment("Feedback")
+def feedback_form_fragment():
+    """Feedback form and delivery status; submitting reruns only this fragment"""
+    st.markdown('<h3 class="card-title">Send us your feedback</h3>', unsafe_allow_html=True)
+    st.markdown('<p class="card-subtitle">Help us improve TravelViz with your valuable feedback</p>', unsafe_allow_html=True)
+    
+    with st.form("feedback_form"):
+        name = st.text_input("Name *", value=st.session_state.user_data.get('full_name', ''))
+        email = st.text_input("Email *", value=st.session_state.user_data.get('email', ''))
+        
+        # Rating system
+        st.markdown("**Overall Rating ***")
+        rating = st.selectbox("Rate your experience", 
+                            options=[5, 4, 3, 2, 1], 
+                            format_func=lambda x: f"⭐" * x + f" ({x}/5)",
+                            index=0)
+        
+        # Feedback categories
+        subject = st.selectbox("Feedback Category *", [
+            "General Feedback",
+            "Dashboard Issues", 
+            "AI Insights",
+            "Profile & Account",
+            "Performance Issues",
+            "Feature Request",
+            "Bug Report",
+            "Other"
+        ])
+        
+        message_txt = st.text_area("Your Message *", height=150, 
+                                placeholder="Please describe your feedback, suggestions, or issues...")
+        
+        # Additional options
+        follow_up = st.checkbox("I would like a follow-up response", value=True)
+        newsletter = st.checkbox("Subscribe to TravelViz updates", value=False)
+        
+        submit_btn = st.form_submit_button("📤 Send Feedback", use_container_width=True)
+        
+        if submit_btn:
+            if all([name, email, message_txt]):
+                handle, error = save_feedback_firebase(name, email, subject, message_txt, rating)
+                if handle:
+                    st.session_state.feedback_handle = handle
+                    st.success("✅ Thank you! Your feedback has been submitted successfully.")
+                    st.balloons()  # Fun feedback animation
+                else:
+                    st.error(error)
+            else:
+                st.warning("⚠️ Please fill all required fields!")
+
+    # Delivery status of the last submission (written in the background)
+    handle = st.session_state.get("feedback_handle")
+    if handle is not None:
+        if handle.status == handle.FAILED:
+            st.error("❌ Your last feedback could not be delivered. Please try again.")
+        elif handle.status == handle.PENDING:
+            st.caption("Delivering your feedback…")
+    
+    st.markdown('</div>', unsafe_allow_html=True)
+
 def feedback_page():
     """Enhanced feedback page with Firebase integration and rating system"""
     st.markdown('<h2 class="section-header">Feedback</h2>', unsafe_allow_html=True)
@@ -733,55 +969,7 @@ def feedback_page():
     col1, col2 = st.columns([1, 1])
 
     with col1:
-        
-        st.markdown('<h3 class="card-title">Send us your feedback</h3>', unsafe_allow_html=True)
-        st.markdown('<p class="card-subtitle">Help us improve TravelViz with your valuable feedback</p>', unsafe_allow_html=True)
-        
-        with st.form("feedback_form"):
-            name = st.text_input("Name *", value=st.session_state.user_data.get('full_name', ''))
-            email = st.text_input("Email *", value=st.session_state.user_data.get('email', ''))
-            
-            # Rating system
-            st.markdown("**Overall Rating ***")
-            rating = st.selectbox("Rate your experience", 
-                                options=[5, 4, 3, 2, 1], 
-                                format_func=lambda x: f"⭐" * x + f" ({x}/5)",
-                                index=0)
-            
-            # Feedback categories
-            subject = st.selectbox("Feedback Category *", [
-                "General Feedback",
-                "Dashboard Issues", 
-                "AI Insights",
-                "Profile & Account",
-                "Performance Issues",
-                "Feature Request",
-                "Bug Report",
-                "Other"
-            ])
-            
-            message_txt = st.text_area("Your Message *", height=150, 
-                                    placeholder="Please describe your feedback, suggestions, or issues...")
-            
-            # Additional options
-            follow_up = st.checkbox("I would like a follow-up response", value=True)
-            newsletter = st.checkbox("Subscribe to TravelViz updates", value=False)
-            
-            submit_btn = st.form_submit_button("📤 Send Feedback", use_container_width=True)
-            
-            if submit_btn:
-                if all([name, email, message_txt]):
-                    with st.spinner("Sending your feedback..."):
-                        time.sleep(1)  # Simulate processing
-                        if save_feedback_firebase(name, email, subject, message_txt, rating):
-                            st.success("✅ Thank you! Your feedback has been submitted successfully.")
-                            st.balloons()  # Fun feedback animation
-                        else:
-                            st.error("❌ Failed to submit feedback. Please try again.")
-                else:
-                    st.warning("⚠️ Please fill all required fields!")
-        
-        st.markdown('</div>', unsafe_allow_html=True)
+        feedback_form_fragment()
 
     with col2:
         # FAQ Section
@@ -804,10 +992,23 @@ def feedback_page():
 # ---------- Main Application ----------
 def main():
     """Main application function"""
+    from streamlit_option_menu import option_menu
+
     init_session_state()
     inject_css()
 
+    # Store or clear the session cookie in the browser after login/logout
+    cookie_update = st.session_state.pop("session_cookie_update", None)
+    if cookie_update is not None:
+        if hasattr(st, "iframe"):
+            st.iframe(cookie_script(cookie_update or None), height=1)
+        else:
+            import streamlit.components.v1 as components
+
+            components.html(cookie_script(cookie_update or None), height=0)
+
     if not st.session_state.authenticated:
+        set_page("Login")
         login_signup_page()
         return
 
@@ -878,6 +1079,11 @@ def main():
         st.markdown('<div class="user-actions">', unsafe_allow_html=True)
         
         if st.button("🚪 Logout", key="logout_btn", use_container_width=True):
+            revoke_session(st.session_state.pop("session_token", None))
+            shared = st.session_state.pop("shared_session", None)
+            if shared is not None:
+                shared.delete()
+            st.session_state.session_cookie_update = ""
             # Clear session state
             for key in ['authenticated', 'user_data', 'chat_history', 'force_nav']:
                 if key in st.session_state:
@@ -901,7 +1107,13 @@ def main():
     }
     
     if selected in page_functions:
-        page_functions[selected]()
+        set_page(selected)
+        with timer("page_render", page=selected):
+            page_functions[selected]()
 
 if __name__ == "__main__":
-    main()
+    with timer("rerun"), profile_rerun():
+        try:
+            main()
+        finally:
+            flush_shared_session()
@@ -0,0 +1,304 @@
+"""In-process metrics: latency histograms, error counters and their export
+
+Timers around reruns, pages, CSS injection, asset loads and Firebase calls
+feed Prometheus-style histograms (cumulative buckets plus sum and count).
+Errors are counted per timer. The stats other modules already keep (HTTP
+pool, breakers and limiters, write queue, profile and Lottie caches) are
+exported as gauges alongside them.
+
+Export, both optional and process-wide:
+
+- METRICS_PORT: serve /metrics (Prometheus text format) and /metrics.json
+  on METRICS_HOST (127.0.0.1 by default);
+- METRICS_FILE: append a JSON snapshot line every METRICS_INTERVAL seconds.
+"""
+import json
+import os
+import sys
+import threading
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
+from functools import wraps
+
+METRICS_PORT = int(os.getenv("METRICS_PORT", 0))
+METRICS_HOST = os.getenv("METRICS_HOST", "127.0.0.1")
+METRICS_FILE = os.getenv("METRICS_FILE", "")
+METRICS_INTERVAL = float(os.getenv("METRICS_INTERVAL", 60))
+PREFIX = "travelviz_"
+
+# Seconds; spans a cached rerun (a few ms) to a Firebase timeout
+BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+class Histogram:
+    """Fixed-bucket latency histogram"""
+
+    def __init__(self, buckets=BUCKETS):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value):
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+    def cumulative(self):
+        """(upper bound, count <= bound) pairs ending with +Inf, as Prometheus expects"""
+        total, result = 0, []
+        for bound, count in zip(self.buckets + (float("inf"),), self.counts):
+            total += count
+            result.append((bound, total))
+        return result
+
+    def quantile(self, q):
+        """Upper bound of the bucket holding the q-quantile (an estimate, like histogram_quantile)"""
+        if not self.count:
+            return 0.0
+        rank = q * self.count
+        for bound, total in self.cumulative():
+            if total >= rank:
+                return bound if bound != float("inf") else self.buckets[-1]
+        return self.buckets[-1]
+
+
+class Registry:
+    """Histograms and counters keyed by (name, sorted labels)"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._histograms = {}
+        self._counters = {}
+
+    def observe(self, name, seconds, **labels):
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            histogram = self._histograms.get(key)
+            if histogram is None:
+                histogram = self._histograms[key] = Histogram()
+            histogram.observe(seconds)
+
+    def inc(self, name, amount=1, **labels):
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            self._counters[key] = self._counters.get(key, 0) + amount
+
+    def snapshot(self):
+        with self._lock:
+            histograms = {
+                key: {"buckets": h.cumulative(), "sum": h.sum, "count": h.count,
+                      "p50": h.quantile(0.5), "p95": h.quantile(0.95), "p99": h.quantile(0.99)}
+                for key, h in self._histograms.items()
+            }
+            counters = dict(self._counters)
+        return histograms, counters
+
+    def reset(self):
+        with self._lock:
+            self._histograms.clear()
+            self._counters.clear()
+
+
+registry = Registry()
+
+
+@contextmanager
+def timer(name, **labels):
+    """Record the duration of the block in <name>_seconds; exceptions also count in <name>_errors_total
+
+    Streamlit's rerun/stop signals are BaseExceptions, so they are timed but not counted as errors.
+    """
+    start = time.perf_counter()
+    try:
+        yield
+    except Exception:
+        registry.inc(f"{name}_errors_total", **labels)
+        raise
+    finally:
+        registry.observe(f"{name}_seconds", time.perf_counter() - start, **labels)
+
+
+def timed(name, **labels):
+    """Decorator form of timer()"""
+    def decorator(fn):
+        @wraps(fn)
+        def wrapper(*args, **kwargs):
+            with timer(name, **labels):
+                return fn(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+def observe(name, seconds, **labels):
+    registry.observe(f"{name}_seconds", seconds, **labels)
+
+
+def inc(name, amount=1, **labels):
+    registry.inc(f"{name}_total", amount, **labels)
+
+
+# ---------- Gauges from other modules ----------
+def _numeric(mapping):
+    return {k: v for k, v in mapping.items() if isinstance(v, (int, float)) and not isinstance(v, bool)}
+
+
+def collect_gauges():
+    """(name, labels, value) for the stats of every module loaded in this process
+
+    Modules that haven't been imported yet are skipped rather than imported,
+    so exporting never pulls in pyrebase or Pillow.
+    """
+    modules = sys.modules
+    gauges = []
+
+    def add(prefix, mapping, **labels):
+        for key, value in _numeric(mapping).items():
+            gauges.append((f"{prefix}_{key}", tuple(sorted(labels.items())), value))
+
+    if "travelviz_http" in modules:
+        for host, entry in modules["travelviz_http"].transport_stats().items():
+            add("http", entry, host=host)
+    if "travelviz_guard" in modules:
+        guard = modules["travelviz_guard"].guard_stats()
+        for breaker, entry in guard["breakers"].items():
+            add("breaker", entry, breaker=breaker)
+            gauges.append(("breaker_open", (("breaker", breaker),), 0 if entry["state"] == "closed" else 1))
+        for limiter, entry in guard["limiters"].items():
+            add("limiter", entry, limiter=limiter)
+    writes = modules.get("travelviz_writes")
+    if writes is not None and writes._queue is not None:
+        add("write_queue", writes._queue.stats)
+        gauges.append(("write_queue_pending", (), writes._queue.pending_count()))
+    if "travelviz_profiles" in modules:
+        add("profile_cache", modules["travelviz_profiles"].profile_cache.stats())
+    if "travelviz_assets" in modules:
+        add("lottie_cache", modules["travelviz_assets"].lottie_cache_stats())
+    return gauges
+
+
+# ---------- Export ----------
+def _label_text(labels, extra=()):
+    pairs = list(labels) + list(extra)
+    if not pairs:
+        return ""
+    escaped = (str(v).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n") for _, v in pairs)
+    return "{" + ",".join(f'{k}="{v}"' for (k, _), v in zip(pairs, escaped)) + "}"
+
+
+def prometheus_text():
+    """All metrics in the Prometheus text exposition format"""
+    histograms, counters = registry.snapshot()
+    lines = []
+    typed = set()
+
+    def declare(name, kind):
+        if name not in typed:
+            typed.add(name)
+            lines.append(f"# TYPE {name} {kind}")
+
+    for (name, labels), h in sorted(histograms.items()):
+        metric = PREFIX + name
+        declare(metric, "histogram")
+        for bound, total in h["buckets"]:
+            le = "+Inf" if bound == float("inf") else repr(bound)
+            lines.append(f"{metric}_bucket{_label_text(labels, [('le', le)])} {total}")
+        lines.append(f"{metric}_sum{_label_text(labels)} {h['sum']:.6f}")
+        lines.append(f"{metric}_count{_label_text(labels)} {h['count']}")
+    for (name, labels), value in sorted(counters.items()):
+        metric = PREFIX + name
+        declare(metric, "counter")
+        lines.append(f"{metric}{_label_text(labels)} {value}")
+    for name, labels, value in collect_gauges():
+        metric = PREFIX + name
+        declare(metric, "gauge")
+        lines.append(f"{metric}{_label_text(labels)} {value}")
+    return "\n".join(lines) + "\n"
+
+
+def json_snapshot():
+    """All metrics as one JSON-serializable dict (histograms with p50/p95/p99 estimates)"""
+    histograms, counters = registry.snapshot()
+
+    def entry(name, labels, **values):
+        return {"name": PREFIX + name, "labels": dict(labels), **values}
+
+    return {
+        "time": time.time(),
+        "pid": os.getpid(),
+        "histograms": [
+            entry(name, labels, count=h["count"], sum=h["sum"], p50=h["p50"], p95=h["p95"], p99=h["p99"],
+                  buckets=[["+Inf" if b == float("inf") else b, c] for b, c in h["buckets"]])
+            for (name, labels), h in sorted(histograms.items())
+        ],
+        "counters": [entry(name, labels, value=value) for (name, labels), value in sorted(counters.items())],
+        "gauges": [entry(name, labels, value=value) for name, labels, value in collect_gauges()],
+    }
+
+
+def write_jsonl(path):
+    """Append one snapshot line to path"""
+    with open(path, "a", encoding="utf-8") as f:
+        f.write(json.dumps(json_snapshot()) + "\n")
+
+
+def _serve(host, port):
+    from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            if self.path == "/metrics":
+                body, content_type = prometheus_text().encode(), "text/plain; version=0.0.4"
+            elif self.path == "/metrics.json":
+                body, content_type = json.dumps(json_snapshot()).encode(), "application/json"
+            else:
+                self.send_error(404)
+                return
+            self.send_response(200)
+            self.send_header("Content-Type", content_type)
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, format, *args):
+            pass
+
+    server = ThreadingHTTPServer((host, port), Handler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, name="metrics-http", daemon=True).start()
+    print(f"Metrics on http://{host}:{server.server_address[1]}/metrics")
+    return server
+
+
+def _dump_loop(path, interval):
+    while True:
+        time.sleep(interval)
+        try:
+            write_jsonl(path)
+        except OSError as e:
+            print(f"Metrics file error: {e}")
+
+
+_exporters_started = False
+_exporters_lock = threading.Lock()
+
+
+def start_exporters():
+    """Start the configured HTTP endpoint / JSON-lines dump once per process"""
+    global _exporters_started
+    if _exporters_started:
+        return
+    with _exporters_lock:
+        if _exporters_started:
+            return
+        _exporters_started = True
+        if METRICS_PORT:
+            try:
+                _serve(METRICS_HOST, METRICS_PORT)
+            except OSError as e:
+                # Another worker on this host already owns the port
+                print(f"Metrics endpoint error: {e}")
+        if METRICS_FILE:
+            threading.Thread(target=_dump_loop, args=(METRICS_FILE, METRICS_INTERVAL),
+                             name="metrics-file", daemon=True).start()
@@ -0,0 +1,111 @@
+"""Process-wide LRU cache of Firebase user profiles with TTL and write-through updates"""
+import os
+import threading
+import time
+from collections import OrderedDict
+
+from travelviz_writes import get_write_queue
+
+PROFILE_CACHE_TTL = float(os.getenv("PROFILE_CACHE_TTL", 300))
+PROFILE_CACHE_SIZE = int(os.getenv("PROFILE_CACHE_SIZE", 5000))
+
+
+class ProfileCache:
+    """Size-bounded LRU of uid -> profile dict; entries expire after ttl seconds"""
+
+    def __init__(self, max_size=PROFILE_CACHE_SIZE, ttl=PROFILE_CACHE_TTL):
+        self.max_size = max_size
+        self.ttl = ttl
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.expired = 0
+        self.evictions = 0
+
+    def get(self, uid):
+        """Return a copy of the cached profile, or None on a miss"""
+        with self._lock:
+            entry = self._entries.get(uid)
+            if entry is None:
+                self.misses += 1
+                return None
+            stored_at, profile = entry
+            if time.monotonic() - stored_at > self.ttl:
+                del self._entries[uid]
+                self.expired += 1
+                self.misses += 1
+                return None
+            self._entries.move_to_end(uid)
+            self.hits += 1
+            return dict(profile)
+
+    def put(self, uid, profile):
+        """Store a full profile, evicting the least recently used entries past max_size"""
+        with self._lock:
+            self._entries[uid] = (time.monotonic(), dict(profile))
+            self._entries.move_to_end(uid)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def update(self, uid, fields):
+        """Merge fields into a cached profile (no-op when the uid isn't cached)"""
+        with self._lock:
+            entry = self._entries.get(uid)
+            if entry is not None:
+                entry[1].update(fields)
+
+    def invalidate(self, uid):
+        with self._lock:
+            self._entries.pop(uid, None)
+
+    def stats(self):
+        """Hit-rate metrics for monitoring"""
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "size": len(self._entries),
+                "max_size": self.max_size,
+                "hits": self.hits,
+                "misses": self.misses,
+                "expired": self.expired,
+                "evictions": self.evictions,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+            }
+
+
+profile_cache = ProfileCache()
+
+
+# ---------- RTDB access through the cache ----------
+def fetch_profile(db, uid):
+    """Return the user's profile from the cache, falling back to RTDB (None if it doesn't exist)"""
+    profile = profile_cache.get(uid)
+    if profile is not None:
+        return profile
+    profile = db.child("users").child(uid).get().val()
+    if profile:
+        profile_cache.put(uid, profile)
+        return dict(profile)
+    return None
+
+
+def _invalidate_on_failure(uid):
+    def on_done(handle):
+        # Never keep serving a value RTDB refused
+        if handle.status == handle.FAILED:
+            profile_cache.invalidate(uid)
+    return on_done
+
+
+def queue_profile(uid, profile):
+    """Put a full profile in the cache now and queue the RTDB write; returns its WriteHandle"""
+    profile_cache.put(uid, profile)
+    return get_write_queue().set(f"users/{uid}", profile, callback=_invalidate_on_failure(uid))
+
+
+def update_profile_field(uid, field, value):
+    """Update one profile field in the cache now and queue the RTDB write; returns its WriteHandle"""
+    profile_cache.update(uid, {field: value})
+    return get_write_queue().set(f"users/{uid}/{field}", value, callback=_invalidate_on_failure(uid))
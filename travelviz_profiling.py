@@ -0,0 +1,221 @@
+"""Opt-in profiling of reruns, keeping the slowest ones per page
+
+Enabled for every session with PROFILE_RERUNS=1, or for one browser session
+by opening the app with ?profile=<PROFILE_TOKEN>. A profiled rerun (or
+fragment rerun) is captured by a sampling profiler and written as folded
+stacks (<page>/<ms>ms-<time>.folded, open with speedscope.app or
+flamegraph.pl). PROFILE_MODE=cprofile writes deterministic cProfile .prof
+files instead (snakeviz, pstats). Only the PROFILE_KEEP slowest reruns per
+page are kept on disk.
+
+List them with: python travelviz_profiling.py [page]
+"""
+import cProfile
+import heapq
+import hmac
+import os
+import sys
+import threading
+import time
+from collections import Counter
+from contextlib import contextmanager
+from pathlib import Path
+
+APP_DIR = Path(__file__).parent
+PROFILE_RERUNS = os.getenv("PROFILE_RERUNS", "").lower() in ("1", "true", "yes")
+PROFILE_TOKEN = os.getenv("PROFILE_TOKEN", "")
+PROFILE_MODE = os.getenv("PROFILE_MODE", "sample")
+PROFILE_DIR = Path(os.getenv("PROFILE_DIR", APP_DIR / ".cache" / "profiles"))
+PROFILE_KEEP = int(os.getenv("PROFILE_KEEP", 10))
+# Sampling period of the sampling profiler
+PROFILE_INTERVAL = float(os.getenv("PROFILE_INTERVAL_MS", 5)) / 1000
+
+_local = threading.local()
+
+
+def _slug(page):
+    return "".join(c if c.isalnum() else "-" for c in page.lower()).strip("-") or "page"
+
+
+class StackSampler:
+    """Samples one thread's Python stack from a helper thread and counts folded stacks"""
+
+    def __init__(self, thread_id, interval=PROFILE_INTERVAL):
+        self.thread_id = thread_id
+        self.interval = interval
+        self.stacks = Counter()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="profile-sampler", daemon=True)
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            names = []
+            while frame is not None:
+                code = frame.f_code
+                names.append(f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})")
+                frame = frame.f_back
+            if names:
+                self.stacks[";".join(reversed(names))] += 1
+
+    def start(self):
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        self._thread.join()
+
+    def has_data(self):
+        return bool(self.stacks)
+
+    def write(self, path):
+        with open(path, "w", encoding="utf-8") as f:
+            for stack, count in self.stacks.most_common():
+                f.write(f"{stack} {count}\n")
+
+
+class CProfiler:
+    """Deterministic profiler with the same interface as StackSampler"""
+
+    def __init__(self):
+        self._profile = cProfile.Profile()
+
+    def start(self):
+        self._profile.enable()
+
+    def stop(self):
+        self._profile.disable()
+
+    def has_data(self):
+        return True
+
+    def write(self, path):
+        self._profile.dump_stats(str(path))
+
+
+class ProfileStore:
+    """The `keep` slowest profiles per page, on disk; durations are encoded in the file names"""
+
+    def __init__(self, root=PROFILE_DIR, keep=PROFILE_KEEP):
+        self.root = Path(root)
+        self.keep = keep
+        self._lock = threading.Lock()
+        self._pages = None  # page slug -> min-heap of (ms, path)
+
+    def _load(self):
+        if self._pages is None:
+            self._pages = {}
+            if self.root.is_dir():
+                for page_dir in self.root.iterdir():
+                    heap = self._pages[page_dir.name] = []
+                    for path in page_dir.glob("*ms-*"):
+                        try:
+                            heapq.heappush(heap, (float(path.name.split("ms-", 1)[0]), str(path)))
+                        except ValueError:
+                            continue
+        return self._pages
+
+    def wants(self, page, ms):
+        """False if the rerun is faster than every kept one and the store is full"""
+        with self._lock:
+            heap = self._load().get(_slug(page), [])
+            return len(heap) < self.keep or ms > heap[0][0]
+
+    def add(self, page, ms, profiler):
+        """Save a profile if it is among the slowest; returns its path or None"""
+        if not self.wants(page, ms):
+            return None
+        slug = _slug(page)
+        page_dir = self.root / slug
+        page_dir.mkdir(parents=True, exist_ok=True)
+        extension = "prof" if isinstance(profiler, CProfiler) else "folded"
+        path = page_dir / f"{ms:09.1f}ms-{time.strftime('%Y%m%dT%H%M%S')}-{os.getpid()}.{extension}"
+        profiler.write(path)
+        with self._lock:
+            heap = self._load().setdefault(slug, [])
+            heapq.heappush(heap, (ms, str(path)))
+            while len(heap) > self.keep:
+                _, evicted = heapq.heappop(heap)
+                try:
+                    os.unlink(evicted)
+                except OSError:
+                    pass
+        return path
+
+    def slowest(self, page=None):
+        """(page, ms, path) of the kept profiles, slowest first"""
+        with self._lock:
+            pages = self._load()
+            rows = [
+                (slug, ms, path)
+                for slug, heap in pages.items() if page is None or slug == _slug(page)
+                for ms, path in heap
+            ]
+        return sorted(rows, key=lambda row: -row[1])
+
+
+store = ProfileStore()
+
+
+def profiling_requested():
+    """True when this rerun should be profiled (PROFILE_RERUNS, or ?profile=<PROFILE_TOKEN>)"""
+    if PROFILE_RERUNS:
+        return True
+    if not PROFILE_TOKEN:
+        return False
+    import streamlit as st
+
+    try:
+        token = st.query_params.get("profile", "")
+    except AttributeError:
+        # Streamlit < 1.30
+        token = (st.experimental_get_query_params().get("profile") or [""])[0]
+    return bool(token) and hmac.compare_digest(token, PROFILE_TOKEN)
+
+
+def set_page(page):
+    """Name the page the current rerun is rendering (profiles are stored per page)"""
+    _local.page = page
+
+
+@contextmanager
+def profile_rerun(page=None):
+    """Profile the block if profiling is requested; nested blocks run unprofiled"""
+    if getattr(_local, "active", False) or not profiling_requested():
+        yield
+        return
+    _local.active = True
+    _local.page = page
+    if PROFILE_MODE == "cprofile":
+        profiler = CProfiler()
+    else:
+        profiler = StackSampler(threading.get_ident())
+    try:
+        profiler.start()
+    except ValueError as e:
+        # cProfile refuses to start while another profiler (e.g. a debugger) is active
+        print(f"Profiler unavailable: {e}")
+        _local.active = False
+        yield
+        return
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        profiler.stop()
+        ms = (time.perf_counter() - start) * 1000
+        _local.active = False
+        if not profiler.has_data():
+            # Finished before the first sample was taken
+            return
+        try:
+            path = store.add(_local.page or "Login", ms, profiler)
+            if path:
+                print(f"Profiled {_local.page or 'Login'} rerun ({ms:.0f} ms): {path}")
+        except OSError as e:
+            print(f"Profile store error: {e}")
+
+
+if __name__ == "__main__":
+    for page, ms, path in store.slowest(sys.argv[1] if len(sys.argv) > 1 else None):
+        print(f"{page:<14} {ms:9.1f} ms  {path}")
@@ -0,0 +1,319 @@
+"""Indexed retrieval engine for the AI Insights dashboard Q&A assistant"""
+import difflib
+import json
+import math
+import os
+import threading
+from collections import Counter, defaultdict
+from pathlib import Path
+
+import numpy as np
+
+APP_DIR = Path(__file__).parent
+
+# Minimum combined score for an answer (same threshold as the original difflib matcher)
+MATCH_THRESHOLD = 0.3
+# Added to the score for every user word found inside a word of the question
+KEYWORD_BOOST = 0.1
+NGRAM = 3
+
+NO_ANSWER = "I can only answer questions based on the dashboard data. Please ask about tourist arrivals, countries, years (2003-2012), growth percentages, or forecasts."
+
+# Analysts publish answers here; edits are picked up without restarting the app
+QA_DATASET_FILE = Path(os.getenv("QA_DATASET_PATH", APP_DIR / "qa_dataset.json"))
+
+# Rebuild the whole index once incremental changes touch this share of it
+COMPACT_RATIO = 0.25
+MAX_SEGMENTS = 8
+
+
+def load_qa_pairs(path=QA_DATASET_FILE):
+    """Read (question, answer) pairs from a JSON knowledge base file"""
+    with open(path, encoding="utf-8") as f:
+        items = json.load(f)
+    pairs = []
+    for item in items:
+        question = str(item["question"]).strip()
+        answer = str(item["answer"]).strip()
+        if question:
+            pairs.append((question, answer))
+    return pairs
+
+
+def legacy_find_best_answer(qa_dataset, user_input):
+    """Original linear difflib matcher, kept as the reference for benchmarks"""
+    user_input_lower = user_input.lower()
+    best_match = None
+    best_score = 0
+
+    for question, answer in qa_dataset:
+        question_lower = question.lower()
+        similarity = difflib.SequenceMatcher(None, user_input_lower, question_lower).ratio()
+
+        keywords_in_question = question_lower.split()
+        keywords_in_user = user_input_lower.split()
+        keyword_matches = sum(1 for word in keywords_in_user if any(word in q_word for q_word in keywords_in_question))
+
+        final_score = similarity + (keyword_matches * KEYWORD_BOOST)
+        if final_score > best_score and final_score > MATCH_THRESHOLD:
+            best_score = final_score
+            best_match = (question, answer)
+
+    return best_match[1] if best_match else NO_ANSWER
+
+
+def _ngrams(text):
+    padded = f" {text} "
+    return Counter(padded[i:i + NGRAM] for i in range(len(padded) - NGRAM + 1))
+
+
+def _substrings(word):
+    return {word[i:j] for i in range(len(word)) for j in range(i + 1, len(word) + 1)}
+
+
+class _Segment:
+    """Immutable postings for one batch of indexed questions"""
+
+    def __init__(self, doc_ids, questions, idf, unknown_idf):
+        postings = defaultdict(lambda: ([], []))
+        keyword_docs = defaultdict(set)
+        for doc_id, question in zip(doc_ids, questions):
+            text = question.lower()
+            weights = {g: (1 + math.log(tf)) * idf.get(g, unknown_idf) for g, tf in _ngrams(text).items()}
+            norm = math.sqrt(sum(w * w for w in weights.values())) or 1.0
+            for g, w in weights.items():
+                ids, ws = postings[g]
+                ids.append(doc_id)
+                ws.append(w / norm)
+
+            # Every substring of every question word -> questions containing it,
+            # so the keyword boost is a dict lookup instead of a nested scan
+            for q_word in set(text.split()):
+                for sub in _substrings(q_word):
+                    keyword_docs[sub].add(doc_id)
+
+        self.postings = {
+            g: (np.array(ids, dtype=np.int32), np.array(ws, dtype=np.float64))
+            for g, (ids, ws) in postings.items()
+        }
+        self.keywords = {sub: np.fromiter(ids, dtype=np.int32) for sub, ids in keyword_docs.items()}
+        self.size = len(doc_ids)
+
+
+class QAEngine:
+    """Character n-gram TF-IDF index plus a keyword substring index over Q&A pairs
+
+    Scores keep the original matcher's shape: a 0..1 text similarity (cosine
+    over n-gram vectors instead of SequenceMatcher) plus KEYWORD_BOOST for each
+    user word contained in a question word, with answers below
+    MATCH_THRESHOLD rejected.
+
+    Engines are immutable so sessions can keep querying one while updated()
+    builds its successor. Updates index only the changed questions into a
+    small extra segment (using the existing IDF weights) and tombstone the old
+    ones; once enough has changed the next update rebuilds from scratch.
+    """
+
+    def __init__(self, qa_pairs):
+        entries = dict(qa_pairs)
+        self.questions = list(entries)
+        self.answers = list(entries.values())
+        self._slots = {q: i for i, q in enumerate(self.questions)}
+        self._alive = np.ones(len(self.questions), dtype=bool)
+        self._dead = 0
+
+        n_docs = len(self.questions)
+        df = Counter()
+        for question in self.questions:
+            df.update(_ngrams(question.lower()).keys())
+        self._idf = {g: math.log((1 + n_docs) / (1 + count)) + 1 for g, count in df.items()}
+        self._unknown_idf = math.log(1 + n_docs) + 1
+        self._segments = [_Segment(range(n_docs), self.questions, self._idf, self._unknown_idf)]
+
+    def __len__(self):
+        return len(self.questions) - self._dead
+
+    def pairs(self):
+        """Return the live (question, answer) pairs in index order"""
+        return [(q, a) for q, a, alive in zip(self.questions, self.answers, self._alive) if alive]
+
+    def updated(self, upserts, removals=()):
+        """Return a new engine with the given questions added, re-answered or removed"""
+        upserts = dict(upserts)
+        removals = [q for q in removals if q in self._slots]
+        new_questions = [q for q in upserts if q not in self._slots]
+
+        indexed = sum(seg.size for seg in self._segments[1:]) + len(new_questions)
+        if (self._dead + len(removals) + indexed > COMPACT_RATIO * max(len(self), 1)
+                or len(self._segments) >= MAX_SEGMENTS):
+            removed = set(removals)
+            pairs = [(q, upserts.get(q, a)) for q, a in self.pairs() if q not in removed]
+            return QAEngine(pairs + [(q, upserts[q]) for q in new_questions])
+
+        engine = object.__new__(QAEngine)
+        engine.questions = self.questions + new_questions
+        engine.answers = self.answers + [upserts[q] for q in new_questions]
+        engine._slots = dict(self._slots)
+        engine._alive = np.concatenate([self._alive, np.ones(len(new_questions), dtype=bool)])
+        engine._dead = self._dead + len(removals)
+        engine._idf = self._idf
+        engine._unknown_idf = self._unknown_idf
+
+        # Answer-only edits don't touch the index at all
+        for question, answer in upserts.items():
+            if question in self._slots:
+                engine.answers[self._slots[question]] = answer
+        for question in removals:
+            engine._alive[engine._slots.pop(question)] = False
+
+        start = len(self.questions)
+        doc_ids = range(start, start + len(new_questions))
+        engine._slots.update(zip(new_questions, doc_ids))
+        engine._segments = list(self._segments)
+        if new_questions:
+            engine._segments.append(_Segment(doc_ids, new_questions, self._idf, self._unknown_idf))
+        return engine
+
+    def scores(self, user_input):
+        """Return the combined score of user_input against every question"""
+        text = user_input.lower()
+        n_docs = len(self.questions)
+        if not n_docs:
+            return np.zeros(0)
+
+        query = _ngrams(text)
+        norm = 0.0
+        weighted = []
+        for g, tf in query.items():
+            idf = self._idf.get(g)
+            w = (1 + math.log(tf)) * (idf if idf is not None else self._unknown_idf)
+            norm += w * w
+            weighted.append((g, w))
+        norm = math.sqrt(norm) or 1.0
+        words = text.split()
+
+        # Gather every matching posting and accumulate them in one bincount
+        doc_ids = []
+        weights = []
+        for segment in self._segments:
+            for g, w in weighted:
+                posting = segment.postings.get(g)
+                if posting is not None:
+                    doc_ids.append(posting[0])
+                    weights.append(posting[1] * (w / norm))
+            for word in words:
+                ids = segment.keywords.get(word)
+                if ids is not None:
+                    doc_ids.append(ids)
+                    weights.append(np.full(len(ids), KEYWORD_BOOST))
+
+        if not doc_ids:
+            return np.zeros(n_docs)
+        scores = np.bincount(np.concatenate(doc_ids), weights=np.concatenate(weights), minlength=n_docs)
+        if self._dead:
+            scores[~self._alive] = 0.0
+        return scores
+
+    def best_match(self, user_input):
+        """Return (question, answer, score) for the best match, or None below the threshold"""
+        scores = self.scores(user_input)
+        if not len(scores):
+            return None
+        best = int(np.argmax(scores))
+        if scores[best] <= MATCH_THRESHOLD:
+            return None
+        return self.questions[best], self.answers[best], float(scores[best])
+
+    def find_best_answer(self, user_input):
+        """Answer a dashboard question, or explain what can be asked"""
+        match = self.best_match(user_input)
+        return match[1] if match else NO_ANSWER
+
+
+class QAKnowledgeBase:
+    """Q&A pairs loaded from a JSON file and re-indexed in the background when it changes"""
+
+    def __init__(self, path=QA_DATASET_FILE):
+        self.path = Path(path)
+        self._lock = threading.Lock()
+        self._engine = None
+        self._entries = {}
+        self._version = None
+        self._reloading = False
+
+    def _file_version(self):
+        try:
+            st = self.path.stat()
+        except OSError:
+            return None
+        return st.st_mtime_ns, st.st_size
+
+    def engine(self):
+        """Return the current engine; a changed file is re-indexed off the calling thread"""
+        version = self._file_version()
+        if self._engine is None:
+            with self._lock:
+                if self._engine is None:
+                    self._reload(version)
+        elif version != self._version:
+            with self._lock:
+                if self._reloading:
+                    return self._engine
+                self._reloading = True
+            threading.Thread(target=self._reload_async, args=(version,), daemon=True).start()
+        return self._engine
+
+    def _reload_async(self, version):
+        try:
+            self._reload(version)
+        finally:
+            self._reloading = False
+
+    def _reload(self, version):
+        try:
+            pairs = load_qa_pairs(self.path)
+        except (OSError, ValueError, KeyError, TypeError) as e:
+            # Keep answering from the last good copy until the file is fixed
+            print(f"Q&A knowledge base error ({self.path.name}): {e}")
+            self._version = version
+            if self._engine is None:
+                self._engine = QAEngine([])
+            return
+
+        entries = dict(pairs)
+        if self._engine is None:
+            engine = QAEngine(pairs)
+            changed, removed = len(entries), 0
+        else:
+            upserts = {q: a for q, a in entries.items() if self._entries.get(q) != a}
+            removals = [q for q in self._entries if q not in entries]
+            engine = self._engine.updated(upserts, removals)
+            changed, removed = len(upserts), len(removals)
+
+        self._entries = entries
+        self._version = version
+        self._engine = engine
+        print(f"Q&A knowledge base loaded: {len(engine)} answers ({changed} changed, {removed} removed)")
+
+
+_knowledge_base = QAKnowledgeBase()
+_merged = (None, None, None)
+
+
+def get_qa_engine(facts=None, facts_key=None):
+    """Return the process-wide Q&A engine, with computed answers (facts) layered over the file
+
+    facts_key identifies the facts (e.g. the data version) so the merged engine
+    is only rebuilt when either the file or the facts change.
+    """
+    global _merged
+    engine = _knowledge_base.engine()
+    if not facts:
+        return engine
+
+    base, key, merged = _merged
+    if base is engine and key == facts_key:
+        return merged
+    merged = engine.updated(facts)
+    _merged = (engine, facts_key, merged)
+    return merged
@@ -0,0 +1,146 @@
+"""Pre-aggregated country x year arrivals cube for interactive dashboard filtering"""
+import sqlite3
+import threading
+
+import numpy as np
+
+from travelviz_store import DB_PATH, connection, data_version
+
+
+class ArrivalsCube:
+    """Dense country x year arrivals matrix with prefix sums over years
+
+    Every filter (year range, country set, region, top-N) is answered with a
+    handful of vectorized operations on these arrays, never by rescanning rows.
+    """
+
+    def __init__(self, codes, names, regions, years, values, present):
+        self.codes = codes
+        self.names = names
+        self.regions = regions
+        self.years = years
+        self.values = values
+        self.present = present
+        self.version = None
+        self.index = {code: i for i, code in enumerate(codes)}
+        self.region_names = sorted({r for r in regions if r})
+
+        # cum[:, j] = arrivals of each country over years[:j]
+        self.cum = np.zeros((len(codes), len(years) + 1))
+        np.cumsum(values, axis=1, out=self.cum[:, 1:])
+        self.year_totals = values.sum(axis=0)
+        self.country_totals = self.cum[:, -1]
+
+    @classmethod
+    def from_connection(cls, conn):
+        """Build the cube from the arrivals table (one pass over the rows)"""
+        countries = conn.execute("SELECT code, name, COALESCE(region, '') FROM countries ORDER BY name").fetchall()
+        years = [row[0] for row in conn.execute("SELECT DISTINCT year FROM arrivals ORDER BY year")]
+        codes = [c for c, _, _ in countries]
+        index = {code: i for i, code in enumerate(codes)}
+        year_index = {year: j for j, year in enumerate(years)}
+
+        values = np.zeros((len(codes), len(years)))
+        present = np.zeros((len(codes), len(years)), dtype=bool)
+        rows = conn.execute("SELECT country_code, year, arrivals FROM arrivals").fetchall()
+        if rows:
+            ci = np.fromiter((index[r[0]] for r in rows), dtype=np.int64, count=len(rows))
+            yi = np.fromiter((year_index[r[1]] for r in rows), dtype=np.int64, count=len(rows))
+            values[ci, yi] = np.fromiter((r[2] for r in rows), dtype=np.float64, count=len(rows))
+            present[ci, yi] = True
+
+        # Countries without any arrivals rows only add noise to the filters
+        keep = present.any(axis=1)
+        return cls(
+            [c for c, k in zip(codes, keep) if k],
+            np.array([n for (_, n, _), k in zip(countries, keep) if k], dtype=object),
+            np.array([r for (_, _, r), k in zip(countries, keep) if k], dtype=object),
+            np.array(years, dtype=np.int64),
+            values[keep],
+            present[keep],
+        )
+
+    def __len__(self):
+        return len(self.codes)
+
+    def country_mask(self, countries=None, regions=None):
+        """Boolean mask of the selected countries (all when no filter is given)"""
+        mask = np.ones(len(self.codes), dtype=bool)
+        if countries:
+            mask[:] = False
+            mask[[self.index[c] for c in countries if c in self.index]] = True
+        if regions:
+            mask &= np.isin(self.regions, list(regions))
+        return mask
+
+    def year_slice(self, year_from=None, year_to=None):
+        """Column range [start, stop) covering year_from..year_to"""
+        start = int(np.searchsorted(self.years, year_from if year_from is not None else self.years[0], "left"))
+        stop = int(np.searchsorted(self.years, year_to if year_to is not None else self.years[-1], "right"))
+        return start, stop
+
+    def query(self, year_from=None, year_to=None, countries=None, regions=None, top_n=10):
+        """Answer a dashboard filter from the precomputed arrays"""
+        start, stop = self.year_slice(year_from, year_to)
+        mask = self.country_mask(countries, regions)
+        selected = np.flatnonzero(mask)
+
+        if stop <= start or not len(selected):
+            return {
+                "years": self.years[start:stop], "year_totals": np.zeros(max(stop - start, 0)),
+                "total": 0.0, "countries": 0, "growth_pct": 0.0, "top": [],
+            }
+
+        totals = self.cum[selected, stop] - self.cum[selected, start]
+        if mask.all():
+            year_totals = self.year_totals[start:stop]
+        else:
+            year_totals = self.values[selected, start:stop].sum(axis=0)
+
+        first, last = self.values[selected, start], self.values[selected, stop - 1]
+        comparable = self.present[selected, start] & self.present[selected, stop - 1] & (first > 0)
+        with np.errstate(divide="ignore", invalid="ignore"):
+            growth = np.where(comparable, (last - first) / first * 100, np.nan)
+
+        n = min(top_n or len(selected), len(selected))
+        top = np.argpartition(-totals, n - 1)[:n]
+        top = top[np.argsort(-totals[top])]
+
+        first_total, last_total = year_totals[0], year_totals[-1]
+        return {
+            "years": self.years[start:stop],
+            "year_totals": year_totals,
+            "total": float(totals.sum()),
+            "countries": int(len(selected)),
+            "growth_pct": float((last_total - first_total) / first_total * 100) if first_total else 0.0,
+            "top": [
+                (self.codes[selected[i]], self.names[selected[i]], float(totals[i]), float(growth[i]))
+                for i in top
+            ],
+        }
+
+
+_cubes = {}
+_cube_lock = threading.Lock()
+
+
+def get_cube(db_path=None):
+    """Return the cube for the current data version, rebuilding it only after new data is loaded"""
+    path = str(db_path or DB_PATH)
+    try:
+        with connection(path) as conn:
+            version = data_version(conn)
+            cached = _cubes.get(path)
+            if cached is not None and cached[0] == version:
+                return cached[1]
+            with _cube_lock:
+                cached = _cubes.get(path)
+                if cached is None or cached[0] != version:
+                    cube = ArrivalsCube.from_connection(conn)
+                    cube.version = version
+                    cached = (version, cube)
+                    _cubes[path] = cached
+            return cached[1]
+    except sqlite3.Error as e:
+        print(f"Arrivals store error: {e}")
+        return None
@@ -0,0 +1,221 @@
+"""Resumable login sessions: signed browser tokens backed by a sessions table in data.db
+
+After a password sign-in the browser gets "<session id>.<HMAC>" in a cookie;
+data.db keeps a hash of the id with the user's Firebase refresh token,
+encrypted (AES-GCM) with a key derived from the session secret. A
+reload or new tab presents the cookie and is signed in from this table and
+the profile cache, without calling Firebase Auth. The refresh token is
+re-checked with Firebase in the background, so accounts disabled or signed
+out elsewhere lose their sessions.
+"""
+import base64
+import hashlib
+import hmac
+import os
+import secrets
+import sqlite3
+import threading
+import time
+from pathlib import Path
+
+from travelviz_store import DB_PATH, connection
+
+APP_DIR = Path(__file__).parent
+SESSION_COOKIE = "travelviz_session"
+SESSION_TTL = float(os.getenv("SESSION_TTL_DAYS", 30)) * 86400
+SESSION_IDLE_TTL = float(os.getenv("SESSION_IDLE_DAYS", 7)) * 86400
+# How often a resumed session re-checks its refresh token with Firebase
+VERIFY_INTERVAL = float(os.getenv("SESSION_VERIFY_SECONDS", 3600))
+# last_seen is only rewritten when it is older than this, to keep resumes read-only
+TOUCH_INTERVAL = 300
+SECRET_FILE = Path(os.getenv("SESSION_SECRET_FILE", APP_DIR / ".cache" / "session_secret"))
+
+ENCRYPTED_PREFIX = "enc1:"
+
+# Firebase errors meaning the refresh token will never work again
+REVOKED_ERRORS = ("TOKEN_EXPIRED", "USER_DISABLED", "USER_NOT_FOUND", "INVALID_REFRESH_TOKEN")
+
+_secret = None
+_secret_lock = threading.Lock()
+
+
+def _get_secret():
+    """HMAC key: SESSION_SECRET, or a random key persisted next to the app"""
+    global _secret
+    if _secret is None:
+        with _secret_lock:
+            if _secret is None:
+                env_secret = os.getenv("SESSION_SECRET")
+                if env_secret:
+                    _secret = env_secret.encode()
+                else:
+                    try:
+                        _secret = SECRET_FILE.read_bytes()
+                    except OSError:
+                        SECRET_FILE.parent.mkdir(parents=True, exist_ok=True)
+                        _secret = secrets.token_bytes(32)
+                        fd = os.open(SECRET_FILE, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+                        with os.fdopen(fd, "wb") as f:
+                            f.write(_secret)
+    return _secret
+
+
+def _token_key():
+    """AES-256 key for stored refresh tokens, separate from the cookie signing key"""
+    return hmac.new(_get_secret(), b"travelviz refresh token", hashlib.sha256).digest()
+
+
+def _encrypt_token(refresh_token):
+    from Crypto.Cipher import AES  # pycryptodome, a Pyrebase dependency
+
+    cipher = AES.new(_token_key(), AES.MODE_GCM)
+    ciphertext, tag = cipher.encrypt_and_digest(refresh_token.encode())
+    return ENCRYPTED_PREFIX + base64.urlsafe_b64encode(cipher.nonce + tag + ciphertext).decode()
+
+
+def _decrypt_token(stored):
+    """The refresh token of a sessions row; raises ValueError if it can't be decrypted"""
+    if not stored.startswith(ENCRYPTED_PREFIX):
+        return stored  # written before tokens were encrypted
+    from Crypto.Cipher import AES
+
+    data = base64.urlsafe_b64decode(stored[len(ENCRYPTED_PREFIX):])
+    nonce, tag, ciphertext = data[:16], data[16:32], data[32:]
+    return AES.new(_token_key(), AES.MODE_GCM, nonce=nonce).decrypt_and_verify(ciphertext, tag).decode()
+
+
+def _sign(session_id):
+    return hmac.new(_get_secret(), session_id.encode(), hashlib.sha256).hexdigest()
+
+
+def _token_hash(session_id):
+    return hashlib.sha256(session_id.encode()).hexdigest()
+
+
+def _session_id(token):
+    """Return the session id of a well-signed token, else None"""
+    if not token or "." not in token:
+        return None
+    session_id, signature = token.rsplit(".", 1)
+    if not hmac.compare_digest(signature, _sign(session_id)):
+        return None
+    return session_id
+
+
+def session_key(token):
+    """Stable, non-secret key of a well-signed token (the stored hash), else None"""
+    session_id = _session_id(token)
+    return _token_hash(session_id) if session_id is not None else None
+
+
+def create_session(uid, refresh_token, db_path=None):
+    """Start a resumable session for uid and return the token to hand to the browser"""
+    session_id = secrets.token_urlsafe(32)
+    now = time.time()
+    with connection(db_path or DB_PATH) as conn:
+        with conn:
+            # Opportunistic cleanup keeps the table small
+            conn.execute("DELETE FROM sessions WHERE expires_at < ? OR revoked = 1", (now,))
+            conn.execute(
+                "INSERT INTO sessions (token_hash, uid, refresh_token, created_at, last_seen, verified_at, expires_at) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (_token_hash(session_id), uid, _encrypt_token(refresh_token), now, now, now, now + SESSION_TTL),
+            )
+    return f"{session_id}.{_sign(session_id)}"
+
+
+def resume_session(token, db_path=None):
+    """Return the uid of a valid session token, or None if it is forged, expired or revoked"""
+    session_id = _session_id(token)
+    if session_id is None:
+        return None
+    token_hash = _token_hash(session_id)
+    now = time.time()
+    try:
+        with connection(db_path or DB_PATH) as conn:
+            row = conn.execute(
+                "SELECT uid, refresh_token, last_seen, verified_at, expires_at, revoked FROM sessions WHERE token_hash = ?",
+                (token_hash,),
+            ).fetchone()
+            if row is None:
+                return None
+            uid, stored_token, last_seen, verified_at, expires_at, revoked = row
+            if revoked or now > expires_at or now - last_seen > SESSION_IDLE_TTL:
+                return None
+            if now - last_seen > TOUCH_INTERVAL:
+                with conn:
+                    conn.execute("UPDATE sessions SET last_seen = ? WHERE token_hash = ?", (now, token_hash))
+    except sqlite3.Error as e:
+        print(f"Session store error: {e}")
+        return None
+
+    if now - verified_at > VERIFY_INTERVAL:
+        threading.Thread(
+            target=_verify_refresh_token, args=(token_hash, stored_token, str(db_path or DB_PATH)), daemon=True,
+        ).start()
+    return uid
+
+
+def _verify_refresh_token(token_hash, stored_token, db_path):
+    """Exchange the refresh token with Firebase; revoke the session if Firebase rejects it"""
+    from travelviz_firebase import get_firebase
+
+    try:
+        refresh_token = _decrypt_token(stored_token)
+    except ValueError as e:
+        # Encrypted under another secret: the session can't be verified any more
+        print(f"Session token unreadable, revoking: {e}")
+        with connection(db_path) as conn:
+            with conn:
+                conn.execute("UPDATE sessions SET revoked = 1 WHERE token_hash = ?", (token_hash,))
+        return
+    try:
+        refreshed = get_firebase().auth.refresh(refresh_token)
+    except Exception as e:
+        if any(code in str(e) for code in REVOKED_ERRORS):
+            print(f"Session revoked by Firebase: {e}")
+            with connection(db_path) as conn:
+                with conn:
+                    conn.execute("UPDATE sessions SET revoked = 1 WHERE token_hash = ?", (token_hash,))
+        else:
+            print(f"Session refresh check failed: {e}")
+        return
+    with connection(db_path) as conn:
+        with conn:
+            # Firebase may rotate the refresh token
+            conn.execute(
+                "UPDATE sessions SET refresh_token = ?, verified_at = ? WHERE token_hash = ?",
+                (_encrypt_token(refreshed.get("refreshToken") or refresh_token), time.time(), token_hash),
+            )
+
+
+def revoke_session(token, db_path=None):
+    """Log a single browser session out"""
+    session_id = _session_id(token)
+    if session_id is None:
+        return
+    try:
+        with connection(db_path or DB_PATH) as conn:
+            with conn:
+                conn.execute("UPDATE sessions SET revoked = 1 WHERE token_hash = ?", (_token_hash(session_id),))
+    except sqlite3.Error as e:
+        print(f"Session store error: {e}")
+
+
+def revoke_user_sessions(uid, db_path=None):
+    """Log every session of a user out (e.g. after a password change)"""
+    with connection(db_path or DB_PATH) as conn:
+        with conn:
+            conn.execute("UPDATE sessions SET revoked = 1 WHERE uid = ?", (uid,))
+
+
+def cookie_script(token, max_age=SESSION_TTL):
+    """JavaScript that stores (or, with token=None, clears) the session cookie in the browser"""
+    value = token or ""
+    max_age = int(max_age) if token else 0
+    return (
+        "<script>"
+        "const secure = window.parent.location.protocol === 'https:' ? '; Secure' : '';"
+        f"window.parent.document.cookie = '{SESSION_COOKIE}={value}; Path=/; Max-Age={max_age}; SameSite=Strict' + secure;"
+        "</script>"
+    )
@@ -0,0 +1,217 @@
+"""Shared server-side session state, so any worker process can serve any browser session
+
+st.session_state lives in one process. The fields a session needs to carry
+over to another worker (user_data, theme, chat_history) are also kept in a
+shared store under the session's login cookie. A browser that reconnects
+to a different worker, or after a restart, resumes with its state instead
+of starting over.
+
+The store speaks a small subset of the Redis hash commands (hget, hset,
+expire, delete). SESSION_STORE_URL picks the backend:
+
+- empty (default) or sqlite:///<path>: a table in data.db, shared by the
+  workers of one host;
+- redis://, rediss:// or unix://: a Redis (or Redis-compatible) server
+  shared by every host; needs the redis package.
+
+Fields load lazily, one per round trip, on first access. They are kept as
+compact JSON (zlib-compressed when large), and only fields changed during a
+rerun are written back when it ends.
+"""
+import json
+import os
+import sqlite3
+import threading
+import time
+import zlib
+
+from travelviz_metrics import timer
+from travelviz_sessions import SESSION_IDLE_TTL, session_key
+from travelviz_store import DB_PATH, connection
+
+SESSION_STORE_URL = os.getenv("SESSION_STORE_URL", "")
+KEY_PREFIX = os.getenv("SESSION_STORE_PREFIX", "travelviz:session:")
+# Encoded values at least this long are zlib-compressed
+COMPRESS_MIN = 512
+# How often the SQLite backend deletes expired sessions
+CLEANUP_INTERVAL = 600
+
+
+# ---------- Backends ----------
+class SQLiteBackend:
+    """The Redis hash commands SharedSession uses, on the shared_sessions table of data.db"""
+
+    def __init__(self, db_path=None):
+        self.db_path = str(db_path or DB_PATH)
+        self._cleaned_at = 0.0
+
+    def hget(self, name, key):
+        with connection(self.db_path) as conn:
+            row = conn.execute(
+                "SELECT value FROM shared_sessions WHERE name = ? AND field = ? AND (expires_at IS NULL OR expires_at > ?)",
+                (name, key, time.time()),
+            ).fetchone()
+        return row[0] if row else None
+
+    def hset(self, name, key=None, value=None, mapping=None):
+        items = dict(mapping or {})
+        if key is not None:
+            items[key] = value
+        now = time.time()
+        with connection(self.db_path) as conn:
+            with conn:
+                # Like Redis: an expired key is gone, and new fields share the key's TTL
+                conn.execute("DELETE FROM shared_sessions WHERE name = ? AND expires_at <= ?", (name, now))
+                row = conn.execute("SELECT expires_at FROM shared_sessions WHERE name = ? LIMIT 1", (name,)).fetchone()
+                conn.executemany(
+                    "INSERT INTO shared_sessions (name, field, value, expires_at) VALUES (?, ?, ?, ?) "
+                    "ON CONFLICT(name, field) DO UPDATE SET value = excluded.value",
+                    [(name, field, data, row[0] if row else None) for field, data in items.items()],
+                )
+        return len(items)
+
+    def expire(self, name, seconds):
+        now = time.time()
+        with connection(self.db_path) as conn:
+            with conn:
+                changed = conn.execute(
+                    "UPDATE shared_sessions SET expires_at = ? WHERE name = ?", (now + seconds, name),
+                ).rowcount
+                if now - self._cleaned_at > CLEANUP_INTERVAL:
+                    self._cleaned_at = now
+                    conn.execute("DELETE FROM shared_sessions WHERE expires_at <= ?", (now,))
+        return changed > 0
+
+    def delete(self, *names):
+        deleted = 0
+        with connection(self.db_path) as conn:
+            with conn:
+                for name in names:
+                    deleted += conn.execute("DELETE FROM shared_sessions WHERE name = ?", (name,)).rowcount > 0
+        return deleted
+
+
+def _redis_backend(url):
+    try:
+        import redis
+    except ImportError as e:
+        raise RuntimeError("SESSION_STORE_URL points at Redis but the redis package is not installed") from e
+    # Values stay bytes (no decode_responses); short timeouts so an outage degrades to per-process state
+    client = redis.Redis.from_url(url, socket_timeout=2, socket_connect_timeout=2)
+    return client, (redis.RedisError, OSError)
+
+
+_backend = None
+_backend_lock = threading.Lock()
+
+
+def get_backend():
+    """Process-wide (backend, errors it raises), chosen by SESSION_STORE_URL"""
+    global _backend
+    if _backend is None:
+        with _backend_lock:
+            if _backend is None:
+                if SESSION_STORE_URL.startswith(("redis://", "rediss://", "unix://")):
+                    _backend = _redis_backend(SESSION_STORE_URL)
+                elif SESSION_STORE_URL.startswith("sqlite:///"):
+                    _backend = (SQLiteBackend(SESSION_STORE_URL[len("sqlite:///"):]), (sqlite3.Error,))
+                elif SESSION_STORE_URL:
+                    raise RuntimeError(f"Unsupported SESSION_STORE_URL: {SESSION_STORE_URL}")
+                else:
+                    _backend = (SQLiteBackend(), (sqlite3.Error,))
+    return _backend
+
+
+# ---------- Serialization ----------
+def encode(value):
+    """Compact JSON bytes, zlib-compressed past COMPRESS_MIN; the first byte says which"""
+    data = json.dumps(value, separators=(",", ":"), ensure_ascii=False).encode()
+    if len(data) >= COMPRESS_MIN:
+        return b"z" + zlib.compress(data)
+    return b"j" + data
+
+
+def decode(blob):
+    if isinstance(blob, str):
+        blob = blob.encode()
+    kind, data = blob[:1], blob[1:]
+    if kind == b"z":
+        data = zlib.decompress(data)
+    elif kind != b"j":
+        raise ValueError(f"unknown encoding {kind!r}")
+    return json.loads(data)
+
+
+# ---------- Sessions ----------
+class SharedSession:
+    """Lazily loaded, write-back view of one browser session's fields in the shared store"""
+
+    def __init__(self, name, backend, errors=(sqlite3.Error,), ttl=SESSION_IDLE_TTL):
+        self.name = name
+        self.backend = backend
+        self.errors = errors
+        self.ttl = int(ttl)
+        self._values = {}
+        self._dirty = set()
+
+    def get(self, field, default=None):
+        """The field's value, fetched from the store on first access"""
+        if field not in self._values:
+            try:
+                with timer("session_store", op="load"):
+                    blob = self.backend.hget(self.name, field)
+            except self.errors as e:
+                # Not cached, so the next access tries again
+                print(f"Session store error: {e}")
+                return default
+            try:
+                self._values[field] = decode(blob) if blob is not None else None
+            except (ValueError, zlib.error) as e:
+                print(f"Session store error: {field}: {e}")
+                self._values[field] = None
+        value = self._values[field]
+        return default if value is None else value
+
+    def set(self, field, value):
+        """Change a field; it is written back by the next flush()"""
+        self._values[field] = value
+        self._dirty.add(field)
+
+    def flush(self):
+        """Write the changed fields back and extend the session's TTL"""
+        if not self._dirty:
+            return
+        mapping = {field: encode(self._values[field]) for field in self._dirty}
+        try:
+            with timer("session_store", op="flush"):
+                self.backend.hset(self.name, mapping=mapping)
+                self.backend.expire(self.name, self.ttl)
+        except self.errors as e:
+            # Kept dirty, so the next rerun retries
+            print(f"Session store error: {e}")
+            return
+        self._dirty.clear()
+
+    def delete(self):
+        """Drop the session from the store (logout)"""
+        self._values.clear()
+        self._dirty.clear()
+        try:
+            self.backend.delete(self.name)
+        except self.errors as e:
+            print(f"Session store error: {e}")
+
+
+def open_session(token):
+    """The SharedSession of a signed session token (None if the token is forged or missing)"""
+    key = session_key(token)
+    if key is None:
+        return None
+    backend, errors = get_backend()
+    session = SharedSession(KEY_PREFIX + key, backend, errors)
+    try:
+        # An active session's state lives as long as its login can idle
+        backend.expire(session.name, session.ttl)
+    except errors as e:
+        print(f"Session store error: {e}")
+    return session
@@ -0,0 +1,334 @@
+"""SQLite store for tourism arrivals (data.db) and the dashboard statistics computed from it"""
+import csv
+import os
+import queue
+import sqlite3
+import sys
+import threading
+from contextlib import contextmanager
+from pathlib import Path
+
+APP_DIR = Path(__file__).parent
+
+
+def _db_path():
+    path = Path(os.getenv("DB_PATH", "data.db"))
+    return path if path.is_absolute() else APP_DIR / path
+
+
+DB_PATH = _db_path()
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS countries (
+    code TEXT PRIMARY KEY,
+    name TEXT NOT NULL,
+    region TEXT
+);
+CREATE TABLE IF NOT EXISTS arrivals (
+    country_code TEXT NOT NULL REFERENCES countries(code),
+    year INTEGER NOT NULL,
+    arrivals INTEGER NOT NULL,
+    PRIMARY KEY (country_code, year)
+) WITHOUT ROWID;
+-- Per-year totals are answered from this index alone, MIN/MAX from the second
+CREATE INDEX IF NOT EXISTS idx_arrivals_year ON arrivals(year, arrivals);
+CREATE INDEX IF NOT EXISTS idx_arrivals_value ON arrivals(arrivals);
+CREATE INDEX IF NOT EXISTS idx_countries_region ON countries(region);
+CREATE TABLE IF NOT EXISTS meta (
+    key TEXT PRIMARY KEY,
+    value TEXT NOT NULL
+);
+INSERT OR IGNORE INTO meta (key, value) VALUES ('data_version', '0');
+-- Resumable login sessions (see travelviz_sessions.py); only a hash of the session id is
+-- stored, and the Firebase refresh token is encrypted
+CREATE TABLE IF NOT EXISTS sessions (
+    token_hash TEXT PRIMARY KEY,
+    uid TEXT NOT NULL,
+    refresh_token TEXT NOT NULL,
+    created_at REAL NOT NULL,
+    last_seen REAL NOT NULL,
+    verified_at REAL NOT NULL,
+    expires_at REAL NOT NULL,
+    revoked INTEGER NOT NULL DEFAULT 0
+);
+CREATE INDEX IF NOT EXISTS idx_sessions_uid ON sessions(uid);
+-- AI Insights chat history (see travelviz_chat.py), appended one message at a time
+CREATE TABLE IF NOT EXISTS chat_messages (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    uid TEXT NOT NULL,
+    role TEXT NOT NULL,
+    content TEXT NOT NULL,
+    created_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_chat_messages_uid ON chat_messages(uid, id);
+-- Session fields shared by worker processes (see travelviz_state.py), one row per field
+CREATE TABLE IF NOT EXISTS shared_sessions (
+    name TEXT NOT NULL,
+    field TEXT NOT NULL,
+    value BLOB NOT NULL,
+    expires_at REAL,
+    PRIMARY KEY (name, field)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS idx_shared_sessions_expiry ON shared_sessions(expires_at);
+"""
+
+# Shown until data.db has been loaded (the figures from the Power BI report)
+DEFAULT_STAT_CARDS = [
+    ("Total countries", "153"),
+    ("Total years", "10"),
+    ("Min Arrivals", "3400"),
+    ("Growth %", "48.5%"),
+]
+
+POOL_SIZE = 4
+
+
+def connect(db_path=None):
+    """Open a connection to the arrivals database, creating the schema if needed"""
+    conn = sqlite3.connect(str(db_path or DB_PATH), timeout=30, check_same_thread=False)
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute("PRAGMA synchronous=NORMAL")
+    conn.execute("PRAGMA foreign_keys=ON")
+    conn.executescript(SCHEMA)
+    return conn
+
+
+_pools = {}
+_pools_lock = threading.Lock()
+
+
+@contextmanager
+def connection(db_path=None):
+    """Borrow a pooled read connection (shared across sessions and rerun threads)"""
+    path = str(db_path or DB_PATH)
+    with _pools_lock:
+        pool = _pools.setdefault(path, queue.LifoQueue())
+    try:
+        conn = pool.get_nowait()
+    except queue.Empty:
+        conn = connect(path)
+    try:
+        yield conn
+    finally:
+        if pool.qsize() < POOL_SIZE:
+            pool.put(conn)
+        else:
+            conn.close()
+
+
+# ---------- Loading ----------
+def upsert_countries(conn, countries):
+    """Insert or update (code, name, region) rows"""
+    conn.executemany(
+        "INSERT INTO countries (code, name, region) VALUES (?, ?, ?) "
+        "ON CONFLICT(code) DO UPDATE SET name = excluded.name, "
+        "region = COALESCE(excluded.region, countries.region)",
+        countries,
+    )
+
+
+def upsert_arrivals(conn, rows):
+    """Insert or update (country_code, year, arrivals) rows"""
+    conn.executemany(
+        "INSERT INTO arrivals (country_code, year, arrivals) VALUES (?, ?, ?) "
+        "ON CONFLICT(country_code, year) DO UPDATE SET arrivals = excluded.arrivals",
+        rows,
+    )
+
+
+def bump_data_version(conn):
+    """Mark the data as changed so cached statistics are recomputed"""
+    conn.execute("UPDATE meta SET value = CAST(value AS INTEGER) + 1 WHERE key = 'data_version'")
+
+
+def data_version(conn):
+    """Return the current data version (a primary key lookup, cheap enough for every rerun)"""
+    row = conn.execute("SELECT value FROM meta WHERE key = 'data_version'").fetchone()
+    return int(row[0]) if row else 0
+
+
+def load_arrivals(records, db_path=None):
+    """Load (country_code, country_name, region, year, arrivals) records in one transaction"""
+    countries = {}
+    rows = []
+    for code, name, region, year, value in records:
+        countries[code] = (code, name or code, region or None)
+        rows.append((code, int(year), int(float(value))))
+
+    conn = connect(db_path)
+    try:
+        with conn:
+            upsert_countries(conn, countries.values())
+            upsert_arrivals(conn, rows)
+            bump_data_version(conn)
+    finally:
+        conn.close()
+    return len(rows)
+
+
+def load_csv(path, db_path=None):
+    """Load a long-format CSV with country_code, country_name, region, year and arrivals columns"""
+    with open(path, newline="", encoding="utf-8") as f:
+        reader = csv.DictReader(f)
+        records = [
+            (r["country_code"], r.get("country_name"), r.get("region"), r["year"], r["arrivals"])
+            for r in reader
+            if r.get("arrivals") not in (None, "")
+        ]
+    return load_arrivals(records, db_path)
+
+
+# ---------- Statistics ----------
+def compute_stats(conn):
+    """Compute dashboard statistics from the arrivals table (None when it is empty)"""
+    countries, rows, min_value, max_value, avg_value = conn.execute(
+        "SELECT COUNT(DISTINCT country_code), COUNT(*), MIN(arrivals), MAX(arrivals), AVG(arrivals) FROM arrivals"
+    ).fetchone()
+    if not rows:
+        return None
+
+    year_totals = conn.execute(
+        "SELECT year, SUM(arrivals) FROM arrivals GROUP BY year ORDER BY year"
+    ).fetchall()
+    country_totals = conn.execute(
+        "SELECT c.name, SUM(a.arrivals) AS total FROM arrivals a "
+        "JOIN countries c ON c.code = a.country_code "
+        "GROUP BY a.country_code ORDER BY total DESC"
+    ).fetchall()
+
+    first_year, first_total = year_totals[0]
+    last_year, last_total = year_totals[-1]
+    country_growth = conn.execute(
+        "SELECT c.name, f.arrivals, l.arrivals FROM arrivals f "
+        "JOIN arrivals l ON l.country_code = f.country_code AND l.year = ? "
+        "JOIN countries c ON c.code = f.country_code "
+        "WHERE f.year = ? AND f.arrivals > 0",
+        (last_year, first_year),
+    ).fetchall()
+
+    return {
+        "countries": countries,
+        "years": len(year_totals),
+        "first_year": first_year,
+        "last_year": last_year,
+        "total": sum(total for _, total in year_totals),
+        "min_arrivals": min_value,
+        "max_arrivals": max_value,
+        "avg_arrivals": avg_value,
+        "growth_pct": (last_total - first_total) / first_total * 100 if first_total else 0.0,
+        "year_totals": year_totals,
+        "country_totals": country_totals,
+        "country_growth": {name: (last - first) / first * 100 for name, first, last in country_growth},
+    }
+
+
+_stats_cache = {}
+_stats_lock = threading.Lock()
+
+
+def get_stats(db_path=None):
+    """Return statistics for the current data, recomputed only when the data version changes"""
+    path = str(db_path or DB_PATH)
+    try:
+        with connection(path) as conn:
+            version = data_version(conn)
+            cached = _stats_cache.get(path)
+            if cached is not None and cached[0] == version:
+                return cached[1]
+            with _stats_lock:
+                cached = _stats_cache.get(path)
+                if cached is None or cached[0] != version:
+                    cached = (version, compute_stats(conn))
+                    _stats_cache[path] = cached
+            return cached[1]
+    except sqlite3.Error as e:
+        print(f"Arrivals store error: {e}")
+        return None
+
+
+def format_arrivals(value):
+    """Format an arrivals count the way the dashboard does (e.g. 546M, 5.40M, 3400)"""
+    if value >= 10_000_000:
+        return f"{value / 1_000_000:.0f}M"
+    if value >= 1_000_000:
+        return f"{value / 1_000_000:.2f}M"
+    return f"{value:.0f}"
+
+
+def stat_cards(stats=None):
+    """Return (title, value) pairs for the dashboard statistics cards"""
+    stats = stats if stats is not None else get_stats()
+    if not stats:
+        return DEFAULT_STAT_CARDS
+    return [
+        ("Total countries", str(stats["countries"])),
+        ("Total years", str(stats["years"])),
+        ("Min Arrivals", format_arrivals(stats["min_arrivals"])),
+        ("Growth %", f"{stats['growth_pct']:.1f}%"),
+    ]
+
+
+def qa_facts(stats=None):
+    """Return (question, answer) pairs computed from the data for the Q&A assistant
+
+    Questions match the wording in qa_dataset.json, so these answers replace
+    the published ones whenever data.db has been loaded.
+    """
+    stats = stats if stats is not None else get_stats()
+    if not stats:
+        return []
+
+    years = stats["year_totals"]
+    countries = stats["country_totals"]
+    best_year = max(years, key=lambda item: item[1])
+    worst_year = min(years, key=lambda item: item[1])
+    facts = [
+        ("How many total tourist arrivals were recorded from {} to {}?".format(stats["first_year"], stats["last_year"]),
+         f"{format_arrivals(stats['total'])} total tourist arrivals."),
+        ("What was the growth percentage across all countries?", f"{stats['growth_pct']:.2f}%."),
+        ("How many countries are covered in the dashboard?", f"{stats['countries']} countries."),
+        ("How many years are covered in the data?",
+         f"{stats['years']} years, from {stats['first_year']} to {stats['last_year']}."),
+        ("Which year had the highest arrivals?", f"{best_year[0]}, with {format_arrivals(best_year[1])} arrivals."),
+        ("Which year had the lowest arrivals?", f"{worst_year[0]}, with {format_arrivals(worst_year[1])} arrivals."),
+        ("Which countries are in the top 10 for total arrivals?", ", ".join(name for name, _ in countries[:10]) + "."),
+        ("What is the average number of arrivals per country?", f"{format_arrivals(stats['avg_arrivals'])} average arrivals."),
+        ("What is the maximum number of arrivals for a country?", f"{format_arrivals(stats['max_arrivals'])}."),
+        ("What is the minimum number of arrivals for a country?", f"{format_arrivals(stats['min_arrivals'])}."),
+        ("Which country had the highest tourist arrivals overall?",
+         f"{countries[0][0]}, with {format_arrivals(countries[0][1])} arrivals."),
+    ]
+    if len(countries) > 1:
+        facts.append(("Which country had the second highest arrivals?",
+                      f"{countries[1][0]}, with {format_arrivals(countries[1][1])} arrivals."))
+
+    growth = stats["country_growth"]
+    if growth:
+        top = max(growth, key=growth.get)
+        facts.append(("Which country had the largest % change in tourism arrivals?",
+                      f"{top} with {growth[top]:.0f}% change."))
+        facts.extend((f"What is the growth percentage for {name}?", f"{pct:.2f}%.") for name, pct in growth.items())
+    return facts
+
+
+_facts_cache = {}
+
+
+def get_qa_facts(db_path=None):
+    """Return (data version, facts) so callers can cache anything derived from the facts"""
+    path = str(db_path or DB_PATH)
+    stats = get_stats(path)
+    version = _stats_cache.get(path, (None,))[0]
+    cached = _facts_cache.get(path)
+    if cached is None or cached[0] != version:
+        cached = (version, qa_facts(stats) if stats else [])
+        _facts_cache[path] = cached
+    return cached
+
+
+if __name__ == "__main__":
+    if len(sys.argv) == 3 and sys.argv[1] == "load":
+        count = load_csv(sys.argv[2])
+        print(f"Loaded {count} arrivals rows into {DB_PATH}")
+    else:
+        print("usage: python travelviz_store.py load arrivals.csv")
@@ -0,0 +1,373 @@
+"""Background write-behind queue for Firebase Realtime Database writes
+
+Writes are acknowledged immediately with a WriteHandle and appended to an
+on-disk spool, so they survive a restart. Repeated writes to the same path
+(or to a parent/child path) are coalesced, and a worker thread flushes
+whatever is pending as a single multi-path update, retrying with
+exponential backoff. An update Firebase rejects (4xx, e.g. a rules denial)
+is split until the offending paths are isolated; only those fail.
+
+Each queue has its own spool file next to WRITE_SPOOL_PATH, locked while
+the queue is alive. On startup a queue adopts the spools of dead processes
+(the unlocked ones) and replays them, so several workers on one host never
+replay or truncate each other's writes.
+"""
+import json
+import os
+import random
+import threading
+import time
+import uuid
+from pathlib import Path
+
+from travelviz_guard import is_rejection
+
+try:
+    import fcntl
+except ImportError:
+    # Windows: no flock, so spools of other processes are never adopted
+    fcntl = None
+
+APP_DIR = Path(__file__).parent
+SPOOL_FILE = Path(os.getenv("WRITE_SPOOL_PATH", APP_DIR / ".cache" / "write_spool.jsonl"))
+
+# Give bursts (e.g. rapid theme toggles) a moment to coalesce before sending
+LINGER_SECONDS = 0.05
+MAX_BATCH = 500
+MAX_ATTEMPTS = 8
+BACKOFF_BASE = 0.5
+BACKOFF_MAX = 30.0
+
+
+class WriteHandle:
+    """Status of one queued write: pending, then written or failed"""
+
+    PENDING = "pending"
+    WRITTEN = "written"
+    FAILED = "failed"
+
+    def __init__(self, write_id, path, callback=None):
+        self.id = write_id
+        self.path = path
+        self.status = self.PENDING
+        self.attempts = 0
+        self.error = None
+        self._event = threading.Event()
+        self._callback = callback
+
+    def done(self):
+        return self._event.is_set()
+
+    def wait(self, timeout=None):
+        """Block until the write finished (or timeout) and return its status"""
+        self._event.wait(timeout)
+        return self.status
+
+    def _finish(self, status, error=None):
+        self.status = status
+        self.error = error
+        self._event.set()
+        if self._callback is not None:
+            try:
+                self._callback(self)
+            except Exception as e:
+                print(f"Write callback error for {self.path}: {e}")
+
+
+def _nested_set(container, parts, value):
+    """Set container[parts[0]][parts[1]]... = value, creating dicts on the way"""
+    for part in parts[:-1]:
+        child = container.get(part)
+        if not isinstance(child, dict):
+            child = container[part] = {}
+        container = child
+    container[parts[-1]] = value
+
+
+def _copy(value):
+    return json.loads(json.dumps(value))
+
+
+class WriteQueue:
+    """Coalescing, spooled, retrying write-behind queue in front of one RTDB"""
+
+    def __init__(self, db_factory, spool_path=SPOOL_FILE):
+        self._db_factory = db_factory
+        base = Path(spool_path)
+        self._spool_base = base
+        self._spool_path = base.with_name(f"{base.stem}.{os.getpid()}-{uuid.uuid4().hex[:8]}{base.suffix}")
+        self._cond = threading.Condition()
+        self._pending = {}
+        self._inflight = 0
+        self._key_lock = threading.Lock()
+        self._key_db = None
+        self.stats = {"enqueued": 0, "coalesced": 0, "batches": 0, "written": 0, "retries": 0, "failed": 0}
+
+        self._spool_path.parent.mkdir(parents=True, exist_ok=True)
+        self._spool = open(self._spool_path, "w", encoding="utf-8")
+        if fcntl is not None:
+            # Held until the process exits; an unlocked spool belongs to a dead one
+            fcntl.flock(self._spool.fileno(), fcntl.LOCK_EX)
+        orphans, replay = self._adopt_spools()
+        for write_id, path, value in replay:
+            self._spool_write({"op": "set", "id": write_id, "path": path, "value": value})
+            self._merge(path, value, [WriteHandle(write_id, path)], newer=True)
+        # Only now that the writes are in our own spool
+        for orphan in orphans:
+            try:
+                os.unlink(orphan.name)
+            except OSError:
+                pass
+            orphan.close()
+        if replay:
+            print(f"Write queue: replaying {len(replay)} spooled writes from {len(orphans)} spool(s)")
+
+        self._thread = threading.Thread(target=self._run, name="firebase-write-queue", daemon=True)
+        self._thread.start()
+
+    # ---------- Public API ----------
+    def set(self, path, value, callback=None):
+        """Queue db.child(path).set(value); returns a WriteHandle immediately"""
+        path = path.strip("/")
+        handle = WriteHandle(uuid.uuid4().hex, path, callback)
+        with self._cond:
+            self._spool_write({"op": "set", "id": handle.id, "path": path, "value": value})
+            self._merge(path, _copy(value), [handle], newer=True)
+            self.stats["enqueued"] += 1
+            self._cond.notify()
+        return handle
+
+    def push(self, path, value, callback=None):
+        """Queue db.child(path).push(value) under a client-generated push key"""
+        with self._key_lock:
+            if self._key_db is None:
+                self._key_db = self._db_factory()
+            key = self._key_db.generate_key()
+        return self.set(f"{path.strip('/')}/{key}", value, callback)
+
+    def pending_count(self):
+        with self._cond:
+            return sum(len(entry["handles"]) for entry in self._pending.values()) + self._inflight
+
+    def flush(self, timeout=None):
+        """Wait until everything queued so far has been sent (or failed)"""
+        deadline = None if timeout is None else time.monotonic() + timeout
+        with self._cond:
+            while self._pending or self._inflight:
+                remaining = None if deadline is None else deadline - time.monotonic()
+                if remaining is not None and remaining <= 0:
+                    return False
+                self._cond.wait(remaining)
+        return True
+
+    # ---------- Coalescing ----------
+    def _merge(self, path, value, handles, newer):
+        """Add a write to the pending set (caller holds the lock)
+
+        newer=True for fresh writes (they win over anything pending);
+        newer=False for retried writes (anything pending is newer than them).
+        """
+        if path in self._pending:
+            entry = self._pending[path]
+            if newer:
+                entry["value"] = value
+            entry["handles"].extend(handles)
+            self.stats["coalesced"] += 1
+            return
+
+        for other, entry in self._pending.items():
+            if path.startswith(other + "/"):
+                # A pending parent write already covers this path
+                if newer:
+                    if not isinstance(entry["value"], dict):
+                        entry["value"] = {}
+                    _nested_set(entry["value"], path[len(other) + 1:].split("/"), value)
+                entry["handles"].extend(handles)
+                self.stats["coalesced"] += 1
+                return
+
+        prefix = path + "/"
+        for other in [p for p in self._pending if p.startswith(prefix)]:
+            entry = self._pending.pop(other)
+            if not newer:
+                # Re-apply the newer child write on top of the retried parent value
+                if not isinstance(value, dict):
+                    value = {}
+                _nested_set(value, other[len(prefix):].split("/"), entry["value"])
+            handles = handles + entry["handles"]
+            self.stats["coalesced"] += 1
+        self._pending[path] = {"value": value, "handles": handles}
+
+    # ---------- Spool ----------
+    def _adopt_spools(self):
+        """Lock the spools of dead processes; returns (their open files, their unsent writes)"""
+        if fcntl is None:
+            return [], []
+        base = self._spool_base
+        # The plain WRITE_SPOOL_PATH file is the single spool of older versions
+        candidates = [base] + list(base.parent.glob(f"{base.stem}.*{base.suffix}"))
+        mtimes = {}
+        for path in candidates:
+            try:
+                if path != self._spool_path:
+                    mtimes[path] = path.stat().st_mtime
+            except OSError:
+                continue
+        orphans, writes = [], {}
+        # Oldest first, so later writes to a path win
+        for path in sorted(mtimes, key=mtimes.get):
+            try:
+                f = open(path, "r", encoding="utf-8")
+            except OSError:
+                continue
+            try:
+                fcntl.flock(f.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except OSError:
+                f.close()  # a live queue owns it
+                continue
+            if os.fstat(f.fileno()).st_nlink == 0:
+                f.close()  # another process adopted it first
+                continue
+            self._read_spool(f, writes)
+            orphans.append(f)
+        return orphans, list(writes.values())
+
+    @staticmethod
+    def _read_spool(f, writes):
+        """Apply a spool file's records to writes (id -> (id, path, value))"""
+        for line in f:
+            try:
+                record = json.loads(line)
+            except ValueError:
+                continue  # torn last line from a crash
+            if record.get("op") == "set":
+                writes[record["id"]] = (record["id"], record["path"], record["value"])
+            elif record.get("op") == "done":
+                for write_id in record["ids"]:
+                    writes.pop(write_id, None)
+
+    def _spool_write(self, record):
+        try:
+            self._spool.write(json.dumps(record) + "\n")
+            self._spool.flush()
+            os.fsync(self._spool.fileno())
+        except OSError as e:
+            print(f"Write spool error: {e}")
+
+    # ---------- Worker ----------
+    def _run(self):
+        attempt = 0
+        while True:
+            with self._cond:
+                while not self._pending:
+                    self._cond.wait()
+            time.sleep(LINGER_SECONDS)
+
+            with self._cond:
+                paths = list(self._pending)[:MAX_BATCH]
+                batch = {path: self._pending.pop(path) for path in paths}
+                self._inflight = sum(len(entry["handles"]) for entry in batch.values())
+
+            written, rejected = {}, {}
+            try:
+                db = self._db_factory()
+                self._send(db, batch, written, rejected)
+                error = None
+            except Exception as e:
+                error = str(e)
+
+            with self._cond:
+                if written:
+                    self._complete(written, WriteHandle.WRITTEN)
+                for path, (entry, reason) in rejected.items():
+                    print(f"Firebase rejected write to {path}: {reason}")
+                    self._complete({path: entry}, WriteHandle.FAILED, reason)
+                if error is None:
+                    attempt = 0
+                else:
+                    attempt += 1
+                    self._retry_or_fail(
+                        {path: entry for path, entry in batch.items() if path not in written and path not in rejected},
+                        error,
+                    )
+                self._inflight = 0
+                if not self._pending:
+                    self._compact_spool()
+                self._cond.notify_all()
+
+            if error is not None:
+                print(f"Firebase write batch failed (attempt {attempt}): {error}")
+                time.sleep(min(BACKOFF_MAX, BACKOFF_BASE * 2 ** (attempt - 1)) * random.uniform(0.5, 1.0))
+
+    def _send(self, db, batch, written, rejected):
+        """Send batch as one update; if Firebase rejects it, bisect until the bad paths are alone
+
+        Sent paths go into written, rejected ones into rejected (path -> (entry, error)).
+        Transient errors (outages, timeouts) propagate, leaving the unsent paths for a retry.
+        """
+        try:
+            db.update({path: entry["value"] for path, entry in batch.items()})
+        except Exception as e:
+            if not is_rejection(e):
+                raise
+            if len(batch) == 1:
+                rejected.update({path: (entry, str(e)) for path, entry in batch.items()})
+                return
+            items = list(batch.items())
+            self._send(db, dict(items[:len(items) // 2]), written, rejected)
+            self._send(db, dict(items[len(items) // 2:]), written, rejected)
+            return
+        written.update(batch)
+        self.stats["batches"] += 1
+
+    def _complete(self, batch, status, error=None):
+        handles = [h for entry in batch.values() for h in entry["handles"]]
+        self._spool_write({"op": "done", "ids": [h.id for h in handles]})
+        self.stats["written" if status == WriteHandle.WRITTEN else "failed"] += len(handles)
+        for handle in handles:
+            handle._finish(status, error)
+
+    def _retry_or_fail(self, batch, error):
+        self.stats["retries"] += 1
+        for path, entry in batch.items():
+            for handle in entry["handles"]:
+                handle.attempts += 1
+            if max(h.attempts for h in entry["handles"]) >= MAX_ATTEMPTS:
+                self._complete({path: entry}, WriteHandle.FAILED, error)
+            else:
+                self._merge(path, entry["value"], entry["handles"], newer=False)
+
+    def _compact_spool(self):
+        """Everything is written: start a fresh spool instead of growing it forever"""
+        try:
+            self._spool.seek(0)
+            self._spool.truncate()
+        except OSError as e:
+            print(f"Write spool error: {e}")
+
+
+_queue = None
+_queue_lock = threading.Lock()
+
+
+def get_write_queue():
+    """Return the process-wide write queue, starting its worker on first use"""
+    global _queue
+    if _queue is None:
+        with _queue_lock:
+            if _queue is None:
+                from travelviz_firebase import get_firebase
+
+                state = {"generation": None, "db": None}
+
+                def db_factory():
+                    # pyrebase Database objects carry per-call path state, so
+                    # the worker keeps its own instance instead of the app's db
+                    clients = get_firebase()
+                    if clients.generation != state["generation"]:
+                        state["db"] = clients.database()
+                        state["generation"] = clients.generation
+                    return state["db"]
+
+                _queue = WriteQueue(db_factory)
+    return _queue